@@ -1,4 +1,4 @@
-import { defineConfig, Plugin } from 'vite';
+import { defineConfig, loadEnv, Plugin } from 'vite';
 import react from '@vitejs/plugin-react';
 import path from 'path';
 import { sharedPublicPlugin } from '../../shared/viteSharedPublic.js';
@@ -23,29 +23,43 @@ function engineDepsPlugin(): Plugin {
   };
 }
 
+// Generated assets (<prefix>_<16 hex content hash>[_<mip size>].<ext>, see server/asset_store.py)
+// are fetched from the API server's /assets route, which sends content-hash ETags, immutable
+// Cache-Control and Range responses. Everything else under /assets stays on the public folder.
+const GENERATED_ASSET = '^/assets/[\\w-]+_[0-9a-f]{16}(_\\d+)?\\.(png|json|wav)(\\?.*)?$';
+
 // https://vitejs.dev/config/
-export default defineConfig({
-  plugins: [engineDepsPlugin(), react(), sharedPublicPlugin('../../shared/public')],
-  assetsInclude: ['**/*.wasm'],
-  resolve: {
-    alias: {
-      '@': path.resolve(__dirname, './src'),
-      '@smallgami/engine': path.resolve(__dirname, '../../../smallGami/src/index.ts'),
+export default defineConfig(({ mode }) => {
+  const apiUrl = loadEnv(mode, process.cwd(), 'VITE_').VITE_API_URL || 'http://localhost:5000';
+  const proxy = { [GENERATED_ASSET]: { target: apiUrl, changeOrigin: true } };
+
+  return {
+    plugins: [engineDepsPlugin(), react(), sharedPublicPlugin('../../shared/public')],
+    assetsInclude: ['**/*.wasm'],
+    resolve: {
+      alias: {
+        '@': path.resolve(__dirname, './src'),
+        '@smallgami/engine': path.resolve(__dirname, '../../../smallGami/src/index.ts'),
+      },
+    },
+    server: {
+      port: 3000,
+      open: true,
+      headers: {
+        'Cross-Origin-Embedder-Policy': 'require-corp',
+        'Cross-Origin-Opener-Policy': 'same-origin',
+      },
+      proxy,
     },
-  },
-  server: {
-    port: 3000,
-    open: true,
-    headers: {
-      'Cross-Origin-Embedder-Policy': 'require-corp',
-      'Cross-Origin-Opener-Policy': 'same-origin',
+    preview: {
+      proxy,
     },
-  },
-  optimizeDeps: {
-    exclude: ['@babylonjs/havok'],
-  },
-  build: {
-    outDir: 'build',
-    sourcemap: true,
-  },
+    optimizeDeps: {
+      exclude: ['@babylonjs/havok'],
+    },
+    build: {
+      outDir: 'build',
+      sourcemap: true,
+    },
+  };
 });
@@ -1,13 +1,15 @@
 import os
 import json
-import requests
 import asyncio
 import httpx
 from pathlib import Path
 from dotenv import load_dotenv
 from typing import Dict, List, Any, Optional
 from concurrent.futures import ThreadPoolExecutor
-from aiolimiter import AsyncLimiter
+import metrics
+import providers
+import scheduler
+import asset_store
 
 class AudioManager:
     def __init__(self, game_id: str, llm_endpoint: str, llm_payload: dict):
@@ -22,9 +24,6 @@ class AudioManager:
         # Audio generation endpoint configuration
         self.audio_base_url = os.getenv("AUDIO_BASE_URL", "http://gcrsandbox388:9996")
         self.prompts_dir = Path(__file__).resolve().parent / 'prompts'
-        
-        # Rate limiter for audio API (max 3 concurrent requests)
-        self.audio_limiter = AsyncLimiter(3, 1)  # 3 requests per second
     
     def _load_prompt(self, prompt_filename):
         """Load prompt from file in prompts directory."""
@@ -57,8 +56,12 @@ class AudioManager:
         }
         
         try:
-            response = requests.post(self.llm_endpoint, json=payload)
-            response.raise_for_status()
+            with metrics.track_call("llm", "sound_prompt", provider="askllm",
+                                    model=self.llm_payload.get("deployment_name", ""),
+                                    request_bytes=metrics.payload_size(payload)) as call:
+                response = providers.session().post(self.llm_endpoint, json=payload)
+                response.raise_for_status()
+                call.response_bytes = len(response.content)
             
             result = response.json()
             sound_prompt = result.strip() if isinstance(result, str) else str(result).strip()
@@ -73,7 +76,8 @@ class AudioManager:
     
     async def generate_audio_async(self, prompt: str, sound_name: str, sound_type: str, asset_id: int = 0) -> Optional[Dict[str, Any]]:
         """Generate audio using Stable Audio API"""
-        async with self.audio_limiter:
+        # Concurrency is capped by the scheduler's audio pool (shared with every other caller)
+        async with scheduler.slot_async("audio"):
             try:
                 # Set audio length and steps based on sound type
                 if sound_type in ("JUMP", "COLLISION", "PICKUP"):
@@ -94,19 +98,22 @@ class AudioManager:
                 
                 print(f"[Sound {asset_id}] Generating audio: {sound_name} with prompt: {prompt}")
                 
-                async with httpx.AsyncClient(timeout=httpx.Timeout(120.0)) as client:
-                    response = await client.post(url, json=payload, headers=headers)
-                    response.raise_for_status()
-                    
-                    # Check content type
-                    content_type = response.headers.get("Content-Type", "")
-                    if "audio/wav" not in content_type:
-                        error_text = response.text
-                        raise RuntimeError(f"Expected audio/wav, got {content_type}. Body: {error_text[:500]}")
-                    
-                    audio_bytes = await response.aread()
-                    if len(audio_bytes) < 4 or audio_bytes[:4] != b"RIFF":
-                        raise RuntimeError("Invalid WAV header (missing RIFF)")
+                async with providers.async_http_client(timeout=httpx.Timeout(120.0)) as client:
+                    with metrics.track_call("audio", sound_type.lower(), provider="stable-audio",
+                                            request_bytes=metrics.payload_size(payload)) as call:
+                        response = await client.post(url, json=payload, headers=headers)
+                        response.raise_for_status()
+                        
+                        # Check content type
+                        content_type = response.headers.get("Content-Type", "")
+                        if "audio/wav" not in content_type:
+                            error_text = response.text
+                            raise RuntimeError(f"Expected audio/wav, got {content_type}. Body: {error_text[:500]}")
+                        
+                        audio_bytes = await response.aread()
+                        if len(audio_bytes) < 4 or audio_bytes[:4] != b"RIFF":
+                            raise RuntimeError("Invalid WAV header (missing RIFF)")
+                        call.response_bytes = len(audio_bytes)
                     
                     print(f"[Sound {asset_id}] ✅ Generated {sound_name}: {len(audio_bytes)} bytes")
                     
@@ -143,8 +150,7 @@ class AudioManager:
                 game_id = self.game_id
                 
             # Create output directory (server-side assets folder)
-            output_dir = Path(__file__).parent / 'assets' / 'generated' / game_id
-            output_dir.mkdir(parents=True, exist_ok=True)
+            output_dir = asset_store.game_dir(game_id)
             
             # Also save to frontend public assets folder
             frontend_assets_dir = Path("../demo/public/assets") / game_id
@@ -4,6 +4,8 @@ import concurrent.futures
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 from _utils import make_schema_strict_compatible
+import scheduler
+import storage
 from schema import (
     JumpingGameDSLConfig,
     JumpingPlayerConfig,
@@ -201,10 +203,11 @@ class GameConfigurator:
             
             # Generate all configurations concurrently
             with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-                # Submit all configuration generation tasks
-                future_player = executor.submit(self._generate_player_config)
-                future_world = executor.submit(self._generate_world_config)
-                future_objects = executor.submit(self._generate_objects_config)
+                # Submit all configuration generation tasks (at the caller's scheduler priority)
+                priority = scheduler.current_priority()
+                future_player = executor.submit(scheduler.prioritized(priority, self._generate_player_config))
+                future_world = executor.submit(scheduler.prioritized(priority, self._generate_world_config))
+                future_objects = executor.submit(scheduler.prioritized(priority, self._generate_objects_config))
                 
                 # Collect results
                 player_config = future_player.result()
@@ -229,9 +232,8 @@ class GameConfigurator:
             output_filename = f"jumping_game_dsl_config.json"
             output_path = output_dir / output_filename
             
-            # Write the configuration to JSON file
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(dsl_config_dict, f, indent=2, ensure_ascii=False)
+            # Write the configuration to JSON file (atomically)
+            storage.write_json(output_path, dsl_config_dict)
             
             print(f"✅ DSL configuration written to: {output_path}")
             print(f"📊 Configuration Summary:")
@@ -7,9 +7,18 @@ import base64
 import concurrent.futures
 from typing import Dict, List, Any
 from VisualManager import VisualManager
+from image_handle import ImageHandle
 from AudioManager import AudioManager
 from GameConfigurator import GameConfigurator
 from _utils import make_schema_strict_compatible
+from analysis_index import get_index, prompt_version, content_hash
+from factory_journal import FactoryJournal
+import storage
+import asset_store
+from description_history import DescriptionHistory
+import metrics
+import providers
+import scheduler
 from schema import (
     ShootingGameDSLConfig,
     JumpingGameDSLConfig,
@@ -49,6 +58,7 @@ class Gami:
         self.prompts_dir = Path(__file__).resolve().parent / 'prompts'
 
         self.factory_data = None
+        self.analysis_report = None
         self.game_dimensions = None
         self.game_description = None
         
@@ -58,7 +68,7 @@ class Gami:
             self.factory_data = json.load(open(f"_data/{game_id}/factory_state.json", "r"))
             # self.game_dimensions = self.get_dimension_description(self.factory_data)
             # self.game_description = json.load(open(f"_data/{game_id}/jumping_game_description.json", "r"))
-            print(f"{colored(' :: ', 'green')} Hotloaded game data for {colored(game_id, "black", 'on_cyan')}")
+            print(f"{colored(' :: ', 'green')} Hotloaded game data for {colored(game_id, 'black', 'on_cyan')}")
     
     def set_game_id(self, game_id: str):
         self.game_id = game_id
@@ -75,17 +85,21 @@ class Gami:
             payload["response_format"] = response_format
         
         try:
-            response = requests.post(self.llm_endpoint, json=payload)
-            
-            # Check if response is successful
-            if response.status_code != 200:
-                raise Exception(f"API returned status code {response.status_code}: {response.text}")
-            
-            # Check if response has content
-            if not response.text.strip():
-                raise Exception("API returned empty response")
-            
-            return response.json()
+            with metrics.track_call("llm", "askLLM", provider="askllm",
+                                    model=self.llm_payload.get("deployment_name", ""),
+                                    request_bytes=metrics.payload_size(payload)) as call:
+                response = providers.session().post(self.llm_endpoint, json=payload)
+                
+                # Check if response is successful
+                if response.status_code != 200:
+                    raise Exception(f"API returned status code {response.status_code}: {response.text}")
+                
+                # Check if response has content
+                if not response.text.strip():
+                    raise Exception("API returned empty response")
+                
+                call.response_bytes = len(response.content)
+                return response.json()
             
         except requests.exceptions.JSONDecodeError as e:
             print(f"JSON decode error: {e}")
@@ -108,16 +122,23 @@ class Gami:
         except FileNotFoundError:
             raise FileNotFoundError(f"Prompt file not found: {prompt_path}")
 
-    def decompose_image(self, image_data):
-        # Load prompts from external files
-        print(" ==== start decompose image ==== ")
+    def _decomposition_prompt(self):
+        """System prompt, user prompt and strict schema used by decompose_image."""
         system_prompt = self._load_prompt('image_decomposition_system_prompt.txt')
         user_prompt = self._load_prompt('image_decomposition_user_prompt.txt')
-        
-        # Use schema from external file
         schema = ImageDecompositionConfig.model_json_schema()
-
         make_schema_strict_compatible(schema)
+        return system_prompt, user_prompt, schema
+
+    def _analysis_index(self):
+        """Analysis index for the current decomposition prompt version (shared across games)."""
+        system_prompt, user_prompt, schema = self._decomposition_prompt()
+        return get_index(prompt_version(system_prompt, user_prompt, json.dumps(schema, sort_keys=True)))
+
+    def decompose_image(self, image_data):
+        # Load prompts from external files
+        print(" ==== start decompose image ==== ")
+        system_prompt, user_prompt, schema = self._decomposition_prompt()
         
         response_format = {
             "type": "json_schema",
@@ -193,60 +214,143 @@ class Gami:
         
         return image_objects
 
-    def _analyze_single_image(self, image_obj: Dict[str, Any]) -> Dict[str, Any]:
-        """Analyze a single image object and return updated object with decomposition result."""
+    def _image_path(self, image_obj: Dict[str, Any]) -> Path:
+        return Path(__file__).resolve().parent / image_obj.get('fileUrl').replace(self.img_host_endpoint, '')
+
+    @staticmethod
+    def _has_analysis(image_obj: Dict[str, Any], version: str) -> bool:
+        """Whether the object holds a successful analysis made with prompt version `version`."""
+        content = image_obj.get('content')
+        return isinstance(content, dict) and not content.get('error') and image_obj.get('analysisVersion') == version
+
+    def _analyze_single_image(self, image_obj: Dict[str, Any], index=None, sha256=None):
+        """Analyze a single image object; returns (updated object, status).
+
+        An analysis is stamped with its prompt version ('analysisVersion'). status is
+        'skipped' when the object already holds an analysis of the current version
+        (kept as is, it may have been edited; it seeds the analysis index on a miss)
+        or the index holds these image bytes for that version, 'performed' after a
+        successful vision call, and 'failed' otherwise (the object is then returned
+        unchanged or with the error). Analyses of other prompt versions are redone.
+        sha256 of the image bytes, when the caller already has it, saves reading the
+        file again.
+        """
         try:
-            image_file_url = image_obj.get('fileUrl')
-            image_path = Path(__file__).resolve().parent / image_file_url.replace(self.img_host_endpoint, '')
+            image_path = self._image_path(image_obj)
             
             if not image_path.exists():
                 print(f"Warning: Image file not found: {image_path}")
-                return image_obj
+                return image_obj, 'failed'
             
+            index = index or self._analysis_index()
+            sha256 = sha256 or content_hash(image_path.read_bytes())
+            updated_obj = image_obj.copy()
+
+            cached = index.get(sha256)
+            if self._has_analysis(image_obj, index.version):
+                if cached is None:
+                    index.put(sha256, image_obj['content'])
+                return updated_obj, 'skipped'
+            if cached is not None:
+                updated_obj['content'] = cached
+                updated_obj['analysisVersion'] = index.version
+                return updated_obj, 'skipped'
+
             # Encode image to base64
             image_data = self._encode_image_to_base64(image_path)
             # Analyze the image
             decomposition_result = self.decompose_image(image_data)
             
             # Update the object with decomposition result
-            updated_obj = image_obj.copy()
             updated_obj['content'] = decomposition_result
-            
-            return updated_obj
+            if not index.put(sha256, decomposition_result):
+                return updated_obj, 'failed'
+            updated_obj['analysisVersion'] = index.version
+            return updated_obj, 'performed'
             
         except Exception as e:
             print(f"Error analyzing image {image_obj.get('id', 'unknown')}: {str(e)}")
             # Return original object if analysis fails
-            return image_obj
+            return image_obj, 'failed'
+
+    def _iter_image_analyses(self, image_objects: List[Dict[str, Any]]):
+        """Analyze image objects concurrently through the analysis index, yielding results as they complete.
+
+        Yields (position in image_objects, updated object, status). Objects sharing the same image
+        bytes are analyzed once; the repeats follow the first with status 'skipped' (keeping their
+        own analysis if it is of the current prompt version). When the consumer stops early, analyses that have not
+        started yet are cancelled.
+        """
+        groups = {}
+        for pos, img_obj in enumerate(image_objects):
+            try:
+                key = content_hash(self._image_path(img_obj).read_bytes())
+            except (OSError, AttributeError):
+                key = ('unreadable', pos)
+            groups.setdefault(key, []).append(pos)
+        index = self._analysis_index()
+        # An object that already holds a current analysis goes first, so its bytes need no vision call
+        for positions in groups.values():
+            positions.sort(key=lambda pos: not self._has_analysis(image_objects[pos], index.version))
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+        try:
+            # Submit one analysis task per distinct image
+            future_to_positions = {
+                executor.submit(scheduler.prioritized("batch", self._analyze_single_image),
+                                image_objects[positions[0]], index, key if isinstance(key, str) else None): positions
+                for key, positions in groups.items()
+            }
+            
+            for future in concurrent.futures.as_completed(future_to_positions):
+                positions = future_to_positions[future]
+                try:
+                    result, status = future.result()
+                except Exception as e:
+                    print(f"Error processing image {image_objects[positions[0]].get('fileUrl', 'unknown')}: {str(e)}")
+                    result, status = image_objects[positions[0]], 'failed'
+                yield positions[0], result, status
+                for pos in positions[1:]:
+                    if self._has_analysis(image_objects[pos], index.version):
+                        yield pos, image_objects[pos], 'skipped'
+                    elif 'content' in result and status != 'failed':
+                        yield pos, {**image_objects[pos], 'content': result['content'],
+                                    'analysisVersion': index.version}, 'skipped'
+                    else:
+                        yield pos, image_objects[pos], 'failed'
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _print_analysis_report(report):
+        print(f"Image analysis: {report['images']} images, {report['skipped']} skipped (analysis index), "
+              f"{report['performed']} performed, {report['failed']} failed")
+
+    def _analyze_images(self, image_objects: List[Dict[str, Any]]):
+        """Analyze image objects concurrently through the analysis index.
+
+        Returns the updated objects (in input order) and a report with the number of
+        images and of analyses skipped (index hits and repeats of the same bytes), performed and failed.
+        """
+        report = {'images': len(image_objects), 'skipped': 0, 'performed': 0, 'failed': 0}
+        analyzed_objects = list(image_objects)
+        for pos, result, status in self._iter_image_analyses(image_objects):
+            analyzed_objects[pos] = result
+            report[status] += 1
+        self._print_analysis_report(report)
+        return analyzed_objects, report
 
     def analyze_factory_state(self, factory_state_filename: str):
-        """Analyze factory state JSON file, process all images concurrently, and update the file."""
+        """Analyze all images of a factory state JSON file concurrently (index hits are not re-analyzed)."""
         try:
             # Load factory state from file
-            factory_data = json.load(open(factory_state_filename))
+            with open(factory_state_filename, 'r', encoding='utf-8') as f:
+                factory_data = json.load(f)
             
-            factory_store = factory_data.get('factory_store', {})
+            factory_store = factory_data.get('factory_store', [])
+            image_objects = [obj for obj in factory_store if obj.get('dataType') == 'image']
         
-            # Process images concurrently
-            with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-                # Submit all image analysis tasks
-                future_to_obj = {
-                    executor.submit(self._analyze_single_image, img_obj): img_obj 
-                    for img_obj in factory_store if img_obj.get('dataType') == 'image'
-                }
-                
-                # Collect results
-                analyzed_objects = []
-                for future in concurrent.futures.as_completed(future_to_obj):
-                    try:
-                        result = future.result()
-                        analyzed_objects.append(result)
-                    except Exception as e:
-                        original_obj = future_to_obj[future]
-                        print(f"Error processing image {original_obj.get('file', 'unknown')}: {str(e)}")
-                        analyzed_objects.append(original_obj)
-            
-            print(f"Successfully analyzed {len(analyzed_objects)} images")
+            analyzed_objects, self.analysis_report = self._analyze_images(image_objects)
             
             return analyzed_objects
             
@@ -255,33 +359,29 @@ class Gami:
 
     ## pipeline2: get game description from factory state
     def generate_game_description(self, user_operation: str, prompt: str = None):
+        history = DescriptionHistory(f"_data/{self.game_id}")
         if user_operation == "hotload":
             if prompt:
                 idx = int(prompt)
             else:
                 idx = -1
-            with open(f"_data/{self.game_id}/game_description.json", 'r', encoding='utf-8') as f:
-                self.game_description = json.load(f)[idx]
+            self.game_description = history.get(idx)
             return self.game_description
         system_prompt = self._load_prompt('game_description_system_prompt.txt')
         user_prompt = self._load_prompt('game_description_user_prompt.txt')
         factory_store = self.factory_data.get('factory_store', [])
-        game_description_filepath = f"_data/{self.game_id}/game_description.json"
-        if os.path.exists(game_description_filepath):
-            with open(game_description_filepath, 'r', encoding='utf-8') as f:
-                previous_game_description = json.load(f)
-        else:
-            previous_game_description = []
         if (user_operation == 'regenerate'):
-            previous_game_description.pop(-1)
+            # The newest entry is the one being regenerated
+            previous_game_description = history.tail(3, skip_last=1)
             user_prompt = user_prompt.replace("__user_operation__", prompt)
         elif (user_operation == 'initialize'):
             previous_game_description = []
             user_prompt = user_prompt.replace("__user_operation__", 'generate intial game description' + " : " + prompt)
         else:
+            previous_game_description = history.tail(3)
             user_prompt = user_prompt.replace("__user_operation__", user_operation + " : " + prompt)
         user_prompt = user_prompt.replace("__asset_list__", json.dumps(factory_store))
-        user_prompt = user_prompt.replace("__previous_game_description__", json.dumps(previous_game_description[-3:]))
+        user_prompt = user_prompt.replace("__previous_game_description__", json.dumps(previous_game_description))
 
         schema = JumpGameDescription.model_json_schema()
         make_schema_strict_compatible(schema)
@@ -294,19 +394,32 @@ class Gami:
             }
         }
         result = self.askLLM(user_prompt, system_prompt, response_format=response_format, temperature=0.4)
-        previous_game_description.append({'id': user_operation+":"+prompt, 'content': result})
+        entry = {'id': user_operation+":"+prompt, 'content': result}
         print(f"Game description generated successfully!")
-        with open(game_description_filepath, 'w', encoding='utf-8') as f:
-            json.dump(previous_game_description, f, indent=2, ensure_ascii=False)
-        self.game_description = {'id': user_operation+":"+prompt, 'content': result}
+        if (user_operation == 'regenerate'):
+            history.replace_last(entry)
+        elif (user_operation == 'initialize'):
+            history.reset(entry)
+        else:
+            history.append(entry)
+        self.game_description = entry
         return result
 
         # result = self.askLLM(user_prompt, system_prompt, response_format=JumpGameDescription.model_json_schema(), temperature=0.9)
         # return result
         # result = self.askLLM(user_prompt, system_prompt, response_format=JumpGameDescription.model_json_schema(), temperature=0.9)
 
-    def update_factory_store_with_analysis(self, factory_state_filename: str, output_filename: str = None):
-        """Analyze factory state and update the original JSON file with analyzed results while preserving non-image data."""
+    def update_factory_store_with_analysis(self, factory_state_filename: str, output_filename: str = None,
+                                           progressive: bool = False):
+        """Analyze factory state and update the original JSON file with analyzed results while preserving non-image data.
+
+        With progressive=True, results are journaled and checkpointed as they complete
+        (see analyze_factory_state_progressive).
+        """
+        if progressive:
+            for _ in self.analyze_factory_state_progressive(factory_state_filename, output_filename):
+                pass
+            return self.factory_data
         try:
             # Load original factory state from file
             with open(factory_state_filename, 'r', encoding='utf-8') as f:
@@ -314,64 +427,16 @@ class Gami:
             
             factory_store = factory_data.get('factory_store', [])
             
-            # Create a mapping of image objects by their id for quick lookup
-            image_objects_map = {}
-            non_image_objects = []
-            
-            # Separate image and non-image objects
-            for obj in factory_store:
-                if obj.get('dataType') == 'image':
-                    # Check if image has already been analyzed (content is a dictionary)
-                    content = obj.get('content')
-                    if isinstance(content, dict) and not content.get('error'):
-                        print(f"Image {obj.get('fileUrl', 'unknown')} already analyzed, skipping...")
-                        non_image_objects.append(obj)  # Treat as non-image since it's already processed
-                    else:
-                        image_objects_map[obj.get('id')] = obj
-                else:
-                    non_image_objects.append(obj)
-            
-            # Analyze only the image objects
-            if image_objects_map:
-                print(f"Found {len(image_objects_map)} image objects to analyze")
-                
-                # Process images concurrently
-                with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-                    # Submit all image analysis tasks
-                    future_to_obj = {
-                        executor.submit(self._analyze_single_image, img_obj): img_obj 
-                        for img_obj in image_objects_map.values()
-                    }
-                    
-                    # Collect analyzed results
-                    analyzed_image_objects = []
-                    for future in concurrent.futures.as_completed(future_to_obj):
-                        try:
-                            result = future.result()
-                            analyzed_image_objects.append(result)
-                        except Exception as e:
-                            original_obj = future_to_obj[future]
-                            print(f"Error processing image {original_obj.get('fileUrl', 'unknown')}: {str(e)}")
-                            analyzed_image_objects.append(original_obj)
-                
-                print(f"Successfully analyzed {len(analyzed_image_objects)} images")
-            else:
-                analyzed_image_objects = []
-                print("No image objects found to analyze")
-                
-            # Combine analyzed image objects with non-image objects
-            # Maintain the original order by reconstructing the factory_store list
-            updated_factory_store = []
-            analyzed_images_by_id = {obj.get('id'): obj for obj in analyzed_image_objects}
+            # Every image goes through the analysis index: only image bytes without an analysis
+            # under the current prompt version reach the vision model, whatever the item's id or content
+            image_positions = [pos for pos, obj in enumerate(factory_store) if obj.get('dataType') == 'image']
+            analyzed_image_objects, self.analysis_report = self._analyze_images(
+                [factory_store[pos] for pos in image_positions])
             
-            for original_obj in factory_store:
-                obj_id = original_obj.get('id')
-                if original_obj.get('dataType') == 'image' and obj_id in analyzed_images_by_id:
-                    # Use the analyzed version
-                    updated_factory_store.append(analyzed_images_by_id[obj_id])
-                else:
-                    # Keep the original non-image object
-                    updated_factory_store.append(original_obj)
+            # Maintain the original order, replacing image objects with their analyzed versions
+            updated_factory_store = list(factory_store)
+            for pos, analyzed_obj in zip(image_positions, analyzed_image_objects):
+                updated_factory_store[pos] = analyzed_obj
             
             # Update the factory data with the new factory_store
             factory_data['factory_store'] = updated_factory_store
@@ -380,9 +445,8 @@ class Gami:
             if output_filename is None:
                 output_filename = factory_state_filename
             
-            # Save the updated factory data back to file
-            with open(output_filename, 'w', encoding='utf-8') as f:
-                json.dump(factory_data, f, indent=2, ensure_ascii=False)
+            # Save the updated factory data back to file (atomically)
+            storage.write_json(output_filename, factory_data)
             
             self.factory_data = factory_data
             return factory_data
@@ -391,6 +455,54 @@ class Gami:
             print(f"Error updating factory store: {str(e)}")
             raise
 
+    def analyze_factory_state_progressive(self, factory_state_filename: str, output_filename: str = None):
+        """Progressive update_factory_store_with_analysis: yields each image result as it completes.
+
+        Every result is appended to a write-ahead journal next to the output file before it is
+        yielded, and the file is rewritten atomically every FACTORY_CHECKPOINT_EVERY results or
+        FACTORY_CHECKPOINT_SECONDS (and at the end), so a crash loses no finished analysis: the
+        next run replays the journal first. self.factory_data always holds the state analyzed
+        so far, so the consumer can start generate_game_description on partial results.
+
+        Yields {'event': 'image', 'position', 'id', 'fileUrl', 'status', 'content', 'completed', 'total'}
+        per image and finally {'event': 'done', 'report': {...}}.
+        """
+        output_filename = output_filename or factory_state_filename
+        with open(factory_state_filename, 'r', encoding='utf-8') as f:
+            factory_data = json.load(f)
+        journal = FactoryJournal(output_filename)
+        if journal.recover(factory_data):
+            journal.checkpoint(factory_data)
+
+        factory_store = factory_data.setdefault('factory_store', [])
+        self.factory_data = factory_data
+        image_positions = [pos for pos, obj in enumerate(factory_store) if obj.get('dataType') == 'image']
+        report = {'images': len(image_positions), 'skipped': 0, 'performed': 0, 'failed': 0}
+        self.analysis_report = report
+
+        try:
+            completed = 0
+            for pos, result, status in self._iter_image_analyses([factory_store[p] for p in image_positions]):
+                position = image_positions[pos]
+                factory_store[position] = result
+                report[status] += 1
+                completed += 1
+                if status != 'failed':
+                    journal.append({'position': position, 'id': result.get('id'),
+                                    'fileUrl': result.get('fileUrl'), 'content': result.get('content'),
+                                    'analysisVersion': result.get('analysisVersion')})
+                    if journal.due():
+                        journal.checkpoint(factory_data)
+                yield {'event': 'image', 'position': position, 'id': result.get('id'),
+                       'fileUrl': result.get('fileUrl'), 'status': status, 'content': result.get('content'),
+                       'completed': completed, 'total': len(image_positions)}
+        finally:
+            # Also on early exit (client gone): keep what finished
+            journal.checkpoint(factory_data)
+
+        self._print_analysis_report(report)
+        yield {'event': 'done', 'report': report}
+
 
     def _get_reference_image_path(self, reference_id):
         """Get file path for reference image from factory store using ID."""
@@ -413,19 +525,15 @@ class Gami:
             print(f"Error getting reference image path for ID {reference_id}: {str(e)}")
             return None
 
-    def _save_generated_image(self, image_b64, asset_name):
-        """Save generated image to assets folder with appropriate naming."""
+    def _save_generated_image(self, image, asset_name):
+        """Save generated image (ImageHandle or base64) to assets folder with appropriate naming."""
         try:
-            if not image_b64:
+            image = ImageHandle.coerce(image)
+            if not image:
                 return None
             
-            # Remove data URL prefix if present
-            if ',' in image_b64:
-                image_b64 = image_b64.split(',')[1]
-            
             # Create output directory
-            output_dir = Path(__file__).parent / 'assets' / 'generated' / self.game_id
-            output_dir.mkdir(parents=True, exist_ok=True)
+            output_dir = asset_store.game_dir(self.game_id)
             
            
             filename = f"{asset_name}.png"
@@ -433,10 +541,7 @@ class Gami:
             
             output_path = output_dir / filename
             
-            # Decode and save
-            image_data = base64.b64decode(image_b64)
-            with open(output_path, 'wb') as f:
-                f.write(image_data)
+            image.save(output_path)
             
             print(f"✅ Saved {asset_name} to: {output_path}")
             return str(output_path)
@@ -467,7 +572,8 @@ class Gami:
             )
             
             # Generate the jumping game DSL configuration
-            config_path = configurator.generate_jump_dsl_config()
+            with scheduler.priority("batch"):
+                config_path = configurator.generate_jump_dsl_config()
             
             print(f"🎉 Configuration generation completed for {mechanism} game!")
             return config_path
@@ -514,18 +620,17 @@ class Gami:
                 else:
                     prompt = "extract a single object in the image as a " + asset_type + " with the following description: " + visual_desc + " and the style should be " + visual_style + "only the static single object, clear background with distinct color difference from the object so we can remove the background without affecting the object, no animation, remove object that is not part of this standalone object, generate the asset with clear background."
 
-                with open(reference_path, 'rb') as f:
-                    reference_b64 = base64.b64encode(f.read()).decode('utf-8')
+                # Kept as bytes; encoded once if a provider needs base64
+                reference = ImageHandle.from_file(reference_path)
                         
-                # Generate base image with GPT editing
-                gpt_edited_image = self.visual_manager.generate_image_with_gpt_edit(
-                    prompt, reference_b64, reference_path
-                )
-
-                # post-processing the iamges
                 if asset_type == 'world':
-                    generated_image = self.visual_manager._outpaint_image(f"panorama, {prompt}", gpt_edited_image)
+                    # GPT edit + outpaint, each stage cached so a retry resumes where it failed
+                    generated_image = self.visual_manager.generate_reference_skybox(prompt, reference, reference_path)
                 else:
+                    # Generate base image with GPT editing, then remove the background
+                    gpt_edited_image = self.visual_manager.generate_image_with_gpt_edit(
+                        prompt, reference, reference_path
+                    )
                     generated_image = self.visual_manager._remove_background(gpt_edited_image)
             
             else: 
@@ -551,7 +656,7 @@ class Gami:
                 return {'success': False, 'error': 'Failed to generate image'}
         
         with concurrent.futures.ThreadPoolExecutor(max_workers=6) as executor:
-            future_to_task = {executor.submit(generate_single_asset, task): task for task in tasks}
+            future_to_task = {executor.submit(scheduler.prioritized("batch", generate_single_asset), task): task for task in tasks}
             results = {}
             
             for future in concurrent.futures.as_completed(future_to_task):
@@ -6,16 +6,18 @@ import base64
 from pathlib import Path
 from openai import OpenAI
 from typing import Union
+import metrics
+import providers
 
 
 class MediaInterpreter:
     
     def __init__(self, api_key=None):
-        self.api_key = api_key or os.getenv('OPENAI_API_KEY')
+        self.api_key = providers.api_key(api_key or os.getenv('OPENAI_API_KEY'))
         if not self.api_key:
             raise ValueError("OpenAI API key not provided and OPENAI_API_KEY environment variable not set")
         
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = OpenAI(api_key=self.api_key, http_client=providers.http_client())
     
     def _encode_image_to_base64(self, image_path: str) -> str:
         with open(image_path, 'rb') as image_file:
@@ -54,24 +56,27 @@ class MediaInterpreter:
             
             
             # Call OpenAI's vision API
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": image_data
+            with metrics.track_call("vision", "interpret_image", provider="openai", model=model,
+                                    request_bytes=len(image_data) + len(prompt)) as call:
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": prompt},
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": image_data
+                                    }
                                 }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=max_tokens
-            )
+                            ]
+                        }
+                    ],
+                    max_tokens=max_tokens
+                )
+                call.set_usage(metrics.extract_usage(response))
             
             description = response.choices[0].message.content.strip()
             # print(f" :: Image interpretation: {description}")
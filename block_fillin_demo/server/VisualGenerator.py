@@ -1,11 +1,26 @@
 """
 VisualGenerator: Handles image generation for game assets using OpenAI's API
+
+One instance is shared by all requests (app.config['VISUAL_GENERATOR']): the
+OpenAI client is thread-safe and keeps its connection pool across requests,
+and no method stores per-call state on the instance.
 """
 import os
 import base64
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
 from pathlib import Path
+import metrics
+import providers
+import scheduler
+import asset_store
+from config import TEXTURE_LIBRARY_MODE
+from texture_library import TextureLibrary
+from logger import get_logger
+from texture_processing import process_ground_texture, levels_manifest
+
+log = get_logger(__name__)
 
 
 class VisualGenerator:
@@ -21,11 +36,18 @@ class VisualGenerator:
         Args:
             api_key (str, optional): OpenAI API key. If not provided, reads from OPENAI_API_KEY env variable.
         """
-        self.api_key = api_key or os.getenv('OPENAI_API_KEY')
+        self.api_key = providers.api_key(api_key or os.getenv('OPENAI_API_KEY'))
         if not self.api_key:
             raise ValueError("OpenAI API key not provided and OPENAI_API_KEY environment variable not set")
         
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = OpenAI(api_key=self.api_key, http_client=providers.http_client())
+
+        # Textures of earlier worlds, reused for similar descriptions
+        self.texture_library = TextureLibrary() if TEXTURE_LIBRARY_MODE != 'off' else None
+        # Texture work a request does not wait for: library variants and library entries
+        self._texture_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="texture-background")
+        self._pending_variants = set()
+        self._pending_lock = threading.Lock()
     
     def generate_ground_texture(self, world_description, player_description=None, size="1024x1024", model="gpt-image-1-mini"):
         
@@ -36,12 +58,16 @@ class VisualGenerator:
         
         try:
             # Call OpenAI's image generation API
-            result = self.client.images.generate(
-                model=model,
-                prompt=full_prompt,
-                n=1,
-                size=size
-            )
+            with metrics.track_call("image", "ground_texture", provider="openai", model=model,
+                                    request_bytes=len(full_prompt)) as call:
+                result = self.client.images.generate(
+                    model=model,
+                    prompt=full_prompt,
+                    n=1,
+                    size=size
+                )
+                call.set_usage(metrics.extract_usage(result))
+                call.response_bytes = len(result.data[0].b64_json or "") if result.data else 0
             
             # Try to get image data in different formats
             image_data = result.data[0]
@@ -63,43 +89,97 @@ class VisualGenerator:
             print(f" :: Error generating ground texture: {e}")
             raise
     
-    def save_texture_to_assets(self, texture_bytes, output_dir, filename=None):
-
-        import time
-        
+    def save_texture_to_assets(self, texture_bytes, output_dir, filename=None, levels=None):
+        """
+        Make the texture tile seamlessly, write it with its mip chain and return the
+        manifest: {"file": full-size filename, "levels": [{"size", "file"}, ...]}.
+        Pass levels (from process_ground_texture) when already processed. Without a
+        filename the texture is named by its content hash (ground_<hash>.png).
+        """
         output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        if not filename:
-            timestamp = int(time.time() * 1000)
-            filename = f'ground_{timestamp}.png'
-        
-        texture_path = output_dir / filename
-        
         try:
-            with open(texture_path, 'wb') as f:
-                f.write(texture_bytes)
-                f.flush()
-                os.fsync(f.fileno())
+            if levels is None:
+                levels = process_ground_texture(texture_bytes)
+            if not filename:
+                filename = asset_store.content_filename('ground', levels[0][1], '.png')
+            manifest = levels_manifest(filename, [size for size, _ in levels])
+            written = False
+            for level, (_, data) in zip(manifest['levels'], levels):
+                written = asset_store.write(output_dir / level['file'], data) or written
+            metrics.ASSET_WRITES.inc(kind='ground', result='stored' if written else 'deduplicated')
+            asset_store.record('ground', filename, levels=len(levels), deduplicated=not written)
             
-            print(f" :: Texture saved to: {texture_path}")
-            return filename
+            log.info("Texture saved", path=str(output_dir / filename), levels=len(levels))
+            return manifest
             
         except Exception as e:
             print(f" :: Error saving texture: {e}")
             raise
     
+    def _generate_variant(self, entry_id, world_description, player_description, size, model):
+        try:
+            texture_bytes = self.generate_ground_texture(world_description, player_description, size=size, model=model)
+            # Grow the matched entry's pool, even when this description only resembles its key
+            self.texture_library.add_variant(entry_id, process_ground_texture(texture_bytes))
+        except Exception as e:
+            log.warning("Error generating ground texture variant", entry_id=entry_id, error=str(e))
+        finally:
+            with self._pending_lock:
+                self._pending_variants.discard(entry_id)
+
+    def _schedule_variant(self, entry, world_description, player_description, size, model):
+        """Grow an entry's variant pool in the background (one generation per entry at a time)"""
+        with self._pending_lock:
+            if entry.id in self._pending_variants:
+                return
+            self._pending_variants.add(entry.id)
+        self._texture_executor.submit(scheduler.prioritized("batch", self._generate_variant), entry.id, world_description, player_description, size, model)
+
+    def _from_library(self, output_dir, world_description, player_description, filename, size, model):
+        """Manifest of a library texture matching world_description (saved to output_dir), or None"""
+        entry, score = self.texture_library.lookup(world_description)
+        if entry is None:
+            metrics.TEXTURE_LIBRARY_LOOKUPS.inc(result="miss")
+            return None
+        try:
+            saved = self.texture_library.materialize(entry, output_dir, filename)
+        except OSError as e:
+            # The variant was evicted between lookup and link
+            log.info("Texture library entry unavailable, generating instead", entry_id=entry.id, error=str(e))
+            metrics.TEXTURE_LIBRARY_LOOKUPS.inc(result="miss")
+            return None
+
+        if TEXTURE_LIBRARY_MODE == 'refresh' and self.texture_library.needs_variants(entry):
+            self._schedule_variant(entry, world_description, player_description, size, model)
+            metrics.TEXTURE_LIBRARY_LOOKUPS.inc(result="refresh")
+        else:
+            metrics.TEXTURE_LIBRARY_LOOKUPS.inc(result="hit")
+        log.info("Ground texture from library", similarity=round(score, 2), prompt=entry.prompt, file=saved['file'])
+        return saved
+
     def generate_and_save_ground_texture(self, output_dir, world_description=None, player_description=None, filename=None, size="1024x1024", model="gpt-image-1-mini"):
+        if self.texture_library and world_description:
+            saved = self._from_library(output_dir, world_description, player_description, filename, size, model)
+            if saved:
+                return saved
+
         texture_bytes = self.generate_ground_texture(
             world_description=world_description,
             player_description=player_description,
             size=size,
             model=model
         )
-        
-        return self.save_texture_to_assets(
-            texture_bytes=texture_bytes,
-            output_dir=output_dir,
-            filename=filename
-        )
+        # Optimizing the PNGs would cost the request 2-4x the encode time; the file sizes differ by ~10%
+        levels = process_ground_texture(texture_bytes, optimize=False)
+        saved = self.save_texture_to_assets(texture_bytes, output_dir, filename, levels=levels)
+        if self.texture_library and world_description:
+            self._texture_executor.submit(scheduler.prioritized("batch", self._add_to_library), world_description, levels)
+        return saved
 
+    def _add_to_library(self, world_description, levels):
+        try:
+            self.texture_library.add(world_description, levels)
+        except Exception as e:
+            log.exception("Error adding ground texture to the library", error=str(e))
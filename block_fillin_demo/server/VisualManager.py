@@ -1,11 +1,16 @@
 import os
-import requests
 import base64
 import json
 from pathlib import Path
 from dotenv import load_dotenv
 from schema import AssetGenerationPromptConfig
 from _utils import make_schema_strict_compatible
+from skybox_pipeline import SkyboxPipeline
+from config import REMBG_API
+from image_handle import ImageHandle
+import matting
+import metrics
+import providers
 from openai import OpenAI
 from io import BytesIO
 from azure.identity import ChainedTokenCredential, AzureCliCredential, ManagedIdentityCredential, get_bearer_token_provider
@@ -28,6 +33,7 @@ class VisualManager:
         self.sd_url2 = os.getenv("SD_URL2","http://gcrsandbox388:5002/")  # For background removal
         self.sd_checkpoint = os.getenv("SD_CHECKPOINT","sd_xl_base_1.0.safetensors")  # For asset generation
         self.skybox_checkpoint = os.getenv("SKYBOX_CHECKPOINT","dreamshaper_8.safetensors")  # For skybox generation
+        self.skybox_pipeline = SkyboxPipeline(self)
     
     def analyze_image(self, image_data, prompt, system_prompt, response_format=None):
         # Prepare the message with image
@@ -55,7 +61,11 @@ class VisualManager:
         if response_format:
             payload["response_format"] = response_format
             
-        response = requests.post(self.llm_endpoint, json=payload)
+        with metrics.track_call("vision", "analyze_image", provider="askllm",
+                                model=self.llm_payload.get("deployment_name", ""),
+                                request_bytes=metrics.payload_size(payload)) as call:
+            response = providers.session().post(self.llm_endpoint, json=payload)
+            call.response_bytes = len(response.content)
         return response.json()
     
     def _load_prompt(self, prompt_filename):
@@ -94,26 +104,30 @@ class VisualManager:
             
         return askllm(system_prompt, user_prompt, response_format)
     
-    def generate_image_with_gpt_edit(self, prompt, reference_image_b64, reference_filename=None):
+    def generate_image_with_gpt_edit(self, prompt, reference_image, reference_filename=None):
         """ Generate image using GPT image editing endpoint.
         Args:
             prompt (str): Text prompt for image editing
-            reference_image_b64 (str): Base64 encoded reference image    
+            reference_image (ImageHandle or str): Reference image (handle or base64)    
         Returns:
-            str: Base64 encoded generated image
+            ImageHandle: Generated image
         """
+        reference_image = ImageHandle.coerce(reference_image)
         if self.use_internal_server:
             try:
                 payload = {
                     "prompt": prompt,
-                    "image": reference_image_b64
+                    "image": reference_image.b64()
                 }
                 
-                response = requests.post(self.gpt_image_endpoint, json=payload)
-                response.raise_for_status()
+                with metrics.track_call("image", "gpt_image_edit", provider="askllm", model="gpt-image-1",
+                                        request_bytes=metrics.payload_size(payload)) as call:
+                    response = providers.session().post(self.gpt_image_endpoint, json=payload)
+                    response.raise_for_status()
+                    call.response_bytes = len(response.content)
                 
                 result = response.json()
-                return result.get('image')
+                return ImageHandle.from_b64(result.get('image'))
                 
             except Exception as e:
                 print(f"Error generating image with GPT edit: {str(e)}")
@@ -137,22 +151,24 @@ class VisualManager:
                 api_key=token,
                 base_url=endpoint
             )
-            reference_path = reference_filename
+            # Multipart upload of the bytes we already hold
+            reference_name = Path(reference_filename).name if reference_filename else "reference.png"
 
-            with open(reference_path, 'rb') as image_file:
+            with metrics.track_call("image", "gpt_image_edit", provider="openai", model=deployment_name,
+                                    request_bytes=len(reference_image)) as call:
                 result = client.images.edit(
                     model=deployment_name,
                     prompt=prompt,
                     n=1,
-                    image=image_file, 
+                    image=(reference_name, reference_image.data), 
                     size="1024x1024",
                     extra_query={"api-version": api_version}
                 )
-            image_base64 = result.data[0].b64_json
-            return image_base64
+                call.set_usage(metrics.extract_usage(result))
+            return ImageHandle.from_b64(result.data[0].b64_json)
 
     
-    def _generate_sd_image(self, prompt, negative_prompt="blurry, low quality, distorted, watermark, text", width=1024, height=1024, steps=20, cfg_scale=7):
+    def _generate_sd_image(self, prompt, negative_prompt="blurry, low quality, distorted, watermark, text", width=1024, height=1024, steps=20, cfg_scale=7, seed=-1):
         """ generate images using Stable Diffusion.
         Args:
             prompt (str): Text prompt for image generation
@@ -160,8 +176,9 @@ class VisualManager:
             height (int): Image height (default: 1024)
             steps (int): Number of generation steps (default: 20)
             cfg_scale (float): CFG scale (default: 7)
+            seed (int): SD seed, -1 for random (default: -1)
         Returns:
-            str: Base64 encoded generated image
+            ImageHandle: Generated image
         """
         try:
             url = self.sd_url1 + "sdapi/v1/txt2img"
@@ -169,7 +186,7 @@ class VisualManager:
             request_data = {
                 "prompt": prompt,
                 "steps": steps,
-                "seed": -1,
+                "seed": seed,
                 "negative_prompt": negative_prompt,
                 "cfg_scale": cfg_scale,
                 "user_token": 0,
@@ -180,28 +197,52 @@ class VisualManager:
                 "height": height,
             }
             
-            response = requests.post(url, json=request_data, headers={"Content-Type": "application/json"})
-            response.raise_for_status()
+            with metrics.track_call("image", "txt2img", provider="stable-diffusion", model=self.sd_checkpoint,
+                                    request_bytes=metrics.payload_size(request_data)) as call:
+                response = providers.session().post(url, json=request_data, headers={"Content-Type": "application/json"})
+                response.raise_for_status()
+                call.response_bytes = len(response.content)
             
             result = response.json()
-            return result.get('images', [None])[0]
+            return ImageHandle.from_b64(result.get('images', [None])[0])
             
         except Exception as e:
             print(f"Error generating SD image: {str(e)}")
             return None
     
-    def _remove_background(self, image_b64):
+    def _remove_background(self, image):
+        """ remove background from an image with the configured matting backend (see matting.py).
+        Args:
+            image (ImageHandle or str): Input image (handle or base64)  
+        Returns:
+            ImageHandle: Image with background removed
+        """
+        image = ImageHandle.coerce(image)
+        if not image:
+            return None
+        try:
+            return matting.remove_background(image, self._remove_background_remote)
+        except Exception as e:
+            print(f"Error removing background locally, using rembg: {str(e)}")
+            return self._remove_background_remote(image)
+    
+    def _remove_background_remote(self, image):
         """ remove background from an image using rembg.
+        REMBG_API=native posts the PNG bytes to the rembg server's multipart /api/remove
+        and gets PNG bytes back; the default goes through the JSON (base64) /rembg endpoint.
         Args:
-            image_b64 (str): Base64 encoded input image  
+            image (ImageHandle or str): Input image (handle or base64)  
         Returns:
-            str: Base64 encoded image with background removed
+            ImageHandle: Image with background removed
         """
+        image = ImageHandle.coerce(image)
+        if REMBG_API == "native":
+            return self._remove_background_native(image)
         try:
             url = self.sd_url2 + "rembg"
             
             request_data = {
-                "input_image": image_b64,
+                "input_image": image.b64(),
                 "model": "isnet-general-use",
                 "return_mask": False,
                 "alpha_matting": False,
@@ -210,11 +251,37 @@ class VisualManager:
                 "alpha_matting_erode_size": 10,
             }
             
-            response = requests.post(url, json=request_data, headers={"Content-Type": "application/json"})
-            response.raise_for_status()
+            with metrics.track_call("image", "remove_background", provider="rembg", model=request_data["model"],
+                                    request_bytes=metrics.payload_size(request_data)) as call:
+                response = providers.session().post(url, json=request_data, headers={"Content-Type": "application/json"})
+                response.raise_for_status()
+                call.response_bytes = len(response.content)
             
             result = response.json()
-            return result.get('image')
+            return ImageHandle.from_b64(result.get('image'))
+            
+        except Exception as e:
+            print(f"Error removing background: {str(e)}")
+            return None
+    
+    def _remove_background_native(self, image):
+        """ remove background with the rembg server's own API (multipart upload, binary response).
+        Args:
+            image (ImageHandle): Input image
+        Returns:
+            ImageHandle: Image with background removed
+        """
+        try:
+            url = self.sd_url2 + "api/remove"
+            model = "isnet-general-use"
+            
+            with metrics.track_call("image", "remove_background", provider="rembg", model=model,
+                                    request_bytes=len(image)) as call:
+                response = providers.session().post(url, data={"model": model}, files={"file": ("image.png", image.data, "image/png")})
+                response.raise_for_status()
+                call.response_bytes = len(response.content)
+            
+            return ImageHandle(data=response.content)
             
         except Exception as e:
             print(f"Error removing background: {str(e)}")
@@ -226,7 +293,7 @@ class VisualManager:
         Args:
             prompt (str): Text prompt for asset generation  
         Returns:
-            str: Base64 encoded image with transparent background
+            ImageHandle: Image with transparent background
         """
         # Step 1: Generate image with SD
         negative_prompt = "background, scenery, extra characters, text, clutter"
@@ -244,17 +311,18 @@ class VisualManager:
         
         return transparent_image
     
-    def _outpaint_image(self, prompt, base_image_b64, width=512, height=512, steps=20, cfg_scale=7):
+    def _outpaint_image(self, prompt, base_image, width=512, height=512, steps=20, cfg_scale=7, seed=-1):
         """ outpaint an image using Stable Diffusion.
         Args:
             prompt (str): Text prompt for outpainting
-            base_image_b64 (str): Base64 encoded base image
+            base_image (ImageHandle or str): Base image (handle or base64)
             width (int): Output width (default: 512)
             height (int): Output height (default: 512)
             steps (int): Number of generation steps (default: 20)
             cfg_scale (float): CFG scale (default: 7)  
+            seed (int): SD seed, -1 for random (default: -1)
         Returns:
-            str: Base64 encoded outpainted image
+            ImageHandle: Outpainted image
         """
         try:
             url = self.sd_url1 + "sdapi/v1/img2img"
@@ -262,12 +330,12 @@ class VisualManager:
             request_data = {
                 "prompt": prompt,
                 "steps": steps,
-                "seed": -1,
+                "seed": seed,
                 "negative_prompt": "",
                 "cfg_scale": cfg_scale,
                 "width": width,
                 "height": height,
-                "init_images": [base_image_b64],
+                "init_images": [ImageHandle.coerce(base_image).b64()],
                 "override_settings": {
                     "sd_model_checkpoint": self.skybox_checkpoint,
                 },
@@ -287,56 +355,85 @@ class VisualManager:
                 },
             }
             
-            response = requests.post(url, json=request_data, headers={"Content-Type": "application/json"})
-            response.raise_for_status()
+            with metrics.track_call("image", "outpaint", provider="stable-diffusion", model=self.skybox_checkpoint,
+                                    request_bytes=metrics.payload_size(request_data)) as call:
+                response = providers.session().post(url, json=request_data, headers={"Content-Type": "application/json"})
+                response.raise_for_status()
+                call.response_bytes = len(response.content)
             
             result = response.json()
-            return result.get('images', [None])[0]
+            return ImageHandle.from_b64(result.get('images', [None])[0])
             
         except Exception as e:
             print(f"Error outpainting image: {str(e)}")
             return None
     
-    def generate_skybox(self, prompt, negative_prompt="blurry, low quality, distorted, watermark, text, characters"):
-        """ Generate panoramic skybox image with outpainting.
+    def _generate_skybox_base(self, prompt, negative_prompt, seed=-1, width=512, height=512, operation="skybox_base"):
+        """ generate a skybox image with the skybox checkpoint (the outpainting base, or the whole panorama).
         Args:
-            prompt (str): Text prompt for skybox generation (should include "panorama") 
+            prompt (str): Text prompt, already prefixed with "panorama"
+            negative_prompt (str): Negative prompt
+            seed (int): SD seed, -1 for random (default: -1)
+            width (int): Image width (default: 512)
+            height (int): Image height (default: 512)
         Returns:
-            str: Base64 encoded panoramic skybox image
+            ImageHandle: Generated image
         """
         try:
-            # First generate the base image
             url = self.sd_url1 + "sdapi/v1/txt2img"
             
             request_data = {
-                "prompt": f"panorama, {prompt}",
+                "prompt": prompt,
                 "steps": 20,
-                "seed": -1,
+                "seed": seed,
                 "negative_prompt": negative_prompt,
                 "cfg_scale": 7,
                 "user_token": 0,
                 "override_settings": {
                     "sd_model_checkpoint": self.skybox_checkpoint,
                 },
-                "width": 512,
-                "height": 512,
+                "width": width,
+                "height": height,
             }
             
-            response = requests.post(url, json=request_data, headers={"Content-Type": "application/json"})
-            response.raise_for_status()
+            with metrics.track_call("image", operation, provider="stable-diffusion", model=self.skybox_checkpoint,
+                                    request_bytes=metrics.payload_size(request_data)) as call:
+                response = providers.session().post(url, json=request_data, headers={"Content-Type": "application/json"})
+                response.raise_for_status()
+                call.response_bytes = len(response.content)
             
             result = response.json()
-            base_image = result.get('images', [None])[0]
-            
-            if not base_image:
-                print("Failed to generate base skybox image")
-                return None
-            
-            # Outpaint once to create panoramic effect
-            outpainted_image = self._outpaint_image(f"panorama, {prompt}", base_image)
-            
-            return outpainted_image
+            return ImageHandle.from_b64(result.get('images', [None])[0])
             
+        except Exception as e:
+            print(f"Error generating skybox base: {str(e)}")
+            return None
+    
+    def generate_skybox(self, prompt, negative_prompt="blurry, low quality, distorted, watermark, text, characters", seed=None):
+        """ Generate panoramic skybox image (base + outpaint, or single pass; see skybox_pipeline).
+        Args:
+            prompt (str): Text prompt for skybox generation ("panorama" is prepended)
+            seed (int): SD seed (default: derived from the prompt)
+        Returns:
+            ImageHandle: Panoramic skybox image
+        """
+        try:
+            return self.skybox_pipeline.from_text(prompt, negative_prompt, seed=seed)
         except Exception as e:
             print(f"Error generating skybox: {str(e)}")
-            return None
\ No newline at end of file
+            return None
+
+    def generate_reference_skybox(self, prompt, reference_image, reference_filename=None, seed=None):
+        """ Generate panoramic skybox from a reference image: GPT edit, then outpaint.
+        Args:
+            prompt (str): Text prompt for the edit ("panorama" is prepended for outpainting)
+            reference_image (ImageHandle or str): Reference image (handle or base64)
+            seed (int): SD seed for outpainting (default: derived from the prompt)
+        Returns:
+            ImageHandle: Panoramic skybox image
+        """
+        try:
+            return self.skybox_pipeline.from_reference(prompt, ImageHandle.coerce(reference_image), reference_filename, seed=seed)
+        except Exception as e:
+            print(f"Error generating skybox from reference: {str(e)}")
+            return None
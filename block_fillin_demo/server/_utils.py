@@ -1,5 +1,6 @@
 import os
 import json
+import re
 
 def make_schema_strict_compatible(schema):
     """
@@ -127,4 +128,35 @@ def merge_factory_states(existing_filepath, new_factory_state):
         
     except Exception as e:
         print(f"⚠️  Error merging factory states: {str(e)}, using new state")
-        return new_factory_state
\ No newline at end of file
+        return new_factory_state
+
+# Words that do not change what a world description looks like
+DESCRIPTION_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "with", "in", "on", "at", "to", "for", "by", "from", "into",
+    "is", "are", "be", "its", "it", "this", "that", "some", "very", "full", "filled", "scene", "world",
+    "game", "level", "background", "setting", "environment", "place", "area", "style", "theme", "themed",
+}
+
+
+def normalize_description(text: str) -> tuple:
+    """
+    Similarity key for a free-text description: lowercase word tokens without
+    stopwords, plural 's' stripped, sorted and de-duplicated.
+    "A snowy Forest with pine trees" -> ('forest', 'pine', 'snowy', 'tree')
+    """
+    tokens = set()
+    for word in re.findall(r"[a-z0-9]+", (text or "").lower()):
+        if word in DESCRIPTION_STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.add(word)
+    return tuple(sorted(tokens))
+
+
+def token_similarity(a: tuple, b: tuple) -> float:
+    """Jaccard similarity of two normalize_description() keys"""
+    if not a or not b:
+        return 0.0
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b)
@@ -0,0 +1,123 @@
+"""
+analysis_index: Image analyses (Gami.decompose_image) shared across games.
+
+An analysis is stored under the sha256 of the image bytes and the prompt
+version, so it is reused wherever the same bytes show up again (another item
+id, a re-upload, another game) and only new image bytes reach the vision model.
+The prompt version is a hash of the decomposition prompts and schema, or
+ANALYSIS_PROMPT_VERSION when set: changing either gives a new version, entries
+of other versions are no longer served, and prune() removes them once they
+have been unused for ANALYSIS_INDEX_RETENTION_DAYS. Failed analyses are not
+stored.
+
+Layout of ANALYSIS_INDEX_DIR:
+    <version>/<sha256>.json    {"sha256", "version", "created", "analysis"}
+"""
+import hashlib
+import json
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import metrics
+import storage
+from config import ANALYSIS_INDEX_DIR, ANALYSIS_PROMPT_VERSION, ANALYSIS_INDEX_RETENTION_DAYS
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+def prompt_version(*parts: str) -> str:
+    """Version of an analysis prompt: ANALYSIS_PROMPT_VERSION, else a hash of its parts"""
+    if ANALYSIS_PROMPT_VERSION:
+        return ANALYSIS_PROMPT_VERSION
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class AnalysisIndex:
+    def __init__(self, version: str, root: Path = ANALYSIS_INDEX_DIR):
+        self.version = version
+        self.root = Path(root)
+
+    def path(self, sha256: str) -> Path:
+        return self.root / self.version / f"{sha256}.json"
+
+    def get(self, sha256: str) -> Optional[dict]:
+        """Stored analysis of these image bytes under the current prompt version"""
+        try:
+            with open(self.path(sha256), "r", encoding="utf-8") as f:
+                analysis = json.load(f)["analysis"]
+        except FileNotFoundError:
+            metrics.ANALYSIS_INDEX_LOOKUPS.inc(result="miss")
+            return None
+        except (ValueError, KeyError) as e:
+            log.warning("Ignoring unreadable analysis index entry", sha256=sha256[:12], error=str(e))
+            metrics.ANALYSIS_INDEX_LOOKUPS.inc(result="miss")
+            return None
+        metrics.ANALYSIS_INDEX_LOOKUPS.inc(result="hit")
+        return analysis
+
+    def put(self, sha256: str, analysis: dict) -> bool:
+        """Store an analysis; failed ones (not a dict, or with an error) are skipped"""
+        if not isinstance(analysis, dict) or analysis.get("error"):
+            return False
+        storage.write_json(self.path(sha256), {"sha256": sha256, "version": self.version, "created": time.time(),
+                                               "analysis": analysis}, compact=True, locked=False)
+        return True
+
+    def invalidate(self, sha256: str) -> int:
+        """Drop the analyses of one image under every prompt version; returns how many were removed"""
+        removed = 0
+        for path in self.root.glob(f"*/{sha256}.json"):
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def prune(self, retention_days: float = ANALYSIS_INDEX_RETENTION_DAYS) -> int:
+        """Remove other prompt versions not written to for retention_days; returns how many were removed"""
+        if not self.root.exists():
+            return 0
+        cutoff = time.time() - retention_days * 86400
+        removed = 0
+        for version_dir in self.root.iterdir():
+            if not version_dir.is_dir() or version_dir.name == self.version:
+                continue
+            if max((p.stat().st_mtime for p in version_dir.glob("*.json")), default=0.0) > cutoff:
+                continue
+            shutil.rmtree(version_dir, ignore_errors=True)
+            removed += 1
+            log.info("Pruned analysis index version", version=version_dir.name, current=self.version)
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Stored analyses per prompt version"""
+        if not self.root.exists():
+            return {}
+        return {d.name: sum(1 for _ in d.glob("*.json")) for d in self.root.iterdir() if d.is_dir()}
+
+
+_indexes: Dict[str, AnalysisIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(version: str) -> AnalysisIndex:
+    """Shared index for a prompt version; the first use in a process prunes stale versions"""
+    with _indexes_lock:
+        index = _indexes.get(version)
+        if index is None:
+            index = _indexes[version] = AnalysisIndex(version)
+            try:
+                index.prune()
+            except OSError as e:
+                log.warning("Analysis index prune failed", error=str(e))
+        return index
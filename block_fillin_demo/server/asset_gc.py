@@ -0,0 +1,311 @@
+"""
+asset_gc: Garbage collection of generated asset files.
+
+Live assets are found by reference: every saved config in FRONTEND_CONFIG_DIR
+(.json and .ts), every game data file in GAME_DATA_DIR/<game_id>/ and the
+pre-generated asset pool index (asset_pool) are scanned for file names, and a name that appears anywhere is kept. A root file
+is only re-read after its size or mtime changed, so repeated passes cost one
+stat per config.
+
+Two areas are collected:
+
+- FRONTEND_ASSETS_DIR: only files with a generated name (<prefix>_<content
+  hash> from asset_store, or the older <prefix>_<timestamp> names, plus the
+  _<size> mip levels of a ground texture) are candidates; hand-made assets are
+  never touched. An unreferenced candidate is deleted once it has not been
+  written for ASSET_GC_GRACE_HOURS (asset_store refreshes the mtime when it
+  serves an identical asset again), which leaves the editor time to save a
+  config that uses it.
+- GENERATED_ASSETS_DIR/<game_id>: the folder of a game without game data is
+  removed after the grace period if the server created it (asset_store.game_dir
+  marks it; folders shipped with the repo are not marked); a live game's folder is brought under
+  ASSET_GC_GAME_QUOTA_MB by deleting unreferenced files, least recently
+  written first (files written in the last QUOTA_MIN_AGE seconds are spared,
+  they may belong to a generation still running).
+
+A pass works through the candidates in steps of ASSET_GC_BATCH files and
+pauses between steps, so it never holds the disk for long. Each worker runs
+passes in a background thread (start()); an flock on .asset_gc.lock lets only
+one process sweep at a time.
+"""
+import os
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Deque, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process exclusion only
+    fcntl = None
+
+import metrics
+from asset_store import GAME_DIR_MARKER
+from config import (
+    FRONTEND_ASSETS_DIR, FRONTEND_CONFIG_DIR, GAME_DATA_DIR, GENERATED_ASSETS_DIR,
+    TEXTURE_LIBRARY_DIR, SKYBOX_CACHE_DIR, ANALYSIS_INDEX_DIR, ASSET_POOL_DIR,
+    ASSET_GC_INTERVAL_SECONDS, ASSET_GC_GRACE_HOURS, ASSET_GC_GAME_QUOTA_MB, ASSET_GC_BATCH, ASSET_GC_DRY_RUN,
+)
+from logger import get_logger
+
+log = get_logger(__name__)
+
+# <prefix>_<16 hex content hash | 13 digit ms timestamp>[_<6 hex>][_<mip size>].<ext>
+GENERATED_NAME = re.compile(
+    r"^(?P<base>[\w-]+?_(?:[0-9a-f]{16}|\d{13})(?:_[0-9a-f]{6})?)(?:_(?P<level>\d{2,4}))?(?P<ext>\.(?:json|png|wav))$"
+)
+# File names mentioned in configs and game data (paths and URLs reduce to their last component)
+REFERENCE = re.compile(r"[\w.-]+\.(?:png|jpe?g|webp|gif|json|wav|mp3|ogg|glb|gltf)")
+ROOT_SUFFIXES = (".json", ".jsonl", ".ts", ".js")
+QUOTA_MIN_AGE = 300
+STEP_PAUSE = 0.05
+
+
+@dataclass
+class GCReport:
+    started: float = 0.0
+    finished: float = 0.0
+    dry_run: bool = False
+    references: int = 0
+    examined: int = 0
+    deleted: Dict[str, int] = field(default_factory=dict)
+    freed_bytes: int = 0
+    over_quota: List[str] = field(default_factory=list)
+    files: List[str] = field(default_factory=list)
+
+    def count(self, reason: str, path: Path, size: int):
+        self.deleted[reason] = self.deleted.get(reason, 0) + 1
+        self.freed_bytes += size
+        if len(self.files) < 100:
+            self.files.append(str(path))
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class AssetGC:
+    def __init__(self, assets_dir: Path = FRONTEND_ASSETS_DIR, generated_dir: Path = GENERATED_ASSETS_DIR,
+                 config_dir: Path = FRONTEND_CONFIG_DIR, data_dir: Path = GAME_DATA_DIR,
+                 grace_seconds: float = ASSET_GC_GRACE_HOURS * 3600,
+                 game_quota_bytes: int = int(ASSET_GC_GAME_QUOTA_MB * 1024 * 1024),
+                 batch: int = ASSET_GC_BATCH, dry_run: bool = ASSET_GC_DRY_RUN):
+        self.assets_dir = Path(assets_dir)
+        self.generated_dir = Path(generated_dir)
+        self.config_dir = Path(config_dir)
+        self.data_dir = Path(data_dir)
+        self.grace_seconds = grace_seconds
+        self.game_quota_bytes = game_quota_bytes
+        self.batch = max(1, batch)
+        self.dry_run = dry_run
+        # Shared caches under _data that are not games
+        self.internal_dirs = {Path(p).resolve() for p in
+                              (TEXTURE_LIBRARY_DIR, SKYBOX_CACHE_DIR, ANALYSIS_INDEX_DIR, ASSET_POOL_DIR)}
+        # Other files whose references keep assets alive
+        self.extra_roots = [Path(ASSET_POOL_DIR) / "index.json"]
+        self._lock = threading.Lock()
+        self._roots: Dict[Path, Tuple[int, int, FrozenSet[str]]] = {}
+        self.last_report: Optional[GCReport] = None
+
+    # ===== MARK =====
+
+    def games(self) -> Set[str]:
+        """Game ids with game data"""
+        if not self.data_dir.is_dir():
+            return set()
+        return {d.name for d in self.data_dir.iterdir()
+                if d.is_dir() and not d.name.startswith((".", "_")) and d.resolve() not in self.internal_dirs}
+
+    def _root_files(self, games: Iterable[str]) -> Iterable[Path]:
+        if self.config_dir.is_dir():
+            yield from (p for p in self.config_dir.iterdir() if p.suffix in ROOT_SUFFIXES)
+        yield from (p for p in self.extra_roots if p.exists())
+        for game_id in games:
+            try:
+                yield from (p for p in (self.data_dir / game_id).iterdir() if p.suffix in ROOT_SUFFIXES)
+            except FileNotFoundError:
+                continue
+
+    def references(self, games: Iterable[str]) -> Set[str]:
+        """Every file name mentioned by a saved config or game data (changed files are re-read)"""
+        roots = {}
+        for path in self._root_files(games):
+            try:
+                stat = path.stat()
+                known = self._roots.get(path)
+                if known and known[:2] == (stat.st_size, stat.st_mtime_ns):
+                    roots[path] = known
+                    continue
+                text = path.read_text(encoding="utf-8", errors="replace")
+            except OSError:
+                continue
+            roots[path] = (stat.st_size, stat.st_mtime_ns, frozenset(REFERENCE.findall(text)))
+        self._roots = roots
+        names = set()
+        for _, _, found in roots.values():
+            names |= found
+        return names
+
+    # ===== SWEEP =====
+
+    def _delete(self, path: Path, size: int, reason: str, report: GCReport):
+        if not self.dry_run:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                return
+            except OSError as e:
+                log.warning("Could not delete asset", path=str(path), error=str(e))
+                return
+            metrics.ASSET_GC_FILES.inc(reason=reason)
+            metrics.ASSET_GC_BYTES.inc(size, reason=reason)
+        report.count(reason, path, size)
+
+    def _sweep_assets(self, names: List[str], references: Set[str], now: float, report: GCReport):
+        """Delete unreferenced generated files past the grace period"""
+        for name in names:
+            match = GENERATED_NAME.match(name)
+            if not match:
+                continue
+            report.examined += 1
+            if name in references or match["base"] + match["ext"] in references:
+                continue
+            path = self.assets_dir / name
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime >= self.grace_seconds:
+                self._delete(path, stat.st_size, "expired", report)
+
+    def _sweep_game(self, game_id: str, live: bool, references: Set[str], now: float, report: GCReport):
+        """Remove an orphaned game folder the server created after the grace period, or hold a live one to its quota"""
+        folder = self.generated_dir / game_id
+        marker = folder / GAME_DIR_MARKER
+        if not live and not marker.exists():
+            return
+        files = []
+        for path in folder.rglob("*"):
+            if path == marker:
+                continue
+            try:
+                if path.is_file():
+                    stat = path.stat()
+                    files.append((stat.st_mtime, stat.st_size, path))
+            except FileNotFoundError:
+                continue
+        report.examined += len(files)
+        if not live:
+            if files and now - max(mtime for mtime, _, _ in files) < self.grace_seconds:
+                return
+            for _, size, path in files:
+                self._delete(path, size, "orphaned", report)
+            if not self.dry_run:
+                marker.unlink(missing_ok=True)
+                for directory in sorted((p for p in folder.rglob("*") if p.is_dir()), reverse=True) + [folder]:
+                    try:
+                        directory.rmdir()
+                    except OSError:
+                        pass
+            return
+        total = sum(size for _, size, _ in files)
+        if total <= self.game_quota_bytes:
+            return
+        for mtime, size, path in sorted(files):
+            if total <= self.game_quota_bytes:
+                break
+            if path.name in references or now - mtime < QUOTA_MIN_AGE:
+                continue
+            self._delete(path, size, "quota", report)
+            total -= size
+        if total > self.game_quota_bytes:
+            report.over_quota.append(game_id)
+            log.warning("Generated assets over quota", game_id=game_id, mb=round(total / 1048576, 1),
+                        quota_mb=round(self.game_quota_bytes / 1048576, 1))
+
+    def _plan(self) -> Deque[Tuple[str, object]]:
+        steps: Deque[Tuple[str, object]] = deque()
+        if self.assets_dir.is_dir():
+            names = sorted(entry.name for entry in os.scandir(self.assets_dir) if entry.is_file())
+            for start in range(0, len(names), self.batch):
+                steps.append(("assets", names[start:start + self.batch]))
+        if self.generated_dir.is_dir():
+            steps.extend(("game", d.name) for d in sorted(self.generated_dir.iterdir()) if d.is_dir())
+        return steps
+
+    def run(self, pause: float = STEP_PAUSE) -> GCReport:
+        """One full pass, in steps of at most batch asset files (or one game folder) with a pause between"""
+        report = GCReport(started=time.time(), dry_run=self.dry_run)
+        with self._lock:
+            games = self.games()
+            references = self.references(games)
+            report.references = len(references)
+            steps = self._plan()
+            while steps:
+                kind, item = steps.popleft()
+                now = time.time()
+                if kind == "assets":
+                    self._sweep_assets(item, references, now, report)
+                else:
+                    self._sweep_game(item, item in games, references, now, report)
+                if steps and pause:
+                    time.sleep(pause)
+            report.finished = time.time()
+            self.last_report = report
+        if report.deleted:
+            log.info("Asset GC pass", dry_run=self.dry_run, deleted=report.deleted,
+                     freed_mb=round(report.freed_bytes / 1048576, 1), seconds=round(report.finished - report.started, 2))
+        return report
+
+
+# ===== BACKGROUND =====
+
+_collector: Optional[AssetGC] = None
+_collector_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+
+
+def get_collector() -> AssetGC:
+    global _collector
+    with _collector_lock:
+        if _collector is None:
+            _collector = AssetGC()
+        return _collector
+
+
+def run_exclusive(collector: Optional[AssetGC] = None) -> Optional[GCReport]:
+    """Run a pass unless another process is running one (then None)"""
+    collector = collector or get_collector()
+    if fcntl is None:
+        return collector.run()
+    GAME_DATA_DIR.mkdir(parents=True, exist_ok=True)
+    with open(GAME_DATA_DIR / ".asset_gc.lock", "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        try:
+            return collector.run()
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _loop(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            run_exclusive()
+        except Exception as e:
+            log.error("Asset GC pass failed", error=str(e))
+
+
+def start(interval: float = ASSET_GC_INTERVAL_SECONDS):
+    """Run passes every interval seconds in a daemon thread of this process (once; 0 disables)"""
+    global _thread
+    with _collector_lock:
+        if interval <= 0 or _thread is not None:
+            return
+        _thread = threading.Thread(target=_loop, args=(interval,), name="asset-gc", daemon=True)
+        _thread.start()
@@ -0,0 +1,198 @@
+"""
+asset_pool: Pre-generated assets served to matching generate requests.
+
+prewarm.py fills the pool offline from (mechanism, theme) seeds. An entry maps
+the normalized description (see _utils.normalize_description) of
+
+    theme      a seed (theme_description)  -> the block descriptions suggested for it
+    asset      a composite object asset    -> its file in FRONTEND_ASSETS_DIR
+    ambient    an ambient loop prompt      -> its file in FRONTEND_ASSETS_DIR
+
+Files are stored through asset_store, so they are content-hash named and shared
+with live generations. Asset and ambient keys are the agent's own suggestions,
+which a live session only reproduces verbatim when it starts from the same
+theme: /cohesiveChat therefore answers a request matching a seed with the pooled
+theme, and the /blockGenerate calls that follow look up exactly the
+descriptions the pool was filled from. A lookup matches when the token
+similarity of the keys reaches ASSET_POOL_MATCH_THRESHOLD (1.0 = same
+normalized description). Ground textures are pre-generated into the texture
+library, which already serves them by description.
+
+The index is written by the prewarm job and re-read by the server when its
+mtime changes. Hit rates are counted per process (ASSET_POOL_LOOKUPS and
+report()).
+
+Layout of ASSET_POOL_DIR:
+    index.json    entries with kind, key, description, file or data, seed and creation time
+"""
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+import storage
+from _utils import normalize_description, token_similarity
+from config import ASSET_POOL_DIR, ASSET_POOL_MATCH_THRESHOLD, FRONTEND_ASSETS_DIR
+from logger import get_logger
+
+log = get_logger(__name__)
+
+INDEX_FILE = "index.json"
+KINDS = ("theme", "asset", "ambient")
+
+
+def theme_description(mechanism: str, theme: str) -> str:
+    """Pool description of a (mechanism, theme) seed or /cohesiveChat request"""
+    return f"{mechanism} {theme}"
+
+
+@dataclass
+class PoolEntry:
+    id: str
+    kind: str
+    key: Tuple[str, ...]
+    description: str
+    file: str = ""
+    seed: str = ""
+    created: float = field(default_factory=time.time)
+    data: Optional[Dict[str, Any]] = None
+
+    def to_dict(self):
+        data = asdict(self)
+        data["key"] = list(self.key)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{**data, "key": tuple(data["key"])})
+
+
+class AssetPool:
+    def __init__(self, root: Path = ASSET_POOL_DIR, assets_dir: Path = FRONTEND_ASSETS_DIR,
+                 threshold: float = ASSET_POOL_MATCH_THRESHOLD):
+        self.root = Path(root)
+        self.index_path = self.root / INDEX_FILE
+        self.assets_dir = Path(assets_dir)
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries: Dict[str, PoolEntry] = {}
+        self._index_mtime_ns = None
+        self._lookups: Dict[str, Dict[str, int]] = {kind: {"hit": 0, "miss": 0} for kind in KINDS}
+        self._hits: Dict[str, int] = {}
+
+    # ===== INDEX =====
+
+    def _reload(self):
+        """Re-read the index when the prewarm job changed it (caller holds the lock)"""
+        try:
+            mtime_ns = self.index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._entries, self._index_mtime_ns = {}, None
+            return
+        if mtime_ns == self._index_mtime_ns:
+            return
+        try:
+            entries = [PoolEntry.from_dict(item) for item in storage.read_json(self.index_path, [])]
+        except (ValueError, TypeError, KeyError) as e:
+            log.warning("Ignoring unreadable asset pool index", path=str(self.index_path), error=str(e))
+            entries = []
+        self._entries = {entry.id: entry for entry in entries}
+        self._index_mtime_ns = mtime_ns
+
+    def entries(self) -> List[PoolEntry]:
+        with self._lock:
+            self._reload()
+            return list(self._entries.values())
+
+    # ===== LOOKUP / STORE =====
+
+    def _available(self, entry: PoolEntry) -> bool:
+        return not entry.file or (self.assets_dir / entry.file).exists()
+
+    def find(self, kind: str, description: str) -> Optional[PoolEntry]:
+        """The entry with exactly this normalized description (not counted as a lookup)"""
+        key = normalize_description(description)
+        return next((entry for entry in self.entries()
+                     if entry.kind == kind and entry.key == key and self._available(entry)), None)
+
+    def has(self, kind: str, description: str) -> bool:
+        return self.find(kind, description) is not None
+
+    def lookup(self, kind: str, description: str) -> Optional[PoolEntry]:
+        """Pre-generated entry of this kind matching description, if its file (if any) still exists"""
+        key = normalize_description(description)
+        with self._lock:
+            self._reload()
+            best, best_score = None, 0.0
+            for entry in self._entries.values():
+                if entry.kind != kind:
+                    continue
+                score = 1.0 if entry.key == key else token_similarity(key, entry.key)
+                if score > best_score:
+                    best, best_score = entry, score
+            if best is not None and (best_score < self.threshold or not self._available(best)):
+                best = None
+            result = "hit" if best else "miss"
+            self._lookups.setdefault(kind, {"hit": 0, "miss": 0})[result] += 1
+            if best:
+                self._hits[best.id] = self._hits.get(best.id, 0) + 1
+        metrics.ASSET_POOL_LOOKUPS.inc(kind=kind, result=result)
+        if best and best.file:
+            try:
+                os.utime(self.assets_dir / best.file)  # restarts asset_gc's grace period
+            except FileNotFoundError:
+                pass
+        return best
+
+    def add(self, kind: str, description: str, file: str = "", seed: str = "",
+            data: Optional[Dict[str, Any]] = None) -> PoolEntry:
+        """Register a pre-generated file (or data); replaces the entry of the same kind and description"""
+        entry = PoolEntry(id=uuid.uuid4().hex[:12], kind=kind, key=normalize_description(description),
+                          description=description, file=file, seed=seed, data=data)
+
+        def update(items):
+            items = [item for item in items or [] if not (item["kind"] == kind and tuple(item["key"]) == entry.key)]
+            return items + [entry.to_dict()]
+
+        storage.update_json(self.index_path, update, default=[])
+        return entry
+
+    def report(self) -> Dict[str, dict]:
+        """Entries, lookups and hit rate per kind (this process), plus the most served entries"""
+        with self._lock:
+            self._reload()
+            entries = dict(self._entries)
+            lookups = {kind: dict(counts) for kind, counts in self._lookups.items()}
+            hits = dict(self._hits)
+        kinds = {}
+        for kind, counts in lookups.items():
+            total = counts["hit"] + counts["miss"]
+            kinds[kind] = {
+                "entries": sum(1 for entry in entries.values() if entry.kind == kind),
+                "lookups": total,
+                "hits": counts["hit"],
+                "hit_rate": round(counts["hit"] / total, 3) if total else None,
+            }
+        top = sorted(((count, entries[entry_id]) for entry_id, count in hits.items() if entry_id in entries),
+                     key=lambda item: item[0], reverse=True)[:20]
+        return {
+            "kinds": kinds,
+            "top": [{"kind": entry.kind, "description": entry.description, "file": entry.file or None, "hits": count}
+                    for count, entry in top],
+        }
+
+
+_pool: Optional[AssetPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> AssetPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = AssetPool()
+        return _pool
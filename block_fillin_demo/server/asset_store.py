@@ -0,0 +1,137 @@
+"""
+asset_store: Generated asset files named by their content hash.
+
+store() writes bytes to <prefix>_<first 16 hex of sha256><suffix> in the
+frontend assets folder. The same output always gets the same name, so
+identical assets are stored once (a second store is a no-op), concurrent
+requests cannot collide, and the file can be cached by browsers forever
+(routes/assets.py sends hash-named files as immutable).
+
+Writes go to a temp file that is renamed into place, so a reader never sees
+a partial asset. ASSET_DURABILITY decides what is fsynced: 'none' (rely on
+the OS), 'file' (the asset before the rename) or 'dir' (also the directory
+after it).
+
+Every stored asset is recorded in ASSET_MAP_FILE (JSON Lines) with the id of
+the request that produced it, so a request can be traced to its files. Past
+ASSET_MAP_MAX_MB the map is rotated to <ASSET_MAP_FILE>.1, so it keeps between
+one and two rotations' worth of history.
+
+game_dir() is the per-game folder under GENERATED_ASSETS_DIR; a folder it
+creates is marked (GAME_DIR_MARKER) as the server's, which is what lets
+asset_gc remove it once the game is gone.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import metrics
+import storage
+import tracing
+from config import FRONTEND_ASSETS_DIR, GENERATED_ASSETS_DIR, ASSET_DURABILITY, ASSET_MAP_FILE, ASSET_MAP_MAX_MB
+from logger import get_logger
+
+log = get_logger(__name__)
+
+HASH_CHARS = 16
+# In a GENERATED_ASSETS_DIR/<game_id> folder the server created (folders shipped with the repo have none)
+GAME_DIR_MARKER = ".server_generated"
+
+
+def content_filename(prefix: str, data: bytes, suffix: str) -> str:
+    return f"{prefix}_{hashlib.sha256(data).hexdigest()[:HASH_CHARS]}{suffix}"
+
+
+def game_dir(game_id: str, root: Path = GENERATED_ASSETS_DIR) -> Path:
+    """root/<game_id>, created and marked as the server's when it does not exist yet"""
+    folder = Path(root) / game_id
+    try:
+        folder.mkdir(parents=True)
+    except FileExistsError:
+        return folder
+    (folder / GAME_DIR_MARKER).touch()
+    return folder
+
+
+def _fsync_dir(directory: Path):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:  # not supported (e.g. Windows)
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write(path: Path, data: bytes, durability: str = ASSET_DURABILITY) -> bool:
+    """Write an immutable file; returns False when it already exists with this content's size.
+
+    An existing file gets a fresh mtime: asset_gc keeps unreferenced assets for a grace
+    period counted from their last write.
+    """
+    path = Path(path)
+    try:
+        if path.stat().st_size == len(data):
+            os.utime(path)
+            return False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            if durability in ("file", "dir"):
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    if durability == "dir":
+        _fsync_dir(path.parent)
+    return True
+
+
+def _rotate_map(max_bytes: int):
+    """Move ASSET_MAP_FILE to <name>.1 once it is larger than max_bytes"""
+    with storage.lock(ASSET_MAP_FILE):
+        # Another worker may have rotated it meanwhile
+        if ASSET_MAP_FILE.stat().st_size <= max_bytes:
+            return
+        os.replace(ASSET_MAP_FILE, ASSET_MAP_FILE.with_name(ASSET_MAP_FILE.name + ".1"))
+    log.info("Rotated asset map", path=str(ASSET_MAP_FILE))
+
+
+def record(kind: str, filename: str, **details):
+    """Map the current request to an asset it produced"""
+    try:
+        storage.append_jsonl(ASSET_MAP_FILE, {
+            "request_id": tracing.current_request_id(), "kind": kind, "file": filename,
+            "created": time.time(), **details,
+        }, fsync=ASSET_DURABILITY != "none")
+        max_bytes = int(ASSET_MAP_MAX_MB * 1024 * 1024)
+        if max_bytes > 0 and ASSET_MAP_FILE.stat().st_size > max_bytes:
+            _rotate_map(max_bytes)
+    except OSError as e:
+        log.warning("Could not record asset", file=filename, error=str(e))
+
+
+def store(data: bytes, prefix: str, suffix: str, kind: Optional[str] = None,
+          output_dir: Path = FRONTEND_ASSETS_DIR) -> str:
+    """Store an asset under its content-hash name in output_dir and return the filename"""
+    filename = content_filename(prefix, data, suffix)
+    written = write(Path(output_dir) / filename, data)
+    metrics.ASSET_WRITES.inc(kind=kind or prefix, result="stored" if written else "deduplicated")
+    record(kind or prefix, filename, bytes=len(data), deduplicated=not written)
+    return filename
+
+
+def store_json(document: Any, prefix: str, kind: Optional[str] = None, output_dir: Path = FRONTEND_ASSETS_DIR) -> str:
+    """store() for a JSON document"""
+    data = json.dumps(document, ensure_ascii=False, indent=2).encode("utf-8")
+    return store(data, prefix, ".json", kind=kind, output_dir=output_dir)
@@ -0,0 +1,127 @@
+"""
+Benchmark: asset pool hit rate for chat sessions on pre-generated themes.
+
+Fills a temporary pool with prewarm.py from PREWARM_SEEDS_FILE, then replays the
+editor's flow once per seed: /cohesiveChat with the seed's theme as the message,
+then /blockGenerate for the player, the world and every object with the
+descriptions the chat returned. Reports the pool hit rate per kind (from
+/asset-pool) twice: with the pooled themes, and with the theme entries removed,
+i.e. /cohesiveChat suggesting the blocks afresh as before.
+
+The fake block suggestions vary per call like the real agent at temperature
+0.8 (a random adjective per description), so re-suggested descriptions only
+match the pool by chance. --others adds sessions on themes that are not seeds.
+
+Usage:
+    python benchmarks/bench_asset_pool.py
+    python benchmarks/bench_asset_pool.py --others "pirate ship" "desert canyon"
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+ADJECTIVES = ("tiny", "glowing", "ancient", "frosty", "golden", "shadowy", "bouncy", "crystal", "rusty", "velvet")
+OBJECT_FIELD = re.compile(r'^\s*"(\w+)": "one specific \1 description"', re.M)
+USER_REQUEST = re.compile(r"User request: (.+)")
+
+
+def make_responder():
+    """Fake block suggestions that name the theme and vary per call"""
+    import fake_providers
+    fake_respond = fake_providers.respond
+    rng = random.Random()
+
+    def respond(method, url, body):
+        if "/chat/completions" not in url or not fake_providers.current_operation().endswith(".block_suggestion"):
+            return fake_respond(method, url, body)
+        prompt = "\n".join(str(message["content"]) for message in json.loads(body)["messages"])
+        match = USER_REQUEST.search(prompt)
+        theme = match.group(1).strip() if match else "mystery"
+        blocks = {"player": f"{rng.choice(ADJECTIVES)} {theme} hero", "world": f"{rng.choice(ADJECTIVES)} {theme} land",
+                  "narrative": f"A {theme} adventure.", "transition": None}
+        for key in dict.fromkeys(OBJECT_FIELD.findall(prompt)):
+            blocks[key] = f"{rng.choice(ADJECTIVES)} {theme} {key}"
+        status, content_type, response, delay = fake_respond(method, url, body)
+        data = json.loads(response)
+        data["choices"][0]["message"]["content"] = json.dumps(blocks)
+        return status, content_type, json.dumps(data).encode("utf-8"), delay
+
+    return respond
+
+
+def session(client, mechanism, theme, mechanism_config=None):
+    """One editor session: cohesive chat on theme, then generate every block it describes"""
+    response = client.post("/cohesiveChat", json={"message": theme, "mechanism": mechanism,
+                                                  "mechanismConfig": mechanism_config, "currentNarrative": {}})
+    blocks = response.get_json()["data"]["narrative"]
+    client.post("/blockGenerate", json={"blockType": "player", "actionType": "generate", "content": blocks["player"]})
+    client.post("/blockGenerate", json={"blockType": "world", "actionType": "generate", "content": blocks["world"],
+                                        "playerDescription": blocks["player"]})
+    from routes.blocks import theme_object_keys
+    for key in theme_object_keys(mechanism_config):
+        client.post("/blockGenerate", json={
+            "blockType": "object", "actionType": "generate", "content": blocks[key],
+            "currentObjectConfig": {"name": key}, "currentSpawnConfigs": [],
+            "worldDescription": blocks["world"], "mechanism": mechanism, "mechanismConfig": mechanism_config,
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asset pool hit rate for chat sessions on pre-generated themes")
+    parser.add_argument("--seeds", help="Seeds file (default PREWARM_SEEDS_FILE)")
+    parser.add_argument("--others", nargs="*", default=["pirate ship", "desert canyon"],
+                        help="Themes without a seed, played on the first seed's mechanism")
+    args = parser.parse_args()
+
+    os.environ["PROVIDER_MODE"] = "fake"
+    os.environ["FAKE_LATENCY_SCALE"] = "0"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("STABILITY_API_KEY", "bench-key")
+    for name in ("FRONTEND_ASSETS_DIR", "ASSET_POOL_DIR", "TEXTURE_LIBRARY_DIR", "ANALYSIS_INDEX_DIR"):
+        os.environ[name] = tempfile.mkdtemp(prefix="smallgami_bench_pool_")
+    os.environ["ASSET_MAP_FILE"] = str(Path(os.environ["ASSET_POOL_DIR"]) / "asset_map.jsonl")
+    sys.path.append(str(SERVER_DIR))
+    os.chdir(SERVER_DIR)
+    import fake_providers
+    fake_providers.respond = make_responder()
+
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        import asset_pool
+        import prewarm
+        from config import PREWARM_SEEDS_FILE
+        from main import app
+        seeds = prewarm.load_seeds(args.seeds or PREWARM_SEEDS_FILE)
+        prewarm.Prewarmer(app.config["AGENT"], app.config["VISUAL_GENERATOR"]).run(seeds)
+    client = app.test_client()
+
+    def play():
+        asset_pool._pool = None  # fresh lookup counters
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            for seed in seeds:
+                session(client, seed["mechanism"], seed["theme"], seed.get("mechanismConfig"))
+            for theme in args.others:
+                session(client, seeds[0]["mechanism"], theme, seeds[0].get("mechanismConfig"))
+        return client.get("/asset-pool").get_json()["kinds"]
+
+    pooled = play()
+    index = Path(os.environ["ASSET_POOL_DIR"]) / asset_pool.INDEX_FILE
+    index.write_text(json.dumps([entry for entry in json.loads(index.read_text()) if entry["kind"] != "theme"]))
+    resuggested = play()
+
+    print(f" :: {len(seeds)} seed sessions + {len(args.others)} other themes")
+    print(f"{'kind':>8}{'lookups':>9}{'pooled themes':>15}{'re-suggested':>14}")
+    print("-" * 46)
+    for kind in asset_pool.KINDS:
+        print(f"{kind:>8}{pooled[kind]['lookups']:>9}{pooled[kind]['hit_rate'] or 0:>15.0%}"
+              f"{resuggested[kind]['hit_rate'] or 0:>14.0%}")
+
+
+if __name__ == "__main__":
+    main()
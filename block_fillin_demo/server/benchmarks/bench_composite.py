@@ -0,0 +1,136 @@
+"""
+Benchmark: one-call vs two-phase (COMPOSITE_SPLIT) composite object generation.
+
+Runs GamiAgent against fake providers whose composite responses hold the
+requested number of parts and whose latency grows with the output, like a
+streaming model: time to first token plus output tokens / throughput. The plan
+call is answered at --plan-tps (the composite_plan tier is a small model), the
+others at --tps. Times objects of 5, 15 and 40 parts by default.
+
+Usage:
+    python benchmarks/bench_composite.py
+    python benchmarks/bench_composite.py --parts 5 15 40 --batch 6 --tps 60 --plan-tps 150
+"""
+import argparse
+import contextlib
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+TYPES = ("box", "sphere", "cylinder", "softbox")
+BATCH_LINE = re.compile(r"exactly these names and types:\s*(\[.*?\])\s*\n", re.S)
+
+
+def _part(index: int, name: str = None, part_type: str = None) -> dict:
+    part_type = part_type or TYPES[index % len(TYPES)]
+    options = {
+        "box": ("boxOptions", {"width": 1.0, "height": 0.8, "depth": 0.6}),
+        "sphere": ("sphereOptions", {"diameter": 0.9, "segments": 16}),
+        "cylinder": ("cylinderOptions", {"height": 1.2, "diameter": 0.4, "tessellation": 24}),
+        "softbox": ("softboxOptions", {"width": 1.0, "height": 1.0, "depth": 1.0, "radius": 0.15, "arcSegments": 4}),
+    }[part_type]
+    return {
+        options[0]: options[1],
+        "type": part_type,
+        "name": name or f"part_{index}",
+        "material": {"albedoColor": [0.8, 0.3 + index % 5 * 0.1, 0.2], "metallic": 0.1, "roughness": 0.7},
+        "transform": {"position": [index * 0.25, 0.5, 0.0], "rotation": [0.0, 0.0, 0.0], "scale": [1.0, 1.0, 1.0]},
+    }
+
+
+def _plan_item(index: int) -> dict:
+    return {"name": f"part_{index}", "type": TYPES[index % len(TYPES)], "role": f"feature {index} of the object",
+            "center": [index * 0.25, 0.5, 0.0], "size": [1.0, 0.8, 0.6], "color": [0.8, 0.4, 0.2]}
+
+
+def make_responder(parts: dict, ttft: float, tps: float, plan_tps: float):
+    import fake_providers
+    fake_respond = fake_providers.respond
+
+    def respond(method, url, body):
+        operation = fake_providers.current_operation()
+        task = operation.split(".", 1)[-1]
+        if "/chat/completions" not in url or task not in ("composite", "composite_plan", "composite_parts"):
+            return fake_respond(method, url, body)
+        payload = json.loads(body)
+        count = parts["count"]
+        if task == "composite":
+            content = {"name": "bench object", "description": None, "parts": [_part(i) for i in range(count)],
+                       "overallTransform": None}
+        elif task == "composite_plan":
+            content = {"name": "bench object", "description": "benchmark object",
+                       "parts": [_plan_item(i) for i in range(count)]}
+        else:
+            batch = json.loads(BATCH_LINE.search(payload["messages"][-1]["content"]).group(1))
+            content = {"parts": [_part(i, item["name"], item["type"]) for i, item in enumerate(batch)]}
+        # Models emit indented JSON; the output size is what makes large objects slow
+        text = json.dumps(content, indent=2)
+        out_tokens = fake_providers._tokens(text)
+        delay = ttft + out_tokens / (plan_tps if task == "composite_plan" else tps)
+        status, content_type, response, _ = fake_respond(method, url, body)
+        data = json.loads(response)
+        data["choices"][0]["message"]["content"] = text
+        data["usage"]["completion_tokens"] = out_tokens
+        return status, content_type, json.dumps(data).encode("utf-8"), delay
+
+    return respond
+
+
+def main():
+    parser = argparse.ArgumentParser(description="One-call vs two-phase composite object generation")
+    parser.add_argument("--parts", type=int, nargs="+", default=[5, 15, 40])
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=6, help="COMPOSITE_PART_BATCH")
+    parser.add_argument("--ttft", type=float, default=0.6, help="Seconds to first token")
+    parser.add_argument("--tps", type=float, default=60.0, help="Output tokens/s of the composite model")
+    parser.add_argument("--plan-tps", type=float, default=150.0, help="Output tokens/s of the composite_plan tier")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["PROVIDER_MODE"] = "fake"
+    os.environ["COMPOSITE_PART_BATCH"] = str(args.batch)
+    os.environ.setdefault("OPENAI_API_KEY", "bench-key")
+    sys.path.append(str(SERVER_DIR))
+    os.chdir(SERVER_DIR)
+    import fake_providers
+    import gami_agent
+
+    parts = {"count": 0}
+    fake_providers.respond = make_responder(parts, args.ttft, args.tps, args.plan_tps)
+    agent = gami_agent.GamiAgent(model="gpt-4o")
+
+    def one_call():
+        gami_agent.COMPOSITE_SPLIT = False
+        return agent._generate_asset("a robot", [], temperature=0.7)
+
+    def split():
+        return agent._generate_asset_split("a robot", temperature=0.7)
+
+    def timed(fn):
+        samples = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(open(os.devnull, "w")):
+                result = fn()
+            samples.append(time.perf_counter() - start)
+            assert len(result.parts) == parts["count"], f"{len(result.parts)} parts, expected {parts['count']}"
+        return statistics.median(samples)
+
+    print(f" :: ttft {args.ttft}s, {args.tps:g} tok/s (plan {args.plan_tps:g} tok/s), batches of {args.batch}, "
+          f"median of {args.iterations}")
+    print(f"{'parts':>6}{'batches':>9}{'one call s':>12}{'split s':>10}{'speedup':>9}")
+    print("-" * 46)
+    for count in args.parts:
+        parts["count"] = count
+        single, two_phase = timed(one_call), timed(split)
+        batches = -(-count // args.batch)
+        print(f"{count:>6}{batches:>9}{single:>12.2f}{two_phase:>10.2f}{single / two_phase:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+CPU, peak RSS and base64 traffic per generated asset in the visual pipeline.
+
+Each asset kind runs in its own subprocess against the offline fake providers
+(no provider latency), so ru_maxrss reflects that kind alone:
+  object            txt2img -> background removal -> save
+  reference_object  reference file -> GPT edit -> background removal -> save
+  world             skybox base -> outpaint -> save (fresh prompt, no stage cache hits)
+  reference_world   reference file -> GPT edit -> outpaint -> save
+Reported per asset: pipeline CPU time (the fake providers run in-process, so
+the time they spend building responses is subtracted), wall time, peak RSS
+and its growth over a warmed-up process, and the base64 encodes/decodes
+ImageHandle performed (count and bytes).
+
+Usage:
+    python benchmarks/bench_image_pipeline.py
+    python benchmarks/bench_image_pipeline.py --iterations 20 --image-size 1536 --rembg-api native --matting remote
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+KINDS = ("object", "reference_object", "world", "reference_world")
+
+
+def counting_base64(counts: dict):
+    """Stand-in for image_handle's base64 module that tallies conversions"""
+    import base64
+
+    def encode(data):
+        counts["encodes"] += 1
+        counts["encoded_bytes"] += len(data)
+        return base64.b64encode(data)
+
+    def decode(data):
+        counts["decodes"] += 1
+        counts["decoded_bytes"] += len(data)
+        return base64.b64decode(data)
+
+    return SimpleNamespace(b64encode=encode, b64decode=decode)
+
+
+def timing_responder(respond, spent: dict):
+    def timed_respond(*args):
+        start = time.process_time()
+        try:
+            return respond(*args)
+        finally:
+            spent["provider_cpu"] += time.process_time() - start
+    return timed_respond
+
+
+def run_worker(kind: str, iterations: int, reference: str, out_dir: Path) -> dict:
+    sys.path.append(str(SERVER_DIR))
+    import fake_providers
+    import image_handle
+    from image_handle import ImageHandle
+    from VisualManager import VisualManager
+
+    counts = {"encodes": 0, "decodes": 0, "encoded_bytes": 0, "decoded_bytes": 0}
+    image_handle.base64 = counting_base64(counts)
+    spent = {"provider_cpu": 0.0}
+    fake_providers.respond = timing_responder(fake_providers.respond, spent)  # picked up by the lazily built session
+    vm = VisualManager("bench_image_pipeline", "", {})
+
+    def one(i: int):
+        prompt = f"{kind} {i}: mossy stone ruins under a pink sky"
+        if kind == "object":
+            image = vm.generate_transparent_asset(prompt)
+        elif kind == "reference_object":
+            edited = vm.generate_image_with_gpt_edit(prompt, ImageHandle.from_file(reference), reference)
+            image = vm._remove_background(edited)
+        elif kind == "world":
+            image = vm.generate_skybox(prompt, "text, watermark")
+        else:
+            image = vm.generate_reference_skybox(prompt, ImageHandle.from_file(reference), reference)
+        if not image:
+            raise RuntimeError(f"{kind} generation failed")
+        image.save(out_dir / f"{kind}_{i}.png")
+
+    one(-1)  # imports, PIL plugins, connection setup
+    for key in counts:
+        counts[key] = 0
+    spent["provider_cpu"] = 0.0
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for i in range(iterations):
+        one(i)
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "kind": kind,
+        "cpu_ms": (cpu - spent["provider_cpu"]) * 1000 / iterations,
+        "provider_cpu_ms": spent["provider_cpu"] * 1000 / iterations,
+        "wall_ms": wall * 1000 / iterations,
+        "peak_rss_mb": rss_after / 1024,
+        "rss_growth_mb": (rss_after - rss_before) / 1024,
+        **{key: value / iterations for key, value in counts.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-asset CPU / RSS of the visual pipeline")
+    parser.add_argument("--kinds", default=",".join(KINDS))
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--image-size", type=int, default=1024, help="Fake provider image size")
+    parser.add_argument("--reference", default=str(SERVER_DIR / "assets" / "test" / "cake.jpg"))
+    parser.add_argument("--matting", default="remote", help="MATTING_BACKEND for background removal")
+    parser.add_argument("--rembg-api", default="a1111", help="REMBG_API (a1111 = JSON/base64, native = multipart)")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args.worker, args.iterations, args.reference, Path(os.environ["BENCH_OUT_DIR"]))
+        print(json.dumps(result))
+        return
+
+    workdir = Path(tempfile.mkdtemp(prefix="smallgami_images_"))
+    env = {
+        **os.environ,
+        "PROVIDER_MODE": "fake",
+        "FAKE_LATENCY_SCALE": "0",
+        "FAKE_IMAGE_SIZE": str(args.image_size),
+        "LOG_LEVEL": "WARNING",
+        "VITE_URL_GPT": os.getenv("VITE_URL_GPT", "http://localhost:3000/"),
+        "MATTING_BACKEND": args.matting,
+        "REMBG_API": args.rembg_api,
+        "SKYBOX_CACHE_DIR": str(workdir / "skybox_cache"),
+        "BENCH_OUT_DIR": str(workdir),
+    }
+
+    print(f" :: {args.iterations} assets per kind, {args.image_size}px fake images, "
+          f"matting={args.matting}, rembg api={args.rembg_api}")
+    header = f"{'kind':<18}{'cpu ms':>9}{'wall ms':>9}{'peak MB':>9}{'RSS +MB':>9}{'b64 enc':>9}{'b64 dec':>9}{'b64 MB':>8}"
+    print(header)
+    print("-" * len(header))
+    results = []
+    for kind in args.kinds.split(","):
+        completed = subprocess.run(
+            [sys.executable, __file__, "--worker", kind, "--iterations", str(args.iterations), "--reference", args.reference],
+            env=env, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            print(f"{kind:<18}failed: {completed.stderr.strip().splitlines()[-1] if completed.stderr else completed.returncode}")
+            continue
+        row = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.append(row)
+        print(f"{kind:<18}{row['cpu_ms']:>9.1f}{row['wall_ms']:>9.1f}{row['peak_rss_mb']:>9.1f}{row['rss_growth_mb']:>9.1f}"
+              f"{row['encodes']:>9.1f}{row['decodes']:>9.1f}{(row['encoded_bytes'] + row['decoded_bytes']) / 1e6:>8.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"iterations": args.iterations, "image_size": args.image_size, "matting": args.matting,
+                       "rembg_api": args.rembg_api, "results": results}, f, indent=2)
+        print(f" :: Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Compare the local CPU matte with the rembg server on test images.
+
+For every image: full local matte latency, its quality score, the decision
+MATTING_BACKEND=auto would take and what auto spends on it (escalated images
+stop after the border check). With --remote, each image also goes through
+rembg (VisualManager._remove_background_remote, SD_URL2 or --rembg-url), and
+the table adds its latency plus the IoU and mean absolute difference between
+the two alpha masks. Images that already have transparency are also flattened
+onto white first, so their own alpha serves as ground truth for the local matte.
+
+Usage:
+    python benchmarks/bench_matting.py
+    python benchmarks/bench_matting.py --remote --rembg-url http://gcrsandbox388:5002/ --save /tmp/mattes
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(SERVER_DIR))
+
+import matting
+from config import MATTING_MIN_QUALITY
+from image_handle import ImageHandle
+
+
+def alpha_mask(image: Image.Image) -> np.ndarray:
+    return np.asarray(image.convert("RGBA").getchannel("A"), dtype=np.float32) / 255.0
+
+
+def compare(a: np.ndarray, b: np.ndarray) -> dict:
+    if a.shape != b.shape:
+        b = np.asarray(Image.fromarray((b * 255).astype(np.uint8)).resize(a.shape[::-1]), dtype=np.float32) / 255.0
+    union = ((a > 0.5) | (b > 0.5)).sum()
+    return {
+        "iou": float(((a > 0.5) & (b > 0.5)).sum() / union) if union else 1.0,
+        "mad": float(np.abs(a - b).mean()),
+    }
+
+
+def timed(fn, repeat: int):
+    samples, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def load_cases(pattern: str):
+    """(name, image) pairs; transparent images also as a white-flattened copy with their alpha as truth"""
+    for path in sorted(glob.glob(pattern)):
+        if Path(path).suffix.lower() not in (".png", ".jpg", ".jpeg", ".webp"):
+            continue
+        image = Image.open(path)
+        image.load()
+        yield Path(path).name, image, None
+        if image.mode == "RGBA" and alpha_mask(image).min() < 1.0:
+            flat = Image.new("RGBA", image.size, (255, 255, 255, 255))
+            flat.alpha_composite(image)
+            yield f"{Path(path).name} (on white)", flat.convert("RGB"), alpha_mask(image)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local matte vs rembg")
+    parser.add_argument("--images", default=str(SERVER_DIR / "assets" / "test" / "*"))
+    parser.add_argument("--repeat", type=int, default=3, help="Local runs per image (median reported)")
+    parser.add_argument("--remote", action="store_true", help="Also run the rembg server")
+    parser.add_argument("--rembg-url", help="rembg server base URL (default: SD_URL2)")
+    parser.add_argument("--save", help="Write local (and remote) mattes to this directory")
+    parser.add_argument("--json", help="Write per-image results to this file")
+    args = parser.parse_args()
+
+    remote = None
+    if args.remote:
+        if args.rembg_url:
+            os.environ["SD_URL2"] = args.rembg_url
+        os.environ.setdefault("VITE_URL_GPT", "http://localhost/")
+        from VisualManager import VisualManager
+        remote = VisualManager("bench_matting", "", {})._remove_background_remote
+    if args.save:
+        Path(args.save).mkdir(parents=True, exist_ok=True)
+
+    header = f"{'image':<34}{'size':>11}{'local ms':>10}{'quality':>9}{'auto':>7}{'auto ms':>9}{'truth IoU':>11}"
+    if remote:
+        header += f"{'rembg ms':>10}{'IoU':>7}{'MAD':>7}"
+    print(header)
+    print("-" * len(header))
+
+    results = []
+    for name, image, truth in load_cases(args.images):
+        handle = ImageHandle.from_image(image)
+        local_ms, matte = timed(lambda: matting.local_matte(handle.open()), args.repeat)
+        auto_ms, _ = timed(lambda: matting.local_matte(handle.open(), min_border_match=MATTING_MIN_QUALITY), args.repeat)
+        row = {
+            "image": name,
+            "size": list(image.size),
+            "local_ms": local_ms,
+            "quality": matte.quality,
+            "border_match": matte.border_match,
+            "coverage": matte.coverage,
+            "auto": "local" if matte.quality >= MATTING_MIN_QUALITY else "rembg",
+            "auto_ms": auto_ms,
+        }
+        local_alpha = alpha_mask(matte.image)
+        if truth is not None:
+            row["truth"] = compare(truth, local_alpha)
+        line = (f"{name:<34}{'x'.join(map(str, image.size)):>11}{local_ms:>10.1f}{matte.quality:>9.2f}{row['auto']:>7}{auto_ms:>9.1f}"
+                f"{format(row['truth']['iou'], '.3f') if truth is not None else '-':>11}")
+        if args.save:
+            matte.image.save(Path(args.save) / f"{Path(name.split(' ')[0]).stem}{'_white' if truth is not None else ''}_local.png")
+
+        if remote:
+            remote_ms, remote_result = timed(lambda: remote(handle), 1)
+            if remote_result:
+                remote_image = remote_result.open()
+                row.update(remote_ms=remote_ms, remote=compare(alpha_mask(remote_image), local_alpha))
+                line += f"{remote_ms:>10.1f}{row['remote']['iou']:>7.3f}{row['remote']['mad']:>7.3f}"
+                if args.save:
+                    remote_image.save(Path(args.save) / f"{Path(name.split(' ')[0]).stem}{'_white' if truth is not None else ''}_rembg.png")
+            else:
+                line += f"{'failed':>10}"
+        print(line)
+        results.append(row)
+
+    accepted = [row for row in results if row["auto"] == "local"]
+    print(f" :: auto keeps {len(accepted)}/{len(results)} images local "
+          f"(median {statistics.median([r['local_ms'] for r in accepted]) if accepted else 0:.1f} ms)")
+    with_remote = [row for row in results if "remote_ms" in row]
+    if with_remote:
+        print(f" :: rembg median {statistics.median([r['remote_ms'] for r in with_remote]):.1f} ms, "
+              f"IoU vs local on accepted images "
+              f"{statistics.mean([r['remote']['iou'] for r in with_remote if r['auto'] == 'local'] or [float('nan')]):.3f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"min_quality": MATTING_MIN_QUALITY, "results": results}, f, indent=2)
+        print(f" :: Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+End-to-end benchmark of the server routes against the offline fake providers.
+
+Starts the app in-process with PROVIDER_MODE=fake (or targets a running server
+with --url) and drives each scenario at every concurrency level. Reports
+throughput, client-side p50/p95/p99 and the server-side overhead: the time of
+each request that was NOT spent waiting on a provider, taken from its trace.
+
+Usage:
+    python benchmarks/bench_server.py
+    python benchmarks/bench_server.py --concurrency 1,8,32 --requests 64
+    python benchmarks/bench_server.py --latency-scale 0        # providers answer instantly
+    python benchmarks/bench_server.py --url http://localhost:8000 --scenarios world,chat
+    python benchmarks/bench_server.py --cassette cassettes/test_game   # replay recorded provider traffic
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from PIL import Image
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+PROVIDER_SERVICES = ("llm.", "vision.", "image.", "audio.")
+
+
+def _sample_image_b64() -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (256, 256), (200, 120, 40)).save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def build_scenarios(game_config: dict):
+    """Scenario name -> (path, payload) using a saved game config as the current state"""
+    world = game_config.get("world", {})
+    player = game_config.get("player", {})
+    objects = game_config.get("objects", [])
+    mechanism = game_config.get("mechanism", "")
+    narrative = {"player": player.get("description", "a bird"), "world": world.get("description", "a sky")}
+    return {
+        "player": ("/blockGenerate", {
+            "blockType": "player", "actionType": "generate",
+            "content": "a penguin with a red scarf", "currentPlayerConfig": player,
+        }),
+        "world": ("/blockGenerate", {
+            "blockType": "world", "actionType": "generate",
+            "content": "snowy mountain peaks", "currentWorldConfig": world,
+            "playerDescription": narrative["player"],
+        }),
+        "object": ("/blockGenerate", {
+            "blockType": "object", "actionType": "generate",
+            "content": "a frozen fish", "currentObjectConfig": objects[0] if objects else {"name": "box1"},
+            "currentSpawnConfigs": game_config.get("spawn", []),
+            "worldDescription": narrative["world"], "mechanism": mechanism,
+        }),
+        "change_propagation": ("/changePropagation", {
+            "changedBlockType": "world", "oldContent": narrative["world"],
+            "newContent": "snowy mountain peaks", "mechanism": mechanism,
+        }),
+        "cohesive_chat": ("/cohesiveChat", {
+            "message": "make it a winter game", "currentNarrative": narrative, "mechanism": mechanism,
+        }),
+        "chat": ("/chat", {
+            "message": "what should the player look like?", "history": [], "worldConfig": world,
+        }),
+        "interpret_media": ("/interpretMedia", {
+            "image": _sample_image_b64(), "blockType": "world",
+        }),
+    }
+
+
+def start_local_server(args) -> str:
+    """Run the app in a background thread with fake providers; returns its base URL"""
+    if args.cassette:
+        os.environ["PROVIDER_MODE"] = "replay"
+        os.environ["CASSETTE_DIR"] = str(Path(args.cassette).resolve())
+        os.environ["CASSETTE_LATENCY_SCALE"] = str(args.latency_scale)
+    os.environ.setdefault("PROVIDER_MODE", "fake")
+    os.environ["FAKE_LATENCY_SCALE"] = str(args.latency_scale)
+    os.environ["FAKE_SEED"] = str(args.seed)
+    os.environ.setdefault("FRONTEND_ASSETS_DIR", tempfile.mkdtemp(prefix="smallgami_bench_assets_"))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Every world request has the same description and would be a texture library hit
+    os.environ.setdefault("TEXTURE_LIBRARY_MODE", "off")
+    os.environ.setdefault("TEXTURE_LIBRARY_DIR", tempfile.mkdtemp(prefix="smallgami_bench_textures_"))
+    # Keep the run's stores out of the working tree (a prewarmed pool would turn requests into pool hits)
+    os.environ.setdefault("ASSET_MAP_FILE", str(Path(tempfile.mkdtemp(prefix="smallgami_bench_map_")) / "asset_map.jsonl"))
+    os.environ.setdefault("ANALYSIS_INDEX_DIR", tempfile.mkdtemp(prefix="smallgami_bench_analysis_"))
+    os.environ.setdefault("ASSET_POOL_DIR", tempfile.mkdtemp(prefix="smallgami_bench_pool_"))
+    # Traces are fetched after each timed run, so keep enough of them around
+    os.environ.setdefault("TRACE_BUFFER_SIZE", "20000")
+    sys.path.append(str(SERVER_DIR))
+
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    # The server's log handler keeps the stream it starts with, so leave devnull open
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        from main import app
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.port}"
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def provider_time_ms(spans) -> float:
+    """Wall time covered by provider-call spans (overlapping calls counted once)"""
+    intervals = sorted(
+        (span["startTimeUnixNano"], span["endTimeUnixNano"])
+        for span in spans
+        if span["name"].startswith(PROVIDER_SERVICES) and span["endTimeUnixNano"]
+    )
+    covered, current_start, current_end = 0, None, None
+    for start, end in intervals:
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                covered += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        covered += current_end - current_start
+    return covered / 1e6
+
+
+class Runner:
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def one(self, path: str, payload: dict, index: int) -> dict:
+        session = self._session()
+        request_id = f"bench-{path.strip('/')}-{index}-{os.urandom(4).hex()}"
+        start = time.perf_counter()
+        try:
+            response = session.post(self.base_url + path, json=payload, headers={"X-Request-Id": request_id}, timeout=600)
+            ok = response.status_code == 200 and response.json().get("success", True)
+        except requests.RequestException:
+            ok = False
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        return {"ok": ok, "latency_ms": latency_ms, "request_id": request_id}
+
+    def add_server_timing(self, result: dict):
+        """Server duration and overhead (server time outside provider calls) from the request's trace"""
+        trace = self._session().get(f"{self.base_url}/traces/{result['request_id']}", timeout=30)
+        if trace.status_code == 200:
+            trace = trace.json()["trace"]
+            result["server_ms"] = trace["duration_ms"]
+            result["overhead_ms"] = max(trace["duration_ms"] - provider_time_ms(trace["spans"]), 0.0)
+
+    def run(self, path: str, payload: dict, concurrency: int, total: int) -> dict:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda i: self.one(path, payload, i), range(total)))
+        elapsed = time.perf_counter() - start
+        for result in results:
+            self.add_server_timing(result)
+
+        latencies = [r["latency_ms"] for r in results]
+        server = [r["server_ms"] for r in results if "server_ms" in r]
+        overhead = [r["overhead_ms"] for r in results if "overhead_ms" in r]
+        return {
+            "requests": total,
+            "errors": sum(1 for r in results if not r["ok"]),
+            "throughput_rps": total / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "server_p50_ms": percentile(server, 50),
+            "overhead_p50_ms": percentile(overhead, 50),
+            "overhead_p95_ms": percentile(overhead, 95),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SmallGami server routes with fake providers")
+    parser.add_argument("--url", help="Benchmark a running server instead of starting one in-process")
+    parser.add_argument("--scenarios", default="player,world,object,change_propagation,cohesive_chat,chat,interpret_media")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests per scenario")
+    parser.add_argument("--latency-scale", type=float, default=float(os.getenv("FAKE_LATENCY_SCALE", "1.0")),
+                        help="Multiplier for fake provider latency (0 = instant, measures server overhead only)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cassette", help="Replay this provider cassette instead of the fakes (latency x --latency-scale)")
+    parser.add_argument("--game-config", default=str(SERVER_DIR.parent / "demo" / "src" / "config" / "flappy_bird.json"))
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    with open(args.game_config, "r", encoding="utf-8") as f:
+        scenarios = build_scenarios(json.load(f))
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in scenarios]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)} (available: {', '.join(scenarios)})")
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        base_url = start_local_server(args)
+    runner = Runner(base_url)
+
+    def quiet():
+        # Keep the in-process server's console output out of the report
+        return contextlib.nullcontext() if args.url else contextlib.redirect_stdout(open(os.devnull, "w"))
+
+    results = []
+    header = f"{'scenario':<20}{'conc':>5}{'n':>5}{'err':>5}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'server p50':>12}{'ovh p50':>9}{'ovh p95':>9}"
+    source = f"cassette {args.cassette}" if args.cassette else "fake provider"
+    print(f" :: Benchmarking {base_url}" + ("" if args.url else f" ({source} latency x{args.latency_scale})"))
+    print(header)
+    print("-" * len(header))
+    for name in names:
+        path, payload = scenarios[name]
+        with quiet():
+            for i in range(args.warmup):
+                runner.one(path, payload, -1 - i)
+        for level in levels:
+            with quiet():
+                stats = runner.run(path, payload, level, args.requests)
+            results.append({"scenario": name, "concurrency": level, **stats})
+            print(f"{name:<20}{level:>5}{stats['requests']:>5}{stats['errors']:>5}{stats['throughput_rps']:>8.1f}"
+                  f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+                  f"{stats['server_p50_ms']:>12.1f}{stats['overhead_p50_ms']:>9.1f}{stats['overhead_p95_ms']:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"url": base_url, "latency_scale": args.latency_scale, "results": results}, f, indent=2)
+        print(f" :: Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
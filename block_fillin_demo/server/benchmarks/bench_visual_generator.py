@@ -0,0 +1,108 @@
+"""
+Microbenchmark: a VisualGenerator per request vs the shared app-level instance.
+
+Serves the OpenAI images API from a local keep-alive HTTP server (responses
+come from fake_providers) and times, per request:
+  construct   VisualGenerator() alone (OpenAI client, httpx pool, SSL context)
+  per-request VisualGenerator() + generate_ground_texture(), as the world branch used to
+  shared      generate_ground_texture() on one long-lived instance
+New TCP connections are counted on the server side. Point --base-url at a real
+OpenAI-compatible endpoint to include TLS handshakes (this spends quota).
+
+Usage:
+    python benchmarks/bench_visual_generator.py
+    python benchmarks/bench_visual_generator.py --iterations 200 --size 256x256
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+
+class _ImagesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with _ImagesHandler.lock:
+            _ImagesHandler.connections += 1
+
+    def do_POST(self):
+        import fake_providers
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status, content_type, content, _ = fake_providers.respond("POST", self.path, body)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_images_server() -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ImagesHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/v1"
+
+
+def timed(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request vs shared VisualGenerator")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--size", default="256x256", help="Requested texture size (smaller isolates client overhead)")
+    parser.add_argument("--base-url", help="OpenAI-compatible endpoint to use instead of the local fake server")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("FAKE_LATENCY_SCALE", "0")
+    os.environ.setdefault("OPENAI_API_KEY", "bench-key")
+    os.environ.setdefault("TEXTURE_LIBRARY_MODE", "off")
+    os.environ["OPENAI_BASE_URL"] = args.base_url or start_images_server()
+    sys.path.append(str(SERVER_DIR))
+    from VisualGenerator import VisualGenerator
+
+    def generate(generator):
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            generator.generate_ground_texture("snowy mountain peaks", size=args.size)
+
+    def run(name, fn):
+        before = _ImagesHandler.connections
+        samples = timed(fn, args.iterations)
+        opened = _ImagesHandler.connections - before
+        print(f"{name:<14}{statistics.mean(samples):>10.2f}{statistics.median(samples):>10.2f}"
+              f"{sorted(samples)[int(len(samples) * 0.95) - 1]:>10.2f}{opened if not args.base_url else '-':>14}")
+        return statistics.mean(samples)
+
+    shared = VisualGenerator()
+    generate(shared)  # warm the shared pool like a running server
+
+    print(f" :: {args.iterations} iterations against {os.environ['OPENAI_BASE_URL']}")
+    print(f"{'mode':<14}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'connections':>14}")
+    print("-" * 58)
+    run("construct", VisualGenerator)
+    per_request = run("per-request", lambda: generate(VisualGenerator()))
+    shared_ms = run("shared", lambda: generate(shared))
+    print(f" :: Shared instance saves {per_request - shared_ms:.2f} ms per world request")
+
+
+if __name__ == "__main__":
+    main()
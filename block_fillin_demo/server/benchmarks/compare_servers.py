@@ -0,0 +1,127 @@
+"""
+Load-test the Flask dev server (python main.py) against gunicorn (gunicorn.conf.py).
+
+Both run with the offline fake providers; each is started in its own process
+group, waited on via /readyz, driven by bench_server.py --url and stopped with
+SIGTERM. Prints throughput and latency side by side.
+
+Usage:
+    python benchmarks/compare_servers.py
+    python benchmarks/compare_servers.py --concurrency 8,32 --requests 128 --workers 4 --threads 16
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import requests
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+
+def wait_ready(base_url: str, process: subprocess.Popen, timeout: float = 120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if requests.get(f"{base_url}/readyz", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} not ready after {timeout:.0f}s")
+
+
+def start(command, env, log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(command, cwd=SERVER_DIR, env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+
+
+def stop(process: subprocess.Popen):
+    # The dev server's reloader runs the app in a child process; signal the whole group
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=90)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def bench(base_url: str, args, out: Path) -> list:
+    subprocess.run([
+        sys.executable, str(SERVER_DIR / "benchmarks" / "bench_server.py"),
+        "--url", base_url, "--scenarios", args.scenarios, "--concurrency", args.concurrency,
+        "--requests", str(args.requests), "--warmup", str(args.warmup), "--json", str(out),
+    ], check=True)
+    with open(out, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Flask dev server with gunicorn under load")
+    parser.add_argument("--scenarios", default="world,object,change_propagation,chat")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--latency-scale", type=float, default=0.1,
+                        help="Fake provider latency multiplier (requests still wait on I/O, like in production)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--json", help="Write both result sets to this file")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="smallgami_compare_"))
+    env = {
+        **os.environ,
+        "PROVIDER_MODE": "fake",
+        "FAKE_LATENCY_SCALE": str(args.latency_scale),
+        "FRONTEND_ASSETS_DIR": str(workdir / "assets"),
+        "TEXTURE_LIBRARY_MODE": "off",
+        "TEXTURE_LIBRARY_DIR": str(workdir / "textures"),
+        "LOG_LEVEL": "WARNING",
+        "TRACE_BUFFER_SIZE": "20000",
+        "WEB_WORKERS": str(args.workers),
+        "WEB_THREADS": str(args.threads),
+    }
+    (workdir / "assets").mkdir()
+    servers = {
+        "dev": [sys.executable, "main.py"],
+        "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+    }
+
+    results = {}
+    for offset, (name, command) in enumerate(servers.items()):
+        port = args.port + offset
+        base_url = f"http://127.0.0.1:{port}"
+        print(f" :: Starting {name} server on {base_url} (log: {workdir / f'{name}.log'})")
+        process = start(command, {**env, "PORT": str(port), "APP_DEBUG": "1"}, workdir / f"{name}.log")
+        try:
+            wait_ready(base_url, process)
+            results[name] = bench(base_url, args, workdir / f"{name}.json")
+        finally:
+            stop(process)
+
+    header = f"{'scenario':<20}{'conc':>5}{'dev rps':>10}{'guni rps':>10}{'dev p50':>10}{'guni p50':>10}{'dev p95':>10}{'guni p95':>10}{'errors':>9}"
+    print()
+    print(header)
+    print("-" * len(header))
+    for dev, guni in zip(results["dev"], results["gunicorn"]):
+        print(f"{dev['scenario']:<20}{dev['concurrency']:>5}{dev['throughput_rps']:>10.1f}{guni['throughput_rps']:>10.1f}"
+              f"{dev['p50_ms']:>10.1f}{guni['p50_ms']:>10.1f}{dev['p95_ms']:>10.1f}{guni['p95_ms']:>10.1f}"
+              f"{dev['errors']:>4}/{guni['errors']:<4}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"latency_scale": args.latency_scale, "workers": args.workers, "threads": args.threads,
+                       "results": results}, f, indent=2)
+        print(f" :: Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
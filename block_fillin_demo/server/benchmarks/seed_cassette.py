@@ -0,0 +1,122 @@
+"""
+Seed a provider cassette's fixtures from saved games in _data/<game_id>.
+
+Replaying a cassette falls back to the fake providers for calls it has no
+recording of; the fixtures written here make those fallbacks return real game
+content instead of schema placeholders:
+
+    fixtures/image/*                                   images saved with the game
+    fixtures/llm.askLLM.jump_game_description.json     game descriptions
+    fixtures/llm.askLLM.jumping_<part>_config.json     player/world/objects DSL configs
+    fixtures/vision.analyze_image.<schema>.json        image analyses from the factory store
+
+Usage:
+    python benchmarks/seed_cassette.py test_game test_internship
+    python benchmarks/seed_cassette.py --cassette cassettes/jump    # every game in _data
+"""
+import argparse
+import json
+import shutil
+import sys
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = SERVER_DIR / "_data"
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".webp")
+
+# DSL config part -> askLLM json_schema name used by GameConfigurator
+DSL_SCHEMAS = {
+    "player": "jumping_player_config",
+    "world": "jumping_world_config",
+    "objects": "jumping_objects_config",
+}
+
+
+def _load(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def collect(game_dir: Path, fixtures: dict, images: list):
+    """Add a game's saved LLM/vision outputs to fixtures (fixture name -> entries) and its images"""
+    for name in ("jumping_game_description.json", "game_description.json"):
+        if (game_dir / name).exists():
+            data = _load(game_dir / name)
+            # game_description.json keeps the history as [{"id", "content"}, ...]
+            entries = [item["content"] for item in data if isinstance(item, dict) and "content" in item] \
+                if isinstance(data, list) else [data]
+            fixtures.setdefault("llm.askLLM.jump_game_description", []).extend(entries)
+    if (game_dir / "game_description.jsonl").exists():
+        # description_history's store: one {"id", "content"} entry per line
+        with open(game_dir / "game_description.jsonl", "r", encoding="utf-8") as f:
+            entries = [json.loads(line)["content"] for line in f if line.strip()]
+        fixtures.setdefault("llm.askLLM.jump_game_description", []).extend(entries)
+
+    if (game_dir / "jumping_game_dsl_config.json").exists():
+        dsl = _load(game_dir / "jumping_game_dsl_config.json")
+        for part, schema_name in DSL_SCHEMAS.items():
+            if part in dsl:
+                fixtures.setdefault(f"llm.askLLM.{schema_name}", []).append(dsl[part])
+
+    for name in ("factory_store.json", "factory_state.json"):
+        if (game_dir / name).exists():
+            for item in _load(game_dir / name).get("factory_store", []):
+                content = item.get("content")
+                # Skip failed analyses (error entries and their "N/A" placeholders)
+                if not isinstance(content, dict) or "error" in content or content.get("worlds") == "N/A":
+                    continue
+                # Decompositions (worlds/objects/events) answer Gami.decompose_image's schema
+                key = "vision.analyze_image.image_decomposition_config" if "worlds" in content else "vision.analyze_image"
+                fixtures.setdefault(key, []).append(content)
+
+    images.extend(sorted(p for p in game_dir.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES))
+
+
+def write(cassette_dir: Path, fixtures: dict, images: list):
+    fixtures_dir = cassette_dir / "fixtures"
+    fixtures_dir.mkdir(parents=True, exist_ok=True)
+    for name, entries in fixtures.items():
+        path = fixtures_dir / f"{name}.json"
+        existing = _load(path) if path.exists() else []
+        existing = existing if isinstance(existing, list) else [existing]
+        seen = {json.dumps(entry, sort_keys=True) for entry in existing}
+        for entry in entries:
+            key = json.dumps(entry, sort_keys=True)
+            if key not in seen:
+                existing.append(entry)
+                seen.add(key)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(existing, f, indent=2, ensure_ascii=False)
+        print(f" :: {path.relative_to(cassette_dir)}: {len(existing)} entries")
+
+    if images:
+        image_dir = fixtures_dir / "image"
+        image_dir.mkdir(exist_ok=True)
+        for image in images:
+            if not (image_dir / image.name).exists():
+                shutil.copyfile(image, image_dir / image.name)
+        print(f" :: fixtures/image: {len(list(image_dir.iterdir()))} images")
+
+
+def main():
+    sys.path.append(str(SERVER_DIR))
+    from config import CASSETTE_DIR
+
+    parser = argparse.ArgumentParser(description="Seed cassette fixtures from saved games in _data")
+    parser.add_argument("games", nargs="*", help="Game ids under _data (default: all)")
+    parser.add_argument("--cassette", default=str(CASSETTE_DIR), help="Cassette directory to write fixtures into")
+    args = parser.parse_args()
+
+    game_dirs = [DATA_DIR / game for game in args.games] if args.games else sorted(p for p in DATA_DIR.iterdir() if p.is_dir())
+    missing = [str(p) for p in game_dirs if not p.is_dir()]
+    if missing:
+        parser.error(f"No such game folder: {', '.join(missing)}")
+
+    fixtures, images = {}, []
+    for game_dir in game_dirs:
+        collect(game_dir, fixtures, images)
+    write(Path(args.cassette), fixtures, images)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+cassette: Record and replay outbound provider traffic.
+
+With PROVIDER_MODE=record every provider request made through providers.py
+(GamiAgent, MediaInterpreter, VisualManager, VisualGenerator, AudioManager,
+Gami.askLLM, the Stable Audio route) still goes to the real service and the
+exchange is appended to CASSETTE_DIR:
+
+    interactions.jsonl   one line per call: operation (tracing span name), method,
+                         url, request hash/size, status, content type, latency and
+                         the response body inline, or body_ref for large/binary ones
+    blobs/<sha256>       response bodies stored once by content hash
+    fixtures/            optional fake-provider fixtures (see benchmarks/seed_cassette.py)
+
+PROVIDER_MODE=replay answers from the cassette with the recorded latency times
+CASSETTE_LATENCY_SCALE. A request matches on operation, method, url and body
+hash; when the body differs (timestamps, multipart boundaries) the recordings for
+the same operation, url and response_format schema are served round-robin. Requests with no recording
+fall back to fake_providers (CASSETTE_MISS=fake) or get a 404 (CASSETTE_MISS=error).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from requests.adapters import HTTPAdapter
+
+import fake_providers
+from config import CASSETTE_DIR, CASSETTE_LATENCY_SCALE, CASSETTE_MISS
+from logger import get_logger
+
+log = get_logger(__name__)
+
+INTERACTIONS_FILE = "interactions.jsonl"
+# Response bodies up to this size are kept inline when they are text
+INLINE_BYTES = 4096
+TEXT_TYPES = ("application/json", "text/")
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data or b"").hexdigest()
+
+
+def _schema_name(body: bytes) -> str:
+    """askLLM-style requests share one url; the response_format schema tells them apart"""
+    if not body or not body.lstrip().startswith(b"{"):
+        return ""
+    try:
+        return fake_providers.schema_name(json.loads(body))
+    except (ValueError, UnicodeDecodeError):
+        return ""
+
+
+def _url_key(url: str) -> str:
+    """scheme://host/path; the query is dropped (it can carry API keys)"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+class Cassette:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.blobs = self.path / "blobs"
+        self._lock = threading.Lock()
+        self._exact = defaultdict(list)
+        self._by_url = defaultdict(list)
+        self._by_operation = defaultdict(list)
+        self._cursors = defaultdict(int)
+        self.loaded = 0
+
+    # ===== RECORD =====
+
+    def _store_blob(self, data: bytes) -> str:
+        digest = _sha256(data)
+        blob = self.blobs / digest
+        if not blob.exists():
+            self.blobs.mkdir(parents=True, exist_ok=True)
+            tmp = blob.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, blob)
+        return digest
+
+    def record(self, operation: str, method: str, url: str, request_body: bytes,
+               status: int, content_type: str, content: bytes, latency: float):
+        entry = {
+            "operation": operation,
+            "method": method.upper(),
+            "url": _url_key(url),
+            "request_sha256": _sha256(request_body),
+            "request_bytes": len(request_body or b""),
+            "schema": _schema_name(request_body),
+            "status": status,
+            "content_type": content_type,
+            "latency": round(latency, 4),
+            "response_bytes": len(content),
+            "recorded_at": time.time(),
+        }
+        inline = len(content) <= INLINE_BYTES and content_type.startswith(TEXT_TYPES)
+        if inline:
+            try:
+                entry["body"] = content.decode("utf-8")
+            except UnicodeDecodeError:
+                inline = False
+        if not inline:
+            entry["body_ref"] = self._store_blob(content)
+
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self.path / INTERACTIONS_FILE, "a", encoding="utf-8") as f:
+                f.write(line)
+        log.debug("Recorded provider call", operation=operation, url=entry["url"], status=status,
+                  latency=entry["latency"], response_bytes=len(content))
+
+    # ===== REPLAY =====
+
+    def load(self) -> "Cassette":
+        interactions = self.path / INTERACTIONS_FILE
+        if interactions.exists():
+            with open(interactions, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self.add(json.loads(line))
+        if (self.path / "fixtures").is_dir():
+            fake_providers.add_fixture_dir(self.path / "fixtures")
+        log.info("Loaded provider cassette", path=str(self.path), interactions=self.loaded)
+        return self
+
+    def add(self, entry: Dict[str, Any]):
+        operation, method, url, schema = entry["operation"], entry["method"], entry["url"], entry.get("schema", "")
+        self._exact[(operation, method, url, entry["request_sha256"])].append(entry)
+        self._by_url[(operation, method, url, schema)].append(entry)
+        self._by_operation[(operation, method, schema)].append(entry)
+        self.loaded += 1
+
+    def _next(self, key, entries):
+        with self._lock:
+            index = self._cursors[key]
+            self._cursors[key] = index + 1
+        return entries[index % len(entries)]
+
+    def lookup(self, operation: str, method: str, url: str, body: bytes) -> Optional[Dict[str, Any]]:
+        method, url, schema = method.upper(), _url_key(url), _schema_name(body)
+        for key, index in (((operation, method, url, _sha256(body)), self._exact),
+                           ((operation, method, url, schema), self._by_url),
+                           ((operation, method, schema), self._by_operation)):
+            entries = index.get(key)
+            if entries:
+                return self._next(key, entries)
+        return None
+
+    def body(self, entry: Dict[str, Any]) -> bytes:
+        if "body_ref" in entry:
+            return (self.blobs / entry["body_ref"]).read_bytes()
+        return entry.get("body", "").encode("utf-8")
+
+    def respond(self, method: str, url: str, body: bytes) -> Tuple[int, str, bytes, float]:
+        """fake_providers.respond() counterpart serving recorded responses"""
+        operation = fake_providers.current_operation()
+        entry = self.lookup(operation, method, url, body)
+        if entry is not None:
+            return entry["status"], entry["content_type"], self.body(entry), entry["latency"] * CASSETTE_LATENCY_SCALE
+
+        log.warning("No cassette recording for provider call", operation=operation, method=method, url=_url_key(url))
+        if CASSETTE_MISS == "fake":
+            return fake_providers.respond(method, url, body)
+        message = f"No cassette recording for {operation or 'unknown operation'} {method} {_url_key(url)}"
+        return 404, "application/json", json.dumps({"error": {"message": message}}).encode("utf-8"), 0.0
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Cassette:
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(CASSETTE_DIR)
+    return _cassette
+
+
+def replay_cassette() -> Cassette:
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(CASSETTE_DIR).load()
+    return _cassette
+
+
+# ===== RECORDING TRANSPORTS =====
+
+class _RecordTransportMixin:
+    def handle_request(self, request):
+        body = request.read()
+        start = time.perf_counter()
+        response = self.inner.handle_request(request)
+        try:
+            raw = b"".join(response.iter_raw())
+        finally:
+            response.close()
+        latency = time.perf_counter() - start
+        # Rebuild from the raw bytes so the client still sees the original encoding headers
+        replayable = self.httpx.Response(response.status_code, headers=response.headers, content=raw, request=request)
+        replayable.read()
+        get_cassette().record(fake_providers.current_operation(), request.method, str(request.url), body,
+                              replayable.status_code, replayable.headers.get("content-type", ""),
+                              replayable.content, latency)
+        return replayable
+
+    def close(self):
+        self.inner.close()
+
+
+class _RecordAsyncTransportMixin:
+    async def handle_async_request(self, request):
+        body = await request.aread()
+        start = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        try:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+        finally:
+            await response.aclose()
+        latency = time.perf_counter() - start
+        replayable = self.httpx.Response(response.status_code, headers=response.headers, content=raw, request=request)
+        await replayable.aread()
+        get_cassette().record(fake_providers.current_operation(), request.method, str(request.url), body,
+                              replayable.status_code, replayable.headers.get("content-type", ""),
+                              replayable.content, latency)
+        return replayable
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+@lru_cache(maxsize=None)
+def _record_transport_class(module, is_async: bool):
+    if is_async:
+        return type("RecordAsyncTransport", (_RecordAsyncTransportMixin, module.AsyncBaseTransport), {"httpx": module})
+    return type("RecordTransport", (_RecordTransportMixin, module.BaseTransport), {"httpx": module})
+
+
+def record_transport(client_cls=httpx.Client):
+    """Real HTTP transport from client_cls's httpx package that records every exchange"""
+    module = fake_providers.httpx_module(client_cls)
+    is_async = issubclass(client_cls, module.AsyncClient)
+    transport = _record_transport_class(module, is_async)()
+    transport.inner = module.AsyncHTTPTransport() if is_async else module.HTTPTransport()
+    return transport
+
+
+def replay_transport(client_cls=httpx.Client):
+    return fake_providers.fake_transport(client_cls, replay_cassette().respond)
+
+
+class RecordAdapter(HTTPAdapter):
+    """requests adapter that sends for real and records the exchange"""
+
+    def send(self, request, **kwargs):
+        body = fake_providers.request_body(request)
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        latency = time.perf_counter() - start
+        get_cassette().record(fake_providers.current_operation(), request.method, request.url, body,
+                              response.status_code, response.headers.get("Content-Type", ""),
+                              response.content, latency)
+        return response
+
+
+def replay_adapter() -> fake_providers.FakeAdapter:
+    return fake_providers.FakeAdapter(replay_cassette().respond)
@@ -1,7 +1,158 @@
+import os
 from pathlib import Path
 
 SERVER_HOST = "0.0.0.0"
 SERVER_PORT = 9999
 
-FRONTEND_ASSETS_DIR = Path(__file__).parent.parent / 'demo' / 'public' / 'assets'
+# Main app server: `python main.py` runs the Flask dev server (reloader/debugger when APP_DEBUG=1);
+# production runs gunicorn with gunicorn.conf.py (workers x threads, app preloaded before fork). One worker
+# by default: /metrics and /traces only see the process that serves the scrape
+APP_PORT = int(os.getenv('PORT', '8000'))
+APP_DEBUG = os.getenv('APP_DEBUG', '1') == '1'
+WEB_WORKERS = int(os.getenv('WEB_WORKERS', '1'))
+WEB_THREADS = int(os.getenv('WEB_THREADS', '16'))
+WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', '300'))
+WEB_GRACEFUL_TIMEOUT = int(os.getenv('WEB_GRACEFUL_TIMEOUT', '60'))
+
+FRONTEND_ASSETS_DIR = Path(os.getenv('FRONTEND_ASSETS_DIR', Path(__file__).parent.parent / 'demo' / 'public' / 'assets'))
 FRONTEND_CONFIG_DIR = Path(__file__).parent.parent / 'demo' / 'src' / 'config'
+GAME_DATA_DIR = Path(__file__).parent / '_data'
+GENERATED_ASSETS_DIR = Path(__file__).parent / 'assets' / 'generated'
+
+# Task -> model/max_tokens/temperature routing for GamiAgent sub-calls
+MODEL_TIERS_FILE = Path(os.getenv('MODEL_TIERS_FILE', Path(__file__).parent / 'model_tiers.json'))
+
+# Composite object assets: COMPOSITE_SPLIT=1 generates them in two phases (a part plan from the
+# composite_plan tier, then the parts in parallel batches of COMPOSITE_PART_BATCH, assembled locally)
+# instead of one completion; see benchmarks/bench_composite.py
+COMPOSITE_SPLIT = os.getenv('COMPOSITE_SPLIT', '0') == '1'
+COMPOSITE_PART_BATCH = int(os.getenv('COMPOSITE_PART_BATCH', '6'))
+
+# Span tracing: finished traces kept in memory for /traces; also appended as JSON lines when set
+TRACE_LOG_FILE = os.getenv('TRACE_LOG_FILE', '')
+TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', '200'))
+
+# Logging: default level, per-module overrides ("routes.blocks=DEBUG,run_gpt=WARNING"),
+# output format (json/text), payload truncation and DEBUG sampling rate
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_MAX_FIELD_CHARS = int(os.getenv('LOG_MAX_FIELD_CHARS', '500'))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '1.0'))
+
+# Provider mode: 'live' calls the real APIs; 'fake' serves fixtures offline with simulated latency;
+# 'record' and 'replay' capture and serve provider cassettes (see CASSETTE_DIR)
+PROVIDER_MODE = os.getenv('PROVIDER_MODE', 'live')
+FAKE_FIXTURES_DIR = Path(os.getenv('FAKE_FIXTURES_DIR', Path(__file__).parent / 'fake_fixtures'))
+# "<service or service.operation>=<fixed:s | uniform:a:b | lognormal:median:sigma>,..."
+FAKE_LATENCY = os.getenv('FAKE_LATENCY', 'llm=lognormal:1.5:0.5,vision=lognormal:1.5:0.4,image=lognormal:8:0.3,audio=lognormal:5:0.3')
+FAKE_LATENCY_SCALE = float(os.getenv('FAKE_LATENCY_SCALE', '1.0'))
+FAKE_SEED = int(os.getenv('FAKE_SEED', '0'))
+FAKE_IMAGE_SIZE = int(os.getenv('FAKE_IMAGE_SIZE', '1024'))
+
+# Provider cassettes: PROVIDER_MODE=record writes every provider call to CASSETTE_DIR,
+# PROVIDER_MODE=replay serves them back (latency x CASSETTE_LATENCY_SCALE).
+# Unmatched requests in replay fall back to the fake providers ('fake') or fail ('error')
+CASSETTE_DIR = Path(os.getenv('CASSETTE_DIR', Path(__file__).parent / 'cassettes' / 'default'))
+CASSETTE_LATENCY_SCALE = float(os.getenv('CASSETTE_LATENCY_SCALE', '1.0'))
+CASSETTE_MISS = os.getenv('CASSETTE_MISS', 'fake')
+
+# Ground texture library: generated textures are kept with a normalized description key and reused
+# for similar worlds. Mode 'reuse' serves a match; 'refresh' also generates new variants in the
+# background until an entry has TEXTURE_VARIANTS of them; 'off' always generates.
+# Least recently used entries are evicted beyond the entry count / disk quota.
+TEXTURE_LIBRARY_DIR = Path(os.getenv('TEXTURE_LIBRARY_DIR', Path(__file__).parent / '_data' / 'texture_library'))
+TEXTURE_LIBRARY_MODE = os.getenv('TEXTURE_LIBRARY_MODE', 'refresh')
+TEXTURE_MATCH_THRESHOLD = float(os.getenv('TEXTURE_MATCH_THRESHOLD', '0.6'))
+TEXTURE_VARIANTS = int(os.getenv('TEXTURE_VARIANTS', '3'))
+TEXTURE_LIBRARY_MAX_ENTRIES = int(os.getenv('TEXTURE_LIBRARY_MAX_ENTRIES', '500'))
+TEXTURE_LIBRARY_MAX_MB = float(os.getenv('TEXTURE_LIBRARY_MAX_MB', '1024'))
+
+# Ground texture post-processing: edge blend width for seamless tiling (fraction of the
+# texture, 0 = off) and the smallest mip level written next to the full-size texture
+TEXTURE_SEAMLESS_BLEND = float(os.getenv('TEXTURE_SEAMLESS_BLEND', '0.25'))
+TEXTURE_MIN_LEVEL = int(os.getenv('TEXTURE_MIN_LEVEL', '128'))
+
+# Skybox pipeline: 'outpaint' generates a square base image and outpaints it (two SD calls),
+# 'single' renders the panorama in one txt2img call at SKYBOX_PANORAMA_SIZE. Every stage result is
+# cached in SKYBOX_CACHE_DIR by a hash of its prompt, seed and parameters, so a retry resumes after
+# the last completed stage. Seeds are derived from the prompt unless SKYBOX_DETERMINISTIC_SEEDS=0.
+SKYBOX_MODE = os.getenv('SKYBOX_MODE', 'outpaint')
+SKYBOX_PANORAMA_SIZE = os.getenv('SKYBOX_PANORAMA_SIZE', '1024x512')
+SKYBOX_CACHE_DIR = Path(os.getenv('SKYBOX_CACHE_DIR', Path(__file__).parent / '_data' / 'skybox_cache'))
+SKYBOX_CACHE_MAX_MB = float(os.getenv('SKYBOX_CACHE_MAX_MB', '512'))
+SKYBOX_DETERMINISTIC_SEEDS = os.getenv('SKYBOX_DETERMINISTIC_SEEDS', '1') == '1'
+SKYBOX_STAGE_ATTEMPTS = int(os.getenv('SKYBOX_STAGE_ATTEMPTS', '2'))
+
+# Background removal for transparent assets: 'remote' (rembg server), 'local' (CPU key of the plain
+# background) or 'auto' (local, escalating to rembg when its quality score is below MATTING_MIN_QUALITY).
+# MATTING_TOLERANCE is the RGB distance still counted as background, MATTING_FEATHER the soft edge in px
+MATTING_BACKEND = os.getenv('MATTING_BACKEND', 'auto')
+MATTING_TOLERANCE = float(os.getenv('MATTING_TOLERANCE', '24'))
+MATTING_FEATHER = int(os.getenv('MATTING_FEATHER', '2'))
+MATTING_MIN_QUALITY = float(os.getenv('MATTING_MIN_QUALITY', '0.9'))
+# rembg server API: 'a1111' (JSON /rembg with base64 images) or 'native' (rembg's own /api/remove,
+# multipart upload with a binary PNG response)
+REMBG_API = os.getenv('REMBG_API', 'a1111')
+
+# Provider call scheduler: "<pool>=<concurrent calls>,..." for the llm, vision, sd, rembg, audio and
+# gpt-image pools, for the whole server (each gunicorn worker gets capacity // WEB_WORKERS, at least 1);
+# route -> priority class (interactive | normal | batch, default normal); seconds of waiting that
+# promote a call by one class; and how long a call may queue
+SCHEDULER_POOLS = os.getenv('SCHEDULER_POOLS', 'llm=16,vision=8,sd=2,rembg=4,audio=3,gpt-image=4')
+SCHEDULER_ROUTE_PRIORITIES = os.getenv('SCHEDULER_ROUTE_PRIORITIES', '/chat=interactive,/cohesiveChat=interactive,/interpretMedia=interactive')
+SCHEDULER_AGING_SECONDS = float(os.getenv('SCHEDULER_AGING_SECONDS', '30'))
+SCHEDULER_QUEUE_TIMEOUT = float(os.getenv('SCHEDULER_QUEUE_TIMEOUT', '600'))
+
+# Image analysis index: decompositions stored by image content hash and prompt version, shared by all
+# games. The version is a hash of the decomposition prompts and schema unless ANALYSIS_PROMPT_VERSION
+# is set; other versions are removed once unused for ANALYSIS_INDEX_RETENTION_DAYS
+ANALYSIS_INDEX_DIR = Path(os.getenv('ANALYSIS_INDEX_DIR', Path(__file__).parent / '_data' / 'analysis_index'))
+ANALYSIS_PROMPT_VERSION = os.getenv('ANALYSIS_PROMPT_VERSION', '')
+ANALYSIS_INDEX_RETENTION_DAYS = float(os.getenv('ANALYSIS_INDEX_RETENTION_DAYS', '7'))
+
+# Progressive factory analysis: finished image results go to a write-ahead journal next to
+# factory_state.json, which is rewritten (atomically) every N results or N seconds
+FACTORY_CHECKPOINT_EVERY = int(os.getenv('FACTORY_CHECKPOINT_EVERY', '8'))
+FACTORY_CHECKPOINT_SECONDS = float(os.getenv('FACTORY_CHECKPOINT_SECONDS', '5'))
+
+# Game data JSON files (factory state, game descriptions, DSL and frontend configs) are written
+# atomically; STORAGE_COMPACT_JSON=1 drops the indentation (smaller files, faster writes)
+STORAGE_COMPACT_JSON = os.getenv('STORAGE_COMPACT_JSON', '0') == '1'
+
+# Saved game config catalog (/list-config-files, /load-config-file): the index of FRONTEND_CONFIG_DIR
+# is rescanned when the directory changes or after CONFIG_CATALOG_REFRESH_SECONDS; parsed configs are
+# kept in an LRU cache of CONFIG_CACHE_SIZE files
+CONFIG_CATALOG_REFRESH_SECONDS = float(os.getenv('CONFIG_CATALOG_REFRESH_SECONDS', '5'))
+CONFIG_CACHE_SIZE = int(os.getenv('CONFIG_CACHE_SIZE', '32'))
+
+# Static routes (/assets/<file>, /config-files/<file>) send content-hash ETags; files with a content
+# hash in their name are cached by browsers as immutable for this many seconds. The demo's Vite
+# server (dev and preview) proxies /assets requests for hash-named files to this route
+ASSET_IMMUTABLE_MAX_AGE = int(os.getenv('ASSET_IMMUTABLE_MAX_AGE', '31536000'))
+
+# Generated assets are named <kind>_<content hash> (identical outputs are stored once). Durability of
+# their writes: 'none' (atomic rename only), 'file' (fsync the file) or 'dir' (also fsync the folder).
+# ASSET_MAP_FILE records which request produced which asset (JSON Lines); beyond ASSET_MAP_MAX_MB it
+# is rotated to <ASSET_MAP_FILE>.1 (replacing the previous one), 0 = never
+ASSET_DURABILITY = os.getenv('ASSET_DURABILITY', 'none')
+ASSET_MAP_FILE = Path(os.getenv('ASSET_MAP_FILE', Path(__file__).parent / '_data' / 'asset_map.jsonl'))
+ASSET_MAP_MAX_MB = float(os.getenv('ASSET_MAP_MAX_MB', '50'))
+
+# Asset garbage collection (asset_gc.py): generated files in FRONTEND_ASSETS_DIR that no saved config
+# or game data references are deleted once older than ASSET_GC_GRACE_HOURS; assets/generated/<game_id>
+# folders are capped at ASSET_GC_GAME_QUOTA_MB (unreferenced files, oldest first) and removed after the
+# grace period once their game's data is gone. A pass runs every ASSET_GC_INTERVAL_SECONDS (0 = off)
+# in batches of ASSET_GC_BATCH files; ASSET_GC_DRY_RUN=1 only reports what would be deleted
+ASSET_GC_INTERVAL_SECONDS = float(os.getenv('ASSET_GC_INTERVAL_SECONDS', '3600'))
+ASSET_GC_GRACE_HOURS = float(os.getenv('ASSET_GC_GRACE_HOURS', '24'))
+ASSET_GC_GAME_QUOTA_MB = float(os.getenv('ASSET_GC_GAME_QUOTA_MB', '200'))
+ASSET_GC_BATCH = int(os.getenv('ASSET_GC_BATCH', '200'))
+ASSET_GC_DRY_RUN = os.getenv('ASSET_GC_DRY_RUN', '0') == '1'
+
+# Asset pre-generation pool (prewarm.py fills it from PREWARM_SEEDS_FILE): /blockGenerate serves a
+# pre-generated object asset or ambient loop when the normalized description matches an entry with
+# at least ASSET_POOL_MATCH_THRESHOLD token similarity (1.0 = same normalized description)
+ASSET_POOL_DIR = Path(os.getenv('ASSET_POOL_DIR', Path(__file__).parent / '_data' / 'asset_pool'))
+ASSET_POOL_MATCH_THRESHOLD = float(os.getenv('ASSET_POOL_MATCH_THRESHOLD', '1.0'))
+PREWARM_SEEDS_FILE = Path(os.getenv('PREWARM_SEEDS_FILE', Path(__file__).parent / 'prewarm_seeds.json'))
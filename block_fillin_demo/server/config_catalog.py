@@ -0,0 +1,176 @@
+"""
+config_catalog: In-memory index of the saved game configs in FRONTEND_CONFIG_DIR.
+
+Each *.json config is listed with its size, mtime, game name and mechanism.
+The index is brought up to date lazily, at most every
+CONFIG_CATALOG_REFRESH_SECONDS, or right away when the directory mtime changed
+(saves go through storage.write_json, whose rename updates it). A refresh
+stats every file but only re-parses the ones whose size or mtime changed.
+Parsed configs are kept in an LRU cache of CONFIG_CACHE_SIZE entries, checked
+against the file's stat on every load.
+
+A file's ETag is the hash of its content (computed when it is parsed); a
+listing's ETag hashes the query and the ETags of the entries on the page.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+from config import FRONTEND_CONFIG_DIR, CONFIG_CATALOG_REFRESH_SECONDS, CONFIG_CACHE_SIZE
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+@dataclass
+class CatalogEntry:
+    filename: str
+    size: int
+    mtime_ns: int
+    sha256: str = ""
+    game_name: str = ""
+    mechanism: str = ""
+
+    @property
+    def etag(self) -> str:
+        """Content hash (strong ETag); size and mtime for a file that could not be read"""
+        return self.sha256[:32] if self.sha256 else f"{self.size:x}-{self.mtime_ns:x}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("mtime_ns")
+        data.pop("sha256")
+        data["mtime"] = self.mtime_ns / 1e9
+        data["modified"] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(data["mtime"]))
+        return data
+
+
+def _summary(config: Any) -> Tuple[str, str]:
+    """Game name and mechanism of a parsed config"""
+    if not isinstance(config, dict):
+        return "", ""
+    return str(config.get("name") or config.get("id") or ""), str(config.get("mechanism") or "")
+
+
+class ConfigCatalog:
+    def __init__(self, root: Path = FRONTEND_CONFIG_DIR, refresh_seconds: float = CONFIG_CATALOG_REFRESH_SECONDS,
+                 cache_size: int = CONFIG_CACHE_SIZE):
+        self.root = Path(root)
+        self.refresh_seconds = refresh_seconds
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._entries: Dict[str, CatalogEntry] = {}
+        self._scanned_at = 0.0
+        self._dir_mtime_ns = None
+        self._cache: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+
+    # ===== INDEX =====
+
+    def _read(self, path: Path) -> Tuple[str, Any]:
+        """Content hash and parsed config of a file"""
+        with open(path, "rb") as f:
+            data = f.read()
+        return hashlib.sha256(data).hexdigest(), json.loads(data)
+
+    def _entry(self, path: Path, stat) -> CatalogEntry:
+        """Entry for a file, re-parsing it only when its size or mtime changed (caller holds the lock)"""
+        known = self._entries.get(path.name)
+        if known and known.size == stat.st_size and known.mtime_ns == stat.st_mtime_ns:
+            return known
+        entry = CatalogEntry(path.name, stat.st_size, stat.st_mtime_ns)
+        try:
+            entry.sha256, config = self._read(path)
+            entry.game_name, entry.mechanism = _summary(config)
+            self._remember(entry, config)
+        except (OSError, ValueError) as e:
+            log.warning("Unreadable config file", filename=path.name, error=str(e))
+        return entry
+
+    def _refresh(self, force: bool = False):
+        """Rescan the directory if it changed or the last scan is older than refresh_seconds (caller holds the lock)"""
+        try:
+            dir_mtime_ns = self.root.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._entries, self._dir_mtime_ns = {}, None
+            return
+        now = time.monotonic()
+        if not force and dir_mtime_ns == self._dir_mtime_ns and now - self._scanned_at < self.refresh_seconds:
+            return
+        entries = {}
+        for path in self.root.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries[path.name] = self._entry(path, stat)
+        for name in set(self._cache) - set(entries):
+            del self._cache[name]
+        self._entries, self._dir_mtime_ns, self._scanned_at = entries, dir_mtime_ns, now
+
+    def _remember(self, entry: CatalogEntry, config: Any):
+        self._cache[entry.filename] = (entry.etag, config)
+        self._cache.move_to_end(entry.filename)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def invalidate(self, filename: Optional[str] = None):
+        """Forget one file (after it was written) or, without a name, force a full rescan"""
+        with self._lock:
+            if filename:
+                self._entries.pop(filename, None)
+                self._cache.pop(filename, None)
+            self._scanned_at = 0.0
+
+    # ===== QUERIES =====
+
+    def list(self, offset: int = 0, limit: Optional[int] = None, mechanism: Optional[str] = None,
+             query: Optional[str] = None) -> Tuple[List[CatalogEntry], int, str]:
+        """Page of entries (newest first) matching the filters, the number of matches and an ETag for the page"""
+        with self._lock:
+            self._refresh()
+            entries = list(self._entries.values())
+        if mechanism:
+            entries = [e for e in entries if e.mechanism == mechanism]
+        if query:
+            query = query.lower()
+            entries = [e for e in entries if query in e.filename.lower() or query in e.game_name.lower()]
+        entries.sort(key=lambda e: e.mtime_ns, reverse=True)
+        page = entries[offset:offset + limit] if limit is not None else entries[offset:]
+        digest = hashlib.sha256(f"{offset}|{limit}|{mechanism}|{query}|{len(entries)}".encode("utf-8"))
+        for entry in page:
+            digest.update(f"|{entry.filename}:{entry.etag}".encode("utf-8"))
+        return page, len(entries), digest.hexdigest()[:32]
+
+    def stat(self, filename: str) -> Optional[CatalogEntry]:
+        """Current entry of one file, from a fresh stat (no parse unless it changed)"""
+        path = self.root / filename
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            entry = self._entries[filename] = self._entry(path, stat)
+            return entry
+
+    def load(self, filename: str) -> Tuple[Optional[CatalogEntry], Any]:
+        """Entry and parsed config of one file (None, None when it does not exist)"""
+        entry = self.stat(filename)
+        if entry is None:
+            return None, None
+        with self._lock:
+            cached = self._cache.get(filename)
+            if cached and cached[0] == entry.etag:
+                self._cache.move_to_end(filename)
+                metrics.CONFIG_LOADS.inc(result="cached")
+                return entry, cached[1]
+        entry.sha256, config = self._read(self.root / filename)
+        with self._lock:
+            self._remember(entry, config)
+        metrics.CONFIG_LOADS.inc(result="parsed")
+        return entry, config
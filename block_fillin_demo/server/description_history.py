@@ -0,0 +1,189 @@
+"""
+description_history: Per-game history of generated game descriptions.
+
+Entries ({"id": "<operation>:<prompt>", "content": {...}}) are stored one per
+line in _data/<game_id>/game_description.jsonl, and game_description.idx holds
+the byte offset of every line (8-byte little-endian). Appending writes one
+line and one offset; dropping the last entry (regenerate) truncates both; any
+entry, including the last k for the prompt, is read with one seek per entry,
+without parsing the rest of the file.
+
+Writers hold storage.lock on the .jsonl file. After a crash between the two
+writes the index no longer ends at the end of the data file; the next access
+notices that with one read and rebuilds the index from the lines. A
+game_description.json list from before this store is migrated on first use
+and kept as game_description.json.migrated.
+"""
+import json
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import storage
+from logger import get_logger
+
+log = get_logger(__name__)
+
+OFFSET = struct.Struct("<Q")
+
+
+class DescriptionHistory:
+    def __init__(self, game_dir: Union[str, Path], name: str = "game_description"):
+        self.dir = Path(game_dir)
+        self.path = self.dir / f"{name}.jsonl"
+        self.index_path = self.dir / f"{name}.idx"
+        self.legacy_path = self.dir / f"{name}.json"
+
+    # ===== FILES (caller holds the lock) =====
+
+    def _size(self, path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _count(self) -> int:
+        return self._size(self.index_path) // OFFSET.size
+
+    def _offset(self, position: int) -> int:
+        with open(self.index_path, "rb") as f:
+            f.seek(position * OFFSET.size)
+            return OFFSET.unpack(f.read(OFFSET.size))[0]
+
+    def _read_line(self, offset: int) -> bytes:
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return f.readline()
+
+    def _consistent(self) -> bool:
+        """The index ends exactly at the end of the data file"""
+        count, size = self._count(), self._size(self.path)
+        if self._size(self.index_path) % OFFSET.size:
+            return False
+        if count == 0:
+            return size == 0
+        last = self._offset(count - 1)
+        line = self._read_line(last) if last < size else b""
+        return line.endswith(b"\n") and last + len(line) == size
+
+    def _write_index(self, offsets: List[int]):
+        tmp = self.index_path.with_name(f".{self.index_path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(b"".join(OFFSET.pack(offset) for offset in offsets))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.index_path)
+
+    def _rebuild(self):
+        """Re-index the complete lines of the data file and cut off a torn last line"""
+        offsets, end = [], 0
+        if self.path.exists():
+            with open(self.path, "rb") as f:
+                for line in iter(f.readline, b""):
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        json.loads(line)
+                    except ValueError:
+                        break
+                    offsets.append(end)
+                    end += len(line)
+            os.truncate(self.path, end)
+        self._write_index(offsets)
+        log.warning("Rebuilt game description history index", path=str(self.path), entries=len(offsets))
+
+    def _migrate(self):
+        entries = storage.read_json(self.legacy_path, [])
+        self.dir.mkdir(parents=True, exist_ok=True)
+        offsets, end = [], 0
+        with open(self.path, "wb") as f:
+            for entry in entries if isinstance(entries, list) else [entries]:
+                line = self._encode(entry)
+                f.write(line)
+                offsets.append(end)
+                end += len(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._write_index(offsets)
+        os.replace(self.legacy_path, self.legacy_path.with_name(f"{self.legacy_path.name}.migrated"))
+        log.info("Migrated game description history", path=str(self.legacy_path), entries=len(offsets))
+
+    def _ready(self):
+        if not self.path.exists() and self.legacy_path.exists():
+            self._migrate()
+        elif not self._consistent():
+            self._rebuild()
+
+    @staticmethod
+    def _encode(entry: Dict[str, Any]) -> bytes:
+        return (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+    def _append(self, entry: Dict[str, Any]) -> int:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        offset = self._size(self.path)
+        with open(self.path, "ab") as f:
+            f.write(self._encode(entry))
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.index_path, "ab") as f:
+            f.write(OFFSET.pack(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        return self._count() - 1
+
+    def _drop_last(self):
+        count = self._count()
+        if count:
+            # Data first: a crash in between leaves an index pointing at the end, which _ready repairs
+            os.truncate(self.path, self._offset(count - 1))
+            os.truncate(self.index_path, (count - 1) * OFFSET.size)
+
+    # ===== API =====
+
+    def __len__(self) -> int:
+        with storage.lock(self.path):
+            self._ready()
+            return self._count()
+
+    def get(self, index: int = -1) -> Dict[str, Any]:
+        """Entry at index (negative counts from the end); IndexError when out of range"""
+        with storage.lock(self.path):
+            self._ready()
+            count = self._count()
+            position = index + count if index < 0 else index
+            if not 0 <= position < count:
+                raise IndexError(f"Game description {index} out of range ({count} entries)")
+            return json.loads(self._read_line(self._offset(position)))
+
+    def tail(self, k: int, skip_last: int = 0) -> List[Dict[str, Any]]:
+        """Last k entries, oldest first, leaving out the skip_last newest"""
+        with storage.lock(self.path):
+            self._ready()
+            end = max(0, self._count() - skip_last)
+            return [json.loads(self._read_line(self._offset(position)))
+                    for position in range(max(0, end - k), end)]
+
+    def append(self, entry: Dict[str, Any]) -> int:
+        """Add an entry; returns its index"""
+        with storage.lock(self.path):
+            self._ready()
+            return self._append(entry)
+
+    def replace_last(self, entry: Dict[str, Any]) -> int:
+        """Swap the newest entry for entry (regenerate); appends when the history is empty"""
+        with storage.lock(self.path):
+            self._ready()
+            self._drop_last()
+            return self._append(entry)
+
+    def reset(self, entry: Optional[Dict[str, Any]] = None):
+        """Drop the whole history, optionally starting it again with entry (initialize)"""
+        with storage.lock(self.path):
+            self.legacy_path.unlink(missing_ok=True)
+            self.dir.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "wb"):
+                pass
+            self._write_index([])
+            if entry is not None:
+                self._append(entry)
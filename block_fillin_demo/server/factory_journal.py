@@ -0,0 +1,75 @@
+"""
+factory_journal: Write-ahead journal for progressive factory_state.json updates.
+
+A long image analysis run appends each finished image result to
+<factory_state>.journal.jsonl (one fsynced JSON line, storage.append_jsonl) and
+only rewrites factory_state.json at checkpoints (storage.write_json, atomic).
+A checkpoint truncates the journal. After a crash, recover() applies the
+journal to the last checkpoint, so no finished analysis is lost.
+
+Journal line: {"position": <index in factory_store>, "id": ..., "fileUrl": ..., "content": ...,
+"analysisVersion": <prompt version of content>}
+"""
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+import storage
+from config import FACTORY_CHECKPOINT_EVERY, FACTORY_CHECKPOINT_SECONDS
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+def apply_record(factory_store: List[Dict[str, Any]], record: Dict[str, Any]) -> bool:
+    """Put a journaled result into the store: at its position if the id still matches, else by id"""
+    position = record.get("position")
+    result = {"content": record.get("content")}
+    if record.get("analysisVersion"):
+        result["analysisVersion"] = record["analysisVersion"]
+    if isinstance(position, int) and 0 <= position < len(factory_store) \
+            and factory_store[position].get("id") == record.get("id"):
+        factory_store[position] = {**factory_store[position], **result}
+        return True
+    for i, item in enumerate(factory_store):
+        if item.get("id") == record.get("id") and item.get("dataType") == "image":
+            factory_store[i] = {**item, **result}
+            return True
+    return False
+
+
+class FactoryJournal:
+    def __init__(self, state_path: Union[str, Path], checkpoint_every: int = FACTORY_CHECKPOINT_EVERY,
+                 checkpoint_seconds: float = FACTORY_CHECKPOINT_SECONDS):
+        self.state_path = Path(state_path)
+        self.path = self.state_path.with_name(f"{self.state_path.name}.journal.jsonl")
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.checkpoint_seconds = checkpoint_seconds
+        self._pending = 0
+        self._last_checkpoint = time.monotonic()
+
+    def recover(self, factory_data: Dict[str, Any]) -> int:
+        """Apply a journal left by an interrupted run to factory_data; returns the records applied"""
+        if not self.path.exists():
+            return 0
+        factory_store = factory_data.setdefault("factory_store", [])
+        applied = sum(apply_record(factory_store, record) for record in storage.read_jsonl(self.path))
+        if applied:
+            log.info("Recovered factory analyses from journal", path=str(self.path), records=applied)
+        return applied
+
+    def append(self, record: Dict[str, Any]):
+        storage.append_jsonl(self.path, record)
+        self._pending += 1
+
+    def due(self) -> bool:
+        return self._pending >= self.checkpoint_every or \
+            (self._pending and time.monotonic() - self._last_checkpoint >= self.checkpoint_seconds)
+
+    def checkpoint(self, factory_data: Dict[str, Any], output_path: Union[str, Path, None] = None):
+        """Write factory_data atomically, then drop the journal it now contains"""
+        with storage.lock(self.path):
+            storage.write_json(Path(output_path or self.state_path), factory_data)
+            self.path.unlink(missing_ok=True)
+        self._pending = 0
+        self._last_checkpoint = time.monotonic()
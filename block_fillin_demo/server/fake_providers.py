@@ -0,0 +1,390 @@
+"""
+fake_providers: Offline stand-ins for every external provider the server calls.
+
+Requests are answered at the HTTP layer (httpx transports for the OpenAI,
+Anthropic and Gemini SDKs, a requests adapter for askLLM, Stable Diffusion,
+rembg and Stable Audio), so SDK request building and response parsing still run.
+
+The response content is chosen by the current tracing span, e.g. "llm.world_config":
+  1. FAKE_FIXTURES_DIR/<span name>.<json_schema name>.json or <span name>.json if it
+     exists (a list picks one entry)
+  2. an instance generated from the task's pydantic schema (or the askLLM response_format)
+  3. a short placeholder text
+Image responses use a file from FAKE_FIXTURES_DIR/<span name>/ or <service>/ when
+present, a generated PNG otherwise.
+Latency is sampled from FAKE_LATENCY with an RNG seeded by FAKE_SEED and the
+request body, so identical requests get identical responses and delays.
+"""
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import math
+import random
+import re
+import struct
+import sys
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import numpy as np
+import requests
+from PIL import Image
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+import tracing
+from config import FAKE_FIXTURES_DIR, FAKE_LATENCY, FAKE_LATENCY_SCALE, FAKE_SEED, FAKE_IMAGE_SIZE
+from schema.composite_object_config import (
+    CompositeObject, IntentClassification, WorldConfigChangeResponse, PlayerConfigChangeResponse,
+    ObjectConfigChangeResponse, SpawnConfigChangeResponse, BlockChangeSuggestionResponse,
+    CompositePlan, CompositeParts
+)
+
+# GamiAgent sub-call task -> structured response model
+TASK_SCHEMAS = {
+    "intent": IntentClassification,
+    "composite": CompositeObject,
+    "composite_plan": CompositePlan,
+    "composite_parts": CompositeParts,
+    "world_config": WorldConfigChangeResponse,
+    "player_config": PlayerConfigChangeResponse,
+    "object_config": ObjectConfigChangeResponse,
+    "spawn_config": SpawnConfigChangeResponse,
+    "block_suggestion": BlockChangeSuggestionResponse,
+}
+
+SERVICES = ("llm", "vision", "image", "audio")
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".webp")
+
+# Searched in order; a replayed cassette puts its own fixtures first
+FIXTURE_DIRS = [FAKE_FIXTURES_DIR]
+
+
+def add_fixture_dir(path):
+    FIXTURE_DIRS.insert(0, path)
+    _load_fixture.cache_clear()
+    _fixture_images.cache_clear()
+
+
+def current_operation() -> str:
+    """Name of the provider-call span the request is made from ("" outside one)"""
+    span = tracing.current_span()
+    return span.name if span and span.name.split(".", 1)[0] in SERVICES else ""
+
+
+# ===== LATENCY =====
+
+def _parse_latency(spec: str) -> Dict[str, Tuple[str, Tuple[float, ...]]]:
+    model = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        key, dist = item.split("=", 1)
+        kind, *params = dist.strip().split(":")
+        model[key.strip()] = (kind, tuple(float(p) for p in params))
+    return model
+
+
+_LATENCY = _parse_latency(FAKE_LATENCY)
+
+
+def sample_latency(operation: str, rng: random.Random) -> float:
+    """Seconds to wait for operation, looked up as "service.operation" then "service" """
+    if FAKE_LATENCY_SCALE <= 0:
+        return 0.0
+    service = operation.split(".", 1)[0]
+    kind, params = _LATENCY.get(operation) or _LATENCY.get(service) or ("fixed", (0.0,))
+    if kind == "fixed":
+        seconds = params[0]
+    elif kind == "uniform":
+        seconds = rng.uniform(params[0], params[1])
+    elif kind == "lognormal":
+        seconds = rng.lognormvariate(math.log(params[0]), params[1])
+    else:
+        raise ValueError(f"Unknown latency distribution '{kind}' for {operation}")
+    return seconds * FAKE_LATENCY_SCALE
+
+
+# ===== CONTENT =====
+
+def schema_instance(schema: Dict[str, Any], defs: Optional[Dict[str, Any]] = None):
+    """Build a minimal value that validates against a JSON schema (required fields only)"""
+    defs = schema.get("$defs", {}) if defs is None else defs
+    if "$ref" in schema:
+        return schema_instance(defs[schema["$ref"].split("/")[-1]], defs)
+    if "const" in schema:
+        return schema["const"]
+    if "enum" in schema:
+        return schema["enum"][0]
+    if schema.get("default") is not None:
+        return schema["default"]
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            options = [option for option in schema[key] if option.get("type") != "null"]
+            return schema_instance(options[0], defs) if options else None
+
+    schema_type = schema.get("type")
+    if isinstance(schema_type, list):
+        schema_type = next((t for t in schema_type if t != "null"), "null")
+    if schema_type == "object" or "properties" in schema:
+        properties = schema.get("properties", {})
+        return {key: schema_instance(properties[key], defs) for key in schema.get("required", []) if key in properties}
+    if schema_type == "array":
+        return [schema_instance(schema.get("items", {}), defs) for _ in range(max(schema.get("minItems", 1), 1))]
+    if schema_type in ("number", "integer"):
+        low = schema.get("minimum", schema.get("exclusiveMinimum"))
+        high = schema.get("maximum", schema.get("exclusiveMaximum"))
+        value = (low + high) / 2 if low is not None and high is not None else (low if low is not None else 1)
+        return int(math.ceil(value)) if schema_type == "integer" else float(value)
+    if schema_type == "string":
+        return "fake"
+    if schema_type == "boolean":
+        return True
+    return None
+
+
+@lru_cache(maxsize=None)
+def _load_fixture(name: str):
+    for directory in FIXTURE_DIRS:
+        path = directory / f"{name}.json"
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+    return None
+
+
+@lru_cache(maxsize=None)
+def _fixture_images(operation: str):
+    for directory in FIXTURE_DIRS:
+        for name in (operation, operation.split(".", 1)[0]):
+            folder = directory / name
+            if name and folder.is_dir():
+                images = sorted(p for p in folder.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+                if images:
+                    return tuple(images)
+    return ()
+
+
+def schema_name(payload: Dict[str, Any]) -> str:
+    response_format = payload.get("response_format") if isinstance(payload, dict) else None
+    if isinstance(response_format, dict) and isinstance(response_format.get("json_schema"), dict):
+        return response_format["json_schema"].get("name", "")
+    return ""
+
+
+def content_for(operation: str, payload: Dict[str, Any], rng: random.Random):
+    """Response content (dict or text) for an LLM-style operation"""
+    schema = schema_name(payload)
+    names = ([f"{operation}.{schema}"] if schema else []) + [operation]
+    fixture = next((f for f in map(_load_fixture, names) if f is not None), None) if operation else None
+    if fixture is not None:
+        return rng.choice(fixture) if isinstance(fixture, list) else fixture
+
+    task = operation.split(".", 1)[1] if "." in operation else ""
+    if task in TASK_SCHEMAS:
+        return schema_instance(TASK_SCHEMAS[task].model_json_schema())
+    response_format = payload.get("response_format") if isinstance(payload, dict) else None
+    if isinstance(response_format, dict) and "json_schema" in response_format:
+        return schema_instance(response_format["json_schema"].get("schema", {}))
+    return f"Fake {task or 'response'} from the offline provider."
+
+
+@lru_cache(maxsize=8)
+def fake_png(width: int, height: int, transparent: bool = False) -> bytes:
+    """Deterministic textured PNG (noise keeps the encoded size close to real outputs)"""
+    rng = np.random.default_rng(FAKE_SEED)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // max(width, 1), y * 255 // max(height, 1), np.full_like(x, 128)], axis=-1)
+    pixels = np.clip(base + rng.integers(-24, 24, size=base.shape), 0, 255).astype(np.uint8)
+    if transparent:
+        inside = ((x - width / 2) / (width / 2.5)) ** 2 + ((y - height / 2) / (height / 2.5)) ** 2 <= 1
+        alpha = np.where(inside, 255, 0).astype(np.uint8)[..., None]
+        image = Image.fromarray(np.concatenate([pixels, alpha], axis=-1), "RGBA")
+    else:
+        image = Image.fromarray(pixels, "RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=8)
+def fake_wav(seconds: float, sample_rate: int = 44100) -> bytes:
+    """Mono 16-bit sine tone with a valid RIFF header"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    samples = (np.sin(2 * np.pi * 220 * t) * 8000).astype("<i2").tobytes()
+    header = b"RIFF" + struct.pack("<I", 36 + len(samples)) + b"WAVE"
+    header += b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+    header += b"data" + struct.pack("<I", len(samples))
+    return header + samples
+
+
+def _image_b64(size: Optional[str] = None, transparent: bool = False,
+               operation: str = "", rng: Optional[random.Random] = None) -> str:
+    images = _fixture_images(operation) if operation and not transparent else ()
+    if images:
+        return base64.b64encode((rng or random).choice(images).read_bytes()).decode("utf-8")
+    width = height = FAKE_IMAGE_SIZE
+    if size and re.fullmatch(r"\d+x\d+", size):
+        width, height = (int(v) for v in size.split("x"))
+    return base64.b64encode(fake_png(width, height, transparent)).decode("utf-8")
+
+
+# ===== WIRE FORMATS =====
+
+def _tokens(text) -> int:
+    return max(len(text) // 4, 1)
+
+
+def _json(body: Dict[str, Any]) -> Tuple[int, str, bytes]:
+    return 200, "application/json", json.dumps(body).encode("utf-8")
+
+
+def _as_text(content) -> str:
+    return content if isinstance(content, str) else json.dumps(content)
+
+
+def respond(method: str, url: str, body: bytes) -> Tuple[int, str, bytes, float]:
+    """Answer one provider request: (status, content type, body, latency seconds)"""
+    operation = current_operation()
+    rng = random.Random(hashlib.sha256(f"{FAKE_SEED}:{operation}:".encode() + (body or b"")).digest())
+    try:
+        payload = json.loads(body) if body else {}
+    except (ValueError, UnicodeDecodeError):
+        payload = {}
+    if not isinstance(payload, dict):
+        payload = {}
+    model = payload.get("model", "fake-model")
+    in_tokens = _tokens(body or b"")
+    delay = sample_latency(operation or "llm", rng)
+
+    if "/chat/completions" in url:
+        text = _as_text(content_for(operation, payload, rng))
+        return (*_json({
+            "id": "chatcmpl-fake", "object": "chat.completion", "created": 0, "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                         "message": {"role": "assistant", "content": text, "refusal": None}}],
+            "usage": {"prompt_tokens": in_tokens, "completion_tokens": _tokens(text),
+                      "total_tokens": in_tokens + _tokens(text), "prompt_tokens_details": {"cached_tokens": 0}},
+        }), delay)
+
+    if "/images/generations" in url or "/images/edits" in url:
+        out_tokens = 272
+        return (*_json({
+            "created": 0,
+            "data": [{"b64_json": _image_b64(payload.get("size"), operation=operation, rng=rng)}],
+            "usage": {"input_tokens": in_tokens, "output_tokens": out_tokens, "total_tokens": in_tokens + out_tokens,
+                      "input_tokens_details": {"text_tokens": in_tokens, "image_tokens": 0}},
+        }), delay)
+
+    if url.rstrip("/").endswith("/v1/messages"):
+        text = _as_text(content_for(operation, payload, rng))
+        return (*_json({
+            "id": "msg_fake", "type": "message", "role": "assistant", "model": model,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": in_tokens, "output_tokens": _tokens(text),
+                      "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0},
+        }), delay)
+
+    if ":generateContent" in url:
+        text = _as_text(content_for(operation, payload, rng))
+        return (*_json({
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": in_tokens, "candidatesTokenCount": _tokens(text),
+                              "totalTokenCount": in_tokens + _tokens(text)},
+            "modelVersion": url.split("/models/")[-1].split(":")[0],
+        }), delay)
+
+    if "sdapi/v1/txt2img" in url or "sdapi/v1/img2img" in url:
+        size = f"{payload.get('width', FAKE_IMAGE_SIZE)}x{payload.get('height', FAKE_IMAGE_SIZE)}"
+        return (*_json({"images": [_image_b64(size, operation=operation, rng=rng)], "parameters": {}, "info": "{}"}), delay)
+
+    if url.rstrip("/").endswith("/rembg"):
+        return (*_json({"image": _image_b64(transparent=True)}), delay)
+
+    if url.rstrip("/").endswith("/api/remove"):
+        return 200, "image/png", fake_png(FAKE_IMAGE_SIZE, FAKE_IMAGE_SIZE, True), delay
+
+    if url.rstrip("/").endswith("gpt_image_edit"):
+        return (*_json({"image": _image_b64(operation=operation, rng=rng)}), delay)
+
+    if "api.stability.ai" in url or operation.startswith("audio."):
+        seconds = float(payload.get("length", 10))
+        return 200, "audio/wav", fake_wav(seconds), delay
+
+    # askLLM-style endpoints return the completion content as JSON
+    return (*_json(content_for(operation, payload, rng)), delay)
+
+
+# ===== TRANSPORTS =====
+
+def httpx_module(client_cls):
+    """The httpx package (or vendored fork) a client class is built on"""
+    base = next(cls for cls in client_cls.__mro__ if cls.__name__ in ("Client", "AsyncClient"))
+    return sys.modules[base.__module__.split(".")[0]]
+
+
+class _FakeTransportMixin:
+    def handle_request(self, request):
+        status, content_type, content, delay = self.respond(request.method, str(request.url), request.read())
+        time.sleep(delay)
+        return self.httpx.Response(status, headers={"content-type": content_type}, content=content, request=request)
+
+
+class _FakeAsyncTransportMixin:
+    async def handle_async_request(self, request):
+        # asyncio.sleep keeps the event loop running while "waiting" for the provider
+        status, content_type, content, delay = self.respond(request.method, str(request.url), await request.aread())
+        await asyncio.sleep(delay)
+        return self.httpx.Response(status, headers={"content-type": content_type}, content=content, request=request)
+
+
+@lru_cache(maxsize=None)
+def _transport_class(module, is_async: bool, responder):
+    mixin, base = (_FakeAsyncTransportMixin, module.AsyncBaseTransport) if is_async else (_FakeTransportMixin, module.BaseTransport)
+    name = "FakeAsyncTransport" if is_async else "FakeTransport"
+    return type(name, (mixin, base), {"httpx": module, "respond": staticmethod(responder)})
+
+
+def fake_transport(client_cls=httpx.Client, responder=None):
+    """
+    Transport answering every request with responder (default respond()). Some
+    SDKs ship their own httpx fork and reject foreign transports, so the class is
+    derived from the same package as client_cls.
+    """
+    module = httpx_module(client_cls)
+    return _transport_class(module, issubclass(client_cls, module.AsyncClient), responder or respond)()
+
+
+def request_body(request) -> bytes:
+    """Body of a requests.PreparedRequest as bytes (streamed bodies are left unread)"""
+    if isinstance(request.body, str):
+        return request.body.encode("utf-8")
+    return request.body if isinstance(request.body, bytes) else b""
+
+
+class FakeAdapter(BaseAdapter):
+    """requests adapter for the plain HTTP services"""
+
+    def __init__(self, responder=None):
+        super().__init__()
+        self.respond = responder or respond
+
+    def send(self, request, **kwargs):
+        status, content_type, content, delay = self.respond(request.method, request.url, request_body(request))
+        time.sleep(delay)
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict({"Content-Type": content_type})
+        response._content = content
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
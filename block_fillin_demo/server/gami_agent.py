@@ -1,16 +1,29 @@
 from openai import OpenAI
-from anthropic import Anthropic, transform_schema
-from google import genai
+from anthropic import Anthropic, DefaultHttpxClient as AnthropicHttpxClient, transform_schema
 import os
 import json
+import time
+import threading
+import concurrent.futures
 from pathlib import Path
-from typing import Optional, Dict, Any, Literal
+from typing import Optional, Dict, Any, Literal, List
+from schema.composite_object_config import (
+    CompositePlan, CompositeParts, PartPlan, MaterialData, TransformData, BoxPart, BoxOptions, SoftboxPart,
+    SoftboxOptions, SpherePart, SphereOptions, CylinderPart, CylinderOptions
+)
 from schema.composite_object_config import CompositeObject, IntentClassification, WorldConfig, WorldConfigChangeResponse, PlayerConfig, PlayerConfigChangeResponse, GameObjectConfig, ObjectConfigChangeResponse, SpawnConfig, SpawnConfigChangeResponse, BlockChangeSuggestionResponse
 from dotenv import load_dotenv
+from config import MODEL_TIERS_FILE, COMPOSITE_SPLIT, COMPOSITE_PART_BATCH
+import metrics
+import providers
+import tracing
+from logger import get_logger
 
 # Load environment variables from .env file
 load_dotenv()
 
+log = get_logger(__name__)
+
 class GamiAgent:
     """
     AI Agent for SmallGami that can switch between different LLM models.
@@ -25,13 +38,31 @@ class GamiAgent:
     MODEL_PROVIDERS = {
         # OpenAI models
         "gpt-4o": "openai",
+        "gpt-4o-mini": "openai",
         # Anthropic Claude models
         "claude-sonnet-4-5": "anthropic",
+        "claude-haiku-4-5": "anthropic",
         # Google Gemini models
         "gemini-3-flash-preview": "google",
         "gemini-3-pro-preview": "google",
     }
     
+    # Output budget per sub-call task when the tier map does not set one.
+    # Anthropic requires max_tokens on every request; the other providers
+    # only receive it when a tier sets it explicitly.
+    DEFAULT_MAX_TOKENS = {
+        "intent": 1024,
+        "chat": 4096,
+        "composite": 8192,
+        "composite_plan": 2048,
+        "composite_parts": 4096,
+        "world_config": 8192,
+        "player_config": 8192,
+        "object_config": 8192,
+        "spawn_config": 8192,
+        "block_suggestion": 4096,
+    }
+    
     def __init__(self, model: str = "gpt-4o"):
         """
         Initialize the GamiAgent with a specific model.
@@ -46,10 +77,16 @@ class GamiAgent:
         # Initialize the client
         self._init_client()
         
+        # Per-task model routing and the latency/token stats used to tune it
+        self.model_tiers = self._load_model_tiers()
+        self.task_stats = {}
+        self._stats_lock = threading.Lock()
+        
         # Set up prompts directory
         self.prompts_dir = Path(__file__).parent / "prompts"
         
         # Load prompts
+        self._schema_texts = {}
         self.prompts = self._load_prompts()
     
     def _load_prompts(self) -> Dict[str, str]:
@@ -60,6 +97,8 @@ class GamiAgent:
             'intent_user': 'intent_detection_user_prompt.txt',
             'composite_system': 'composite_object_system_prompt.txt',
             'composite_user': 'composite_object_user_prompt.txt',
+            'composite_plan_user': 'composite_plan_user_prompt.txt',
+            'composite_parts_user': 'composite_parts_user_prompt.txt',
             'chat_system': 'system_prompt.txt',
             'world_config_system': 'world_config_system_prompt.txt',
             'world_config_user': 'world_config_user_prompt.txt',
@@ -80,8 +119,146 @@ class GamiAgent:
                 print(f"Warning: Prompt file not found: {filepath}")
                 prompts[key] = ""
         
+        prompts['composite_user_static'], prompts['composite_user_task'] = self._split_at_placeholder(
+            prompts['composite_user'], '____USER_MESSAGE____'
+        )
+        
         return prompts
     
+    @staticmethod
+    def _split_at_placeholder(template: str, placeholder: str):
+        """
+        Split a prompt template into its static prefix and the part starting at the
+        placeholder's line (together with the markdown heading right above it, if any).
+        """
+        index = template.find(placeholder)
+        if index == -1:
+            return template, ""
+        line_start = template.rfind("\n", 0, index) + 1
+        static, task = template[:line_start].rstrip(), template[line_start:]
+        heading_start = static.rfind("\n") + 1
+        if static[heading_start:].startswith("#"):
+            static, task = static[:heading_start].rstrip(), static[heading_start:] + "\n\n" + task
+        return static, task
+    
+    def _schema_text(self, model_cls) -> str:
+        """Static JSON-schema instruction for a response model (memoized so the prompt prefix is byte-identical)"""
+        if model_cls not in self._schema_texts:
+            schema = json.dumps(model_cls.model_json_schema(), separators=(",", ":"))
+            self._schema_texts[model_cls] = f"Your response must be valid JSON matching this JSON schema:\n{schema}"
+        return self._schema_texts[model_cls]
+    
+    @staticmethod
+    def _anthropic_system(*static_blocks: str, dynamic: str = None) -> list:
+        """
+        Build Anthropic system content with a cache breakpoint after the static blocks,
+        so the large system prompt (and schema/instructions) is served from the prompt cache.
+        Per-request text goes in `dynamic`, after the breakpoint.
+        """
+        blocks = [{"type": "text", "text": text} for text in static_blocks if text]
+        if blocks:
+            blocks[-1]["cache_control"] = {"type": "ephemeral"}
+        if dynamic:
+            blocks.append({"type": "text", "text": dynamic})
+        return blocks
+    
+    def _load_model_tiers(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Load the provider -> task -> {model, max_tokens, temperature} map"""
+        if not MODEL_TIERS_FILE.exists():
+            print(f"Warning: Model tier file not found: {MODEL_TIERS_FILE}, using {self.model} for all tasks")
+            return {}
+        with open(MODEL_TIERS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _resolve_tier(self, task: str) -> Dict[str, Any]:
+        """
+        Resolve the model settings for a sub-call task.
+        
+        Tasks without an entry for the current provider run on self.model.
+        A tier temperature overrides the one passed by the caller.
+        """
+        tier = {"model": self.model, "max_tokens": None, "temperature": None}
+        tier.update(self.model_tiers.get(self.provider, {}).get(task, {}))
+        if not tier.get("model"):
+            tier["model"] = self.model
+        return tier
+    
+    def _call(self, task: str, create, temperature: float = 0.7, **kwargs):
+        """
+        Call a provider API method with the model, temperature and output budget
+        of the task's tier, and record its latency and token usage.
+        
+        Args:
+            task: The sub-call task name (key in the tier map)
+            create: The client method to call (e.g. self.client.messages.create)
+            temperature: The caller's sampling temperature
+            **kwargs: Remaining provider-specific request arguments
+        """
+        tier = self._resolve_tier(task)
+        model = tier["model"]
+        if tier["temperature"] is not None:
+            temperature = tier["temperature"]
+        max_tokens = tier["max_tokens"]
+        
+        if self.provider == "google":
+            config = dict(kwargs.pop("config", None) or {})
+            config["temperature"] = temperature
+            if max_tokens:
+                config["max_output_tokens"] = max_tokens
+            kwargs["config"] = config
+        else:
+            kwargs["temperature"] = temperature
+            if self.provider == "anthropic":
+                kwargs["max_tokens"] = max_tokens or self.DEFAULT_MAX_TOKENS.get(task, 4096)
+            else:
+                # Routes requests sharing a static prefix to the same prompt-cache shard
+                kwargs.setdefault("extra_body", {})["prompt_cache_key"] = f"smallgami-{task}"
+                if max_tokens:
+                    kwargs["max_tokens"] = max_tokens
+        
+        start = time.perf_counter()
+        with metrics.track_call("llm", task, provider=self.provider, model=model,
+                                request_bytes=metrics.payload_size(kwargs)) as call:
+            try:
+                response = create(model=model, **kwargs)
+            except Exception:
+                self._record_task(task, model, time.perf_counter() - start, None, None)
+                raise
+            usage = metrics.extract_usage(response)
+            call.set_usage(usage)
+        self._record_task(task, model, call.duration, response, usage)
+        return response
+    
+    def _record_task(self, task: str, model: str, duration: float, response, usage: Optional[Dict[str, int]]):
+        """Accumulate per-(task, model) latency and token stats and log the call"""
+        usage = usage or metrics.extract_usage(None)
+        key = f"{task}:{model}"
+        with self._stats_lock:
+            stats = self.task_stats.setdefault(key, {
+                "task": task,
+                "model": model,
+                "calls": 0,
+                "errors": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0,
+                "input_tokens": 0,
+                "cached_input_tokens": 0,
+                "cache_write_tokens": 0,
+                "output_tokens": 0,
+            })
+            stats["calls"] += 1
+            stats["errors"] += 1 if response is None else 0
+            stats["total_seconds"] += duration
+            stats["max_seconds"] = max(stats["max_seconds"], duration)
+            stats["input_tokens"] += usage["input_tokens"]
+            stats["cached_input_tokens"] += usage["cached_input_tokens"]
+            stats["cache_write_tokens"] += usage["cache_write_tokens"]
+            stats["output_tokens"] += usage["output_tokens"]
+        
+        log.debug("LLM call", task=task, model=model, status="error" if response is None else "ok",
+                  seconds=round(duration, 2), input_tokens=usage['input_tokens'],
+                  cached_input_tokens=usage['cached_input_tokens'], output_tokens=usage['output_tokens'])
+    
     def _detect_provider(self, model: str) -> str:
         """Detect which provider a model belongs to"""
         # Check if model is in our mapping
@@ -101,16 +278,16 @@ class GamiAgent:
     def _init_client(self):
         """Initialize the API client based on provider"""
         if self.provider == "openai":
-            api_key = os.getenv('OPENAI_API_KEY')
+            api_key = providers.api_key(os.getenv('OPENAI_API_KEY'))
             if not api_key:
                 raise ValueError("OPENAI_API_KEY environment variable not set")
-            self.client = OpenAI(api_key=api_key)
+            self.client = OpenAI(api_key=api_key, http_client=providers.http_client())
             
         elif self.provider == "anthropic":
-            api_key = os.getenv('ANTHROPIC_API_KEY')
+            api_key = providers.api_key(os.getenv('ANTHROPIC_API_KEY'))
             if not api_key:
                 raise ValueError("ANTHROPIC_API_KEY environment variable not set")
-            self.client = Anthropic(api_key=api_key)
+            self.client = Anthropic(api_key=api_key, http_client=providers.http_client(AnthropicHttpxClient))
             
         elif self.provider == "google":
             # Get Vertex AI configuration from environment
@@ -118,7 +295,7 @@ class GamiAgent:
             location = os.getenv('VERTEX_LOCATION', 'global')
             
             # Create Vertex AI client
-            self.client = genai.Client(
+            self.client = providers.genai_client(
                 vertexai=True,
                 project=project,
                 location=location
@@ -203,8 +380,8 @@ class GamiAgent:
         user_prompt = self.prompts['intent_user'].format(user_message=message)
         
         if self.provider == "openai":
-            response = self.client.chat.completions.parse(
-                model=self.model,
+            response = self._call(
+                "intent", self.client.chat.completions.parse,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
@@ -218,10 +395,9 @@ class GamiAgent:
             # Use regular JSON mode to avoid "compiled grammar too large" errors
             enhanced_user_prompt = user_prompt + "\n\nIMPORTANT: Return your response as valid JSON with only this field: intent (must be exactly 'chat' or 'generate_asset')."
             
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=1024,
-                system=system_prompt,
+            response = self._call(
+                "intent", self.client.messages.create,
+                system=self._anthropic_system(system_prompt, self._schema_text(IntentClassification)),
                 messages=[
                     {"role": "user", "content": enhanced_user_prompt}
                 ],
@@ -248,16 +424,16 @@ class GamiAgent:
         elif self.provider == "google":
             # Google Gemini Vertex AI with JSON schema
             config = {
-                "temperature": temperature,
                 "response_mime_type": "application/json",
                 "response_schema": IntentClassification.model_json_schema(),
             }
             
             full_message = f"{system_prompt}\n\n{user_prompt}"
-            response = self.client.models.generate_content(
-                model=self.model,
+            response = self._call(
+                "intent", self.client.models.generate_content,
                 contents=full_message,
-                config=config
+                config=config,
+                temperature=temperature,
             )
             data = json.loads(response.text)
             return IntentClassification(**data)
@@ -282,8 +458,8 @@ class GamiAgent:
             messages.extend(history)
             messages.append({"role": "user", "content": message})
             
-            response = self.client.chat.completions.create(
-                model=self.model,
+            response = self._call(
+                "chat", self.client.chat.completions.create,
                 messages=messages,
                 temperature=temperature,
             )
@@ -295,10 +471,9 @@ class GamiAgent:
             messages = list(history)
             messages.append({"role": "user", "content": message})
             
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                system=system_prompt,
+            response = self._call(
+                "chat", self.client.messages.create,
+                system=self._anthropic_system(system_prompt),
                 messages=messages,
                 temperature=temperature,
             )
@@ -313,11 +488,10 @@ class GamiAgent:
             conversation += f"\n\n Here is the user's current message you should respond to, you natural langauge text to respond (not JSON): "
             conversation += f"User: {message}"
             
-            config = {"temperature": temperature}
-            response = self.client.models.generate_content(
-                model=self.model,
+            response = self._call(
+                "chat", self.client.models.generate_content,
                 contents=conversation,
-                config=config
+                temperature=temperature,
             )
             return response.text
     
@@ -333,11 +507,23 @@ class GamiAgent:
         Returns:
             CompositeObject with the generated asset structure
         """
+        if COMPOSITE_SPLIT and not history:
+            try:
+                return self._generate_asset_split(message, temperature)
+            except Exception as e:
+                log.info("Split composite generation failed, generating in one call", error=str(e))
+        
         system_prompt = self.prompts['composite_system']
-        user_prompt = self.prompts['composite_user'].replace('____USER_MESSAGE____', message)
+        # The ~20 KB of asset instructions are identical on every call; only the
+        # task section carries the user's message, so it goes last
+        static_instructions = self.prompts['composite_user_static']
+        user_prompt = self.prompts['composite_user_task'].replace('____USER_MESSAGE____', message)
         
         if self.provider == "openai":
-            messages = [{"role": "system", "content": system_prompt}]
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": static_instructions},
+            ]
             
             # Add history for context (but not too much to avoid token limits)
             # Only include the last few messages for context
@@ -345,8 +531,8 @@ class GamiAgent:
             messages.extend(recent_history)
             messages.append({"role": "user", "content": user_prompt})
             
-            response = self.client.chat.completions.parse(
-                model=self.model,
+            response = self._call(
+                "composite", self.client.chat.completions.parse,
                 messages=messages,
                 temperature=temperature,
                 response_format=CompositeObject,
@@ -362,10 +548,9 @@ class GamiAgent:
             messages = list(history[-4:] if len(history) > 4 else history)
             messages.append({"role": "user", "content": enhanced_user_prompt})
             
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=8192,
-                system=system_prompt,
+            response = self._call(
+                "composite", self.client.messages.create,
+                system=self._anthropic_system(system_prompt, self._schema_text(CompositeObject), static_instructions),
                 messages=messages,
                 temperature=temperature,
             )
@@ -391,27 +576,182 @@ class GamiAgent:
         elif self.provider == "google":
             # Google Gemini Vertex AI with JSON schema
             config = {
-                "temperature": temperature,
                 "response_mime_type": "application/json",
                 "response_schema": CompositeObject.model_json_schema(),
             }
             
             # Build conversation with history
-            conversation = f"{system_prompt}\n\n"
+            conversation = f"{system_prompt}\n\n{static_instructions}\n\n"
             recent_history = history[-4:] if len(history) > 4 else history
             for msg in recent_history:
                 role = "User" if msg["role"] == "user" else "Assistant"
                 conversation += f"{role}: {msg['content']}\n\n"
             conversation += f"User: {user_prompt}"
             
-            response = self.client.models.generate_content(
-                model=self.model,
+            response = self._call(
+                "composite", self.client.models.generate_content,
                 contents=conversation,
-                config=config
+                config=config,
+                temperature=temperature,
             )
             data = json.loads(response.text)
             return CompositeObject(**data)
     
+    @staticmethod
+    def _strip_code_fence(text: str) -> str:
+        """JSON inside a ```json (or bare ```) block, else the text itself"""
+        if "```json" in text:
+            start = text.find("```json") + 7
+            return text[start:text.find("```", start)].strip()
+        if "```" in text:
+            start = text.find("```") + 3
+            return text[start:text.find("```", start)].strip()
+        return text
+    
+    def _structured(self, task: str, model_cls, system_prompt: str, static_instructions: str, user_prompt: str,
+                    temperature: float):
+        """
+        One structured-output call with the composite prompts: parsed output on OpenAI,
+        JSON mode validated with Pydantic on Anthropic (avoids "grammar too large"),
+        a response schema on Google.
+        """
+        if self.provider == "openai":
+            response = self._call(
+                task, self.client.chat.completions.parse,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": static_instructions},
+                    {"role": "user", "content": user_prompt},
+                ],
+                temperature=temperature,
+                response_format=model_cls,
+            )
+            return response.choices[0].message.parsed
+        
+        elif self.provider == "anthropic":
+            response = self._call(
+                task, self.client.messages.create,
+                system=self._anthropic_system(system_prompt, self._schema_text(model_cls), static_instructions),
+                messages=[{"role": "user", "content": user_prompt + f"\n\nIMPORTANT: Return your response as valid JSON matching the {model_cls.__name__} schema."}],
+                temperature=temperature,
+            )
+            return model_cls(**json.loads(self._strip_code_fence(response.content[0].text)))
+        
+        elif self.provider == "google":
+            response = self._call(
+                task, self.client.models.generate_content,
+                contents=f"{system_prompt}\n\n{static_instructions}\n\nUser: {user_prompt}",
+                config={
+                    "response_mime_type": "application/json",
+                    "response_schema": model_cls.model_json_schema(),
+                },
+                temperature=temperature,
+            )
+            return model_cls(**json.loads(response.text))
+    
+    def _generate_asset_split(self, message: str, temperature: float) -> CompositeObject:
+        """
+        Generate a composite asset in two phases: a short part plan (names, types, rough
+        boxes and colors) from the composite_plan tier, then the full parts in parallel
+        batches of COMPOSITE_PART_BATCH, each batch seeing the whole plan so the parts fit
+        together. Parts a batch fails to return are built from their plan entry.
+        """
+        system_prompt = self.prompts['composite_system']
+        static_instructions = self.prompts['composite_user_static']
+        
+        plan_prompt = self.prompts['composite_plan_user'].replace('____USER_MESSAGE____', message)
+        plan = self._structured("composite_plan", CompositePlan, system_prompt, static_instructions, plan_prompt, temperature)
+        items = self._unique_plan_names(plan.parts)
+        if not items:
+            raise ValueError("The part plan has no parts")
+        
+        plan_json = json.dumps([item.model_dump() for item in items], separators=(",", ":"))
+        parts_prompt = self.prompts['composite_parts_user'].replace('____USER_MESSAGE____', message)
+        parts_prompt = parts_prompt.replace('____PART_PLAN____', plan_json)
+        batch_size = max(1, COMPOSITE_PART_BATCH)
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        
+        def generate_batch(batch: List[PartPlan]):
+            requested = json.dumps([{"name": item.name, "type": item.type} for item in batch], separators=(",", ":"))
+            prompt = parts_prompt.replace('____PART_BATCH____', requested)
+            return self._structured("composite_parts", CompositeParts, system_prompt, static_instructions, prompt,
+                                    temperature).parts
+        
+        generated = {}
+        failed_batches = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(batches)) as executor:
+            futures = [executor.submit(tracing.traced("composite.parts", generate_batch), batch) for batch in batches]
+            for batch, future in zip(batches, futures):
+                try:
+                    generated.update(self._match_parts(batch, future.result()))
+                except Exception as e:
+                    failed_batches += 1
+                    log.info("Composite part batch failed", parts=[item.name for item in batch], error=str(e))
+        if failed_batches == len(batches):
+            raise ValueError("Every composite part batch failed")
+        
+        return self._assemble_composite(plan, items, generated)
+    
+    @staticmethod
+    def _unique_plan_names(items: List[PartPlan]) -> List[PartPlan]:
+        """Plan entries with duplicate names renamed name_2, name_3, ..."""
+        seen = {}
+        unique = []
+        for item in items:
+            count = seen.get(item.name, 0) + 1
+            seen[item.name] = count
+            unique.append(item if count == 1 else item.model_copy(update={"name": f"{item.name}_{count}"}))
+        return unique
+    
+    @staticmethod
+    def _match_parts(batch: List[PartPlan], parts: list) -> Dict[str, Any]:
+        """Generated parts by plan name: matched by name, else by position in the batch"""
+        by_name = {part.name: part for part in parts}
+        planned = {item.name for item in batch}
+        matched = {}
+        for index, item in enumerate(batch):
+            part = by_name.get(item.name)
+            if part is None and index < len(parts) and parts[index].name not in planned:
+                part = parts[index].model_copy(update={"name": item.name})
+            if part is not None and part.type == item.type:
+                matched[item.name] = part
+        return matched
+    
+    @staticmethod
+    def _part_from_plan(item: PartPlan):
+        """A plain primitive filling a plan entry's box (for parts the model did not return)"""
+        width, height, depth = (max(abs(value), 0.01) for value in item.size)
+        material = MaterialData(albedoColor=[min(max(value, 0.0), 1.0) for value in item.color], metallic=0.0, roughness=0.8)
+        transform = TransformData(position=list(item.center), rotation=[0.0, 0.0, 0.0])
+        if item.type == "sphere":
+            diameter = max(width, height, depth)
+            transform.scale = [width / diameter, height / diameter, depth / diameter]
+            return SpherePart(sphereOptions=SphereOptions(diameter=diameter), type="sphere", name=item.name,
+                              material=material, transform=transform)
+        if item.type == "cylinder":
+            return CylinderPart(cylinderOptions=CylinderOptions(height=height, diameter=max(width, depth)),
+                                type="cylinder", name=item.name, material=material, transform=transform)
+        if item.type == "softbox":
+            return SoftboxPart(softboxOptions=SoftboxOptions(width=width, height=height, depth=depth),
+                               type="softbox", name=item.name, material=material, transform=transform)
+        return BoxPart(boxOptions=BoxOptions(width=width, height=height, depth=depth), type="box", name=item.name,
+                       material=material, transform=transform)
+    
+    def _assemble_composite(self, plan: CompositePlan, items: List[PartPlan], generated: Dict[str, Any]) -> CompositeObject:
+        """Parts in plan order, validated as one CompositeObject"""
+        parts = []
+        for item in items:
+            part = generated.get(item.name)
+            if part is None:
+                log.info("Composite part missing, built from its plan", part=item.name)
+                part = self._part_from_plan(item)
+            parts.append(part)
+        return CompositeObject.model_validate({
+            "name": plan.name,
+            "description": plan.description,
+            "parts": [part.model_dump(exclude_none=True) for part in parts],
+        })
+    
     def _change_world_config(self, message: str, world_config: dict, temperature: float) -> WorldConfigChangeResponse:
         """
         Modify world configuration based on user request.
@@ -433,8 +773,8 @@ class GamiAgent:
         user_prompt = user_prompt.replace('____WORLD_CONFIG____', world_config_json)
         
         if self.provider == "openai":
-            response = self.client.chat.completions.parse(
-                model=self.model,
+            response = self._call(
+                "world_config", self.client.chat.completions.parse,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
@@ -448,10 +788,9 @@ class GamiAgent:
             # Use regular JSON mode and validate with Pydantic
             enhanced_user_prompt = user_prompt + "\n\nIMPORTANT: Return your response as valid JSON matching the WorldConfigChangeResponse schema with fields: worldConfig (complete world config) and summary (brief description of changes)."
             
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=8192,
-                system=system_prompt,
+            response = self._call(
+                "world_config", self.client.messages.create,
+                system=self._anthropic_system(system_prompt, self._schema_text(WorldConfigChangeResponse)),
                 messages=[
                     {"role": "user", "content": enhanced_user_prompt}
                 ],
@@ -477,16 +816,16 @@ class GamiAgent:
         elif self.provider == "google":
             # Google Gemini Vertex AI with JSON schema
             config = {
-                "temperature": temperature,
                 "response_mime_type": "application/json",
                 "response_schema": WorldConfigChangeResponse.model_json_schema(),
             }
             
             full_message = f"{system_prompt}\n\n{user_prompt}"
-            response = self.client.models.generate_content(
-                model=self.model,
+            response = self._call(
+                "world_config", self.client.models.generate_content,
                 contents=full_message,
-                config=config
+                config=config,
+                temperature=temperature,
             )
             data = json.loads(response.text)
             return WorldConfigChangeResponse(**data)
@@ -512,8 +851,8 @@ class GamiAgent:
         user_prompt = user_prompt.replace('____PLAYER_CONFIG____', player_config_json)
         
         if self.provider == "openai":
-            response = self.client.chat.completions.parse(
-                model=self.model,
+            response = self._call(
+                "player_config", self.client.chat.completions.parse,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
@@ -527,10 +866,9 @@ class GamiAgent:
             # Use regular JSON mode and validate with Pydantic
             enhanced_user_prompt = user_prompt + "\n\nIMPORTANT: Return your response as valid JSON matching the PlayerConfigChangeResponse schema with fields: playerConfig (complete player config) and summary (brief description of changes)."
             
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=8192,
-                system=system_prompt,
+            response = self._call(
+                "player_config", self.client.messages.create,
+                system=self._anthropic_system(system_prompt, self._schema_text(PlayerConfigChangeResponse)),
                 messages=[
                     {"role": "user", "content": enhanced_user_prompt}
                 ],
@@ -556,16 +894,16 @@ class GamiAgent:
         elif self.provider == "google":
             # Google Gemini Vertex AI with JSON schema
             config = {
-                "temperature": temperature,
                 "response_mime_type": "application/json",
                 "response_schema": PlayerConfigChangeResponse.model_json_schema(),
             }
             
             full_message = f"{system_prompt}\n\n{user_prompt}"
-            response = self.client.models.generate_content(
-                model=self.model,
+            response = self._call(
+                "player_config", self.client.models.generate_content,
                 contents=full_message,
-                config=config
+                config=config,
+                temperature=temperature,
             )
             data = json.loads(response.text)
             return PlayerConfigChangeResponse(**data)
@@ -614,11 +952,15 @@ class GamiAgent:
             mechanism_constraints += "- You CAN change: visual appearance, size, speed, name\n"
             mechanism_constraints += "- You CANNOT change: the core role (hazard vs collectible)\n"
             
-            # Replace the hardcoded mechanism constraints section
-            system_prompt = system_prompt.replace(
-                "### christmas (Dodge & Catch)\n- **box1**: MUST ALWAYS be a hazard → onPlayerCollision.player MUST be \"die\"\n- **box2**: MUST ALWAYS be a collectible → onPlayerCollision.player MUST be \"score\"\n- You CAN change: visual appearance, size, speed, name\n- You CANNOT change: the core role (hazard vs collectible)\n\n### running_christmas (Run & Catch)\n- **box1**: MUST ALWAYS be a hazard → onPlayerCollision.player MUST be \"die\"\n- **box2**: MUST ALWAYS be a collectible → onPlayerCollision.player MUST be \"score\"\n- Objects should have negative X velocity (moving toward player)\n- You CAN change: visual appearance, size, speed, name\n- You CANNOT change: the core role (hazard vs collectible)\n\n### Other mechanisms (flappy_bird, platform_forest, platform_jump)\n- Respect the object's intended gameplay role\n- Pipes/obstacles should remain hazards\n- Platforms should maintain jump behavior\n- Collectibles should maintain score behavior",
-                mechanism_constraints
+            # Sent after the static system prompt (instead of being spliced into it)
+            # so the system prompt stays a cacheable prefix
+            mechanism_constraints = (
+                "## Game Mechanism Constraints For This Game\n"
+                "These constraints take precedence over the generic mechanism constraints above.\n\n"
+                + mechanism_constraints
             )
+        else:
+            mechanism_constraints = ""
         
         # Convert object_config dict to JSON string for the prompt
         object_config_json = json.dumps(object_config, indent=2) if object_config else "{}"
@@ -649,12 +991,14 @@ class GamiAgent:
             )
         
         if self.provider == "openai":
-            response = self.client.chat.completions.parse(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+            messages = [{"role": "system", "content": system_prompt}]
+            if mechanism_constraints:
+                messages.append({"role": "system", "content": mechanism_constraints})
+            messages.append({"role": "user", "content": user_prompt})
+            
+            response = self._call(
+                "object_config", self.client.chat.completions.parse,
+                messages=messages,
                 temperature=temperature,
                 response_format=ObjectConfigChangeResponse,
             )
@@ -664,10 +1008,9 @@ class GamiAgent:
             # Use regular JSON mode and validate with Pydantic
             enhanced_user_prompt = user_prompt + "\n\nIMPORTANT: Return your response as valid JSON matching the ObjectConfigChangeResponse schema with fields: objectConfig (complete object config with UNCHANGED id field) and summary (brief description of changes)."
             
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=8192,
-                system=system_prompt,
+            response = self._call(
+                "object_config", self.client.messages.create,
+                system=self._anthropic_system(system_prompt, self._schema_text(ObjectConfigChangeResponse), dynamic=mechanism_constraints),
                 messages=[
                     {"role": "user", "content": enhanced_user_prompt}
                 ],
@@ -691,16 +1034,16 @@ class GamiAgent:
         elif self.provider == "google":
             # Google Gemini Vertex AI with JSON schema
             config = {
-                "temperature": temperature,
                 "response_mime_type": "application/json",
                 "response_schema": ObjectConfigChangeResponse.model_json_schema(),
             }
             
-            full_message = f"{system_prompt}\n\n{user_prompt}"
-            response = self.client.models.generate_content(
-                model=self.model,
+            full_message = "\n\n".join(part for part in [system_prompt, mechanism_constraints, user_prompt] if part)
+            response = self._call(
+                "object_config", self.client.models.generate_content,
                 contents=full_message,
-                config=config
+                config=config,
+                temperature=temperature,
             )
             data = json.loads(response.text)
             return ObjectConfigChangeResponse(**data)
@@ -731,8 +1074,8 @@ class GamiAgent:
         user_prompt = user_prompt.replace('____WORLD_DESCRIPTION____', world_description or "No world description provided")
         
         if self.provider == "openai":
-            response = self.client.chat.completions.parse(
-                model=self.model,
+            response = self._call(
+                "spawn_config", self.client.chat.completions.parse,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
@@ -746,10 +1089,9 @@ class GamiAgent:
             # Use regular JSON mode and validate with Pydantic
             enhanced_user_prompt = user_prompt + "\n\nIMPORTANT: Return your response as valid JSON matching the SpawnConfigChangeResponse schema with fields: spawnConfigs (complete list of all spawn controllers) and summary (brief description of changes)."
             
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=8192,
-                system=system_prompt,
+            response = self._call(
+                "spawn_config", self.client.messages.create,
+                system=self._anthropic_system(system_prompt, self._schema_text(SpawnConfigChangeResponse)),
                 messages=[
                     {"role": "user", "content": enhanced_user_prompt}
                 ],
@@ -773,16 +1115,16 @@ class GamiAgent:
         elif self.provider == "google":
             # Google Gemini Vertex AI with JSON schema
             config = {
-                "temperature": temperature,
                 "response_mime_type": "application/json",
                 "response_schema": SpawnConfigChangeResponse.model_json_schema(),
             }
             
             full_message = f"{system_prompt}\n\n{user_prompt}"
-            response = self.client.models.generate_content(
-                model=self.model,
+            response = self._call(
+                "spawn_config", self.client.models.generate_content,
                 contents=full_message,
-                config=config
+                config=config,
+                temperature=temperature,
             )
             data = json.loads(response.text)
             return SpawnConfigChangeResponse(**data)
@@ -817,8 +1159,8 @@ class GamiAgent:
     
     def _chat_openai(self, message: str, system_prompt: str, temperature: float) -> str:
         """Chat with OpenAI GPT"""
-        response = self.client.chat.completions.create(
-            model=self.model,
+        response = self._call(
+            "chat", self.client.chat.completions.create,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": message}
@@ -829,10 +1171,9 @@ class GamiAgent:
     
     def _chat_anthropic(self, message: str, system_prompt: str, temperature: float) -> str:
         """Chat with Anthropic Claude"""
-        response = self.client.messages.create(
-            model=self.model,
-            max_tokens=4096,
-            system=system_prompt,
+        response = self._call(
+            "chat", self.client.messages.create,
+            system=self._anthropic_system(system_prompt),
             messages=[
                 {"role": "user", "content": message}
             ],
@@ -845,11 +1186,10 @@ class GamiAgent:
         # Gemini includes system prompt in the message
         full_message = f"{system_prompt}\n\nUser: {message}"
         
-        config = {"temperature": temperature}
-        response = self.client.models.generate_content(
-            model=self.model,
+        response = self._call(
+            "chat", self.client.models.generate_content,
             contents=full_message,
-            config=config
+            temperature=temperature,
         )
         return response.text
     
@@ -867,10 +1207,18 @@ class GamiAgent:
     
     def get_info(self) -> dict:
         """Get information about the current configuration"""
+        with self._stats_lock:
+            task_stats = [dict(stats) for stats in self.task_stats.values()]
+        for stats in task_stats:
+            stats["avg_seconds"] = stats["total_seconds"] / stats["calls"] if stats["calls"] else 0.0
+            stats["cache_hit_ratio"] = stats["cached_input_tokens"] / stats["input_tokens"] if stats["input_tokens"] else 0.0
+        
         return {
             "model": self.model,
             "provider": self.provider,
-            "available_models": list(self.MODEL_PROVIDERS.keys())
+            "available_models": list(self.MODEL_PROVIDERS.keys()),
+            "tiers": {task: self._resolve_tier(task) for task in self.DEFAULT_MAX_TOKENS},
+            "task_stats": task_stats,
         }
     
     def _suggest_block_changes(
@@ -957,8 +1305,8 @@ Remember: NO alternatives, NO "or" - just ONE concrete thing for each field that
 
         try:
             if self.provider == "openai":
-                response = self.client.chat.completions.create(
-                    model=self.model,
+                response = self._call(
+                    "block_suggestion", self.client.chat.completions.create,
                     messages=[
                         {"role": "system", "content": system_prompt},
                         {"role": "user", "content": user_prompt}
@@ -971,10 +1319,9 @@ Remember: NO alternatives, NO "or" - just ONE concrete thing for each field that
                 return BlockChangeSuggestionResponse(**data)
             
             elif self.provider == "anthropic":
-                response = self.client.messages.create(
-                    model=self.model,
-                    max_tokens=4096,
-                    system=system_prompt,
+                response = self._call(
+                    "block_suggestion", self.client.messages.create,
+                    system=self._anthropic_system(system_prompt),
                     messages=[
                         {"role": "user", "content": user_prompt}
                     ],
@@ -998,15 +1345,15 @@ Remember: NO alternatives, NO "or" - just ONE concrete thing for each field that
             elif self.provider == "google":
                 full_message = f"{system_prompt}\n\n{user_prompt}"
                 config = {
-                    "temperature": temperature,
                     "response_mime_type": "application/json",
                     "response_schema": BlockChangeSuggestionResponse.model_json_schema(),
                 }
                 
-                response = self.client.models.generate_content(
-                    model=self.model,
+                response = self._call(
+                    "block_suggestion", self.client.models.generate_content,
                     contents=full_message,
-                    config=config
+                    config=config,
+                    temperature=temperature,
                 )
                 data = json.loads(response.text)
                 return BlockChangeSuggestionResponse(**data)
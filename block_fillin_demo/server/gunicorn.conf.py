@@ -0,0 +1,57 @@
+"""
+Production server settings: gunicorn -c gunicorn.conf.py
+
+Threaded workers suit this server: requests spend most of their time waiting
+on providers. The app is imported once in the master (preload_app) so the
+agent, media interpreter and visual generator are built before fork and shared
+copy-on-write; no provider connection is opened during startup, so no socket
+is shared between workers. Provider call limits are split between the
+workers (scheduler.share_between).
+
+Metrics (/metrics) and traces (/traces) are kept in memory per process, and
+a scrape reaches whichever worker accepts it, so with several workers the
+counters would jump between processes and break rate(). Hence one worker by
+default (WEB_WORKERS=1): requests mostly wait on providers, so threads give
+the concurrency. A warning is logged when more workers are configured.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import APP_PORT, WEB_WORKERS, WEB_THREADS, WEB_TIMEOUT, WEB_GRACEFUL_TIMEOUT
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+wsgi_app = "main:app"
+bind = f"0.0.0.0:{APP_PORT}"
+
+worker_class = "gthread"
+workers = WEB_WORKERS
+threads = WEB_THREADS
+preload_app = True
+
+# Image and audio generation can take minutes; SIGTERM lets in-flight requests finish
+timeout = WEB_TIMEOUT
+graceful_timeout = WEB_GRACEFUL_TIMEOUT
+keepalive = 5
+
+accesslog = None
+errorlog = "-"
+
+
+def when_ready(server):
+    if server.cfg.workers > 1:
+        server.log.warning("%d workers: /metrics and /traces report one worker per scrape", server.cfg.workers)
+
+
+def post_worker_init(worker):
+    # SCHEDULER_POOLS are server-wide limits; each worker enforces its share
+    import scheduler
+    scheduler.share_between(worker.cfg.workers)
+    import asset_gc
+    asset_gc.start()
+
+
+def worker_exit(server, worker):
+    import logger
+    logger.shutdown()
@@ -0,0 +1,103 @@
+"""
+image_handle: Encoded image bytes passed between visual pipeline stages.
+
+Providers speak base64 (SD and rembg JSON APIs, the GPT edit endpoint), while
+files, PIL and multipart uploads want bytes. An ImageHandle holds whichever
+form it was created from and converts to the other once, on first use, so an
+image that goes from a base64 response straight into the next base64 request
+is never decoded, and one read from disk and written back is never encoded.
+"""
+import base64
+import hashlib
+import io
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+from PIL import Image
+
+
+class ImageHandle:
+    __slots__ = ("_data", "_b64")
+
+    def __init__(self, data: Optional[bytes] = None, b64: Optional[str] = None):
+        if data is None and b64 is None:
+            raise ValueError("ImageHandle needs bytes or base64")
+        self._data = data
+        self._b64 = b64
+
+    @classmethod
+    def from_b64(cls, value: Optional[str]) -> Optional["ImageHandle"]:
+        """Handle for a base64 string (data URL prefix allowed), None for an empty one"""
+        if not value:
+            return None
+        if value.startswith("data:"):
+            value = value.split(",", 1)[1]
+        return cls(b64=value)
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path]) -> "ImageHandle":
+        with open(path, "rb") as f:
+            return cls(data=f.read())
+
+    @classmethod
+    def coerce(cls, value) -> Optional["ImageHandle"]:
+        """Accept a handle, raw bytes or a base64 string"""
+        if value is None or isinstance(value, cls):
+            return value
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return cls(data=bytes(value))
+        return cls.from_b64(value)
+
+    @property
+    def data(self) -> bytes:
+        if self._data is None:
+            self._data = base64.b64decode(self._b64)
+        return self._data
+
+    def b64(self) -> str:
+        if self._b64 is None:
+            self._b64 = base64.b64encode(self._data).decode("ascii")
+        return self._b64
+
+    def view(self) -> memoryview:
+        return memoryview(self.data)
+
+    def open(self) -> Image.Image:
+        image = Image.open(io.BytesIO(self.data))
+        image.load()
+        return image
+
+    @classmethod
+    def from_image(cls, image: Image.Image, format: str = "PNG", **params) -> "ImageHandle":
+        buffer = io.BytesIO()
+        image.save(buffer, format=format, **params)
+        return cls(data=buffer.getvalue())
+
+    def save(self, path: Union[str, Path]):
+        """Write the bytes to path atomically"""
+        data = self.view()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def sha256(self) -> str:
+        return hashlib.sha256(self.data).hexdigest()
+
+    def __bool__(self):
+        # Without this, truth tests would go through __len__ and decode
+        return True
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        held = "+".join(name for name, value in (("bytes", self._data), ("b64", self._b64)) if value is not None)
+        return f"<ImageHandle {held}>"
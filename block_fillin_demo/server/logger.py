@@ -0,0 +1,155 @@
+"""
+logger: Structured, leveled logging that keeps stdout I/O off the request thread.
+
+Records go through a QueueHandler; a QueueListener thread formats and writes
+them. Keyword fields are attached to the record, long values are truncated
+and DEBUG records can be sampled. Levels are configured per module with
+LOG_LEVELS ("routes.blocks=DEBUG,run_gpt=WARNING").
+
+Usage:
+    log = get_logger(__name__)
+    log.info("Block generate request", block_type=block_type, content=content)
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import tracing
+from config import LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_MAX_FIELD_CHARS, LOG_DEBUG_SAMPLE_RATE
+
+ROOT_LOGGER = "smallgami"
+
+
+def truncate(value, limit: int = None):
+    """Shorten long strings (prompts, model outputs, base64) for logging"""
+    limit = limit or LOG_MAX_FIELD_CHARS
+    if not isinstance(value, str):
+        value = value if isinstance(value, (int, float, bool, type(None))) else str(value)
+        if not isinstance(value, str):
+            return value
+    if len(value) <= limit:
+        return value
+    return f"{value[:limit]}... [{len(value) - limit} more chars]"
+
+
+class _PayloadFilter(logging.Filter):
+    """Truncates fields, samples DEBUG records and tags records with the request id"""
+
+    def filter(self, record):
+        if record.levelno <= logging.DEBUG and LOG_DEBUG_SAMPLE_RATE < 1.0:
+            if random.random() >= LOG_DEBUG_SAMPLE_RATE:
+                return False
+        fields = getattr(record, "fields", None)
+        if fields:
+            record.fields = {key: truncate(value) for key, value in fields.items()}
+        else:
+            record.fields = {}
+        record.request_id = tracing.current_request_id()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.request_id:
+            entry["request_id"] = record.request_id
+        entry.update(record.fields)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """The server's usual ' :: message' console style, with fields on indented lines"""
+
+    def format(self, record):
+        prefix = " :: " if record.levelno < logging.WARNING else f" :: {record.levelname.title()}: "
+        lines = [f"{prefix}{record.getMessage()}"]
+        lines.extend(f"    - {key}: {value}" for key, value in record.fields.items())
+        if record.exc_text:
+            lines.append(record.exc_text)
+        return "\n".join(lines)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        """Render message args and traceback now; keep the fields for the listener's formatter"""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """Moves keyword arguments into record.fields"""
+
+    _RESERVED = ("exc_info", "stack_info", "stacklevel", "extra")
+
+    def process(self, msg, kwargs):
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in self._RESERVED}
+        extra = dict(kwargs.pop("extra", None) or {})
+        extra["fields"] = {**extra.get("fields", {}), **fields}
+        kwargs["extra"] = extra
+        return msg, kwargs
+
+
+def _parse_levels(spec: str):
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener = None
+
+
+def _configure():
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(LOG_LEVEL.upper())
+    root.propagate = False
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    # Filter on the producer side so fields are truncated before the record is queued
+    queue_handler.addFilter(_PayloadFilter())
+    root.addHandler(queue_handler)
+
+    for name, level in _parse_levels(LOG_LEVELS).items():
+        logging.getLogger(f"{ROOT_LOGGER}.{name}").setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    atexit.register(shutdown)
+    # The writer thread does not survive fork (gunicorn preload): flush before, restart on both sides
+    os.register_at_fork(before=shutdown, after_in_parent=_listener.start, after_in_child=_listener.start)
+
+
+def shutdown():
+    """Write out queued records and stop the writer thread"""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def get_logger(name: str) -> StructuredLogger:
+    if _listener is None:
+        _configure()
+    return StructuredLogger(logging.getLogger(f"{ROOT_LOGGER}.{name}"), {})
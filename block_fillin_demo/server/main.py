@@ -2,11 +2,21 @@ from flask import Flask
 from flask_cors import CORS
 from gami_agent import GamiAgent
 from MediaInterpreter import MediaInterpreter
+from VisualGenerator import VisualGenerator
+from config_catalog import ConfigCatalog
+import asset_gc
 import os
+from config import APP_PORT, APP_DEBUG
 from routes.agent import agent_bp
 from routes.blocks import blocks_bp
 from routes.media import media_bp
 from routes.config_files import config_files_bp
+from routes.metrics import metrics_bp
+from routes.traces import traces_bp
+from routes.health import health_bp
+from routes.scheduler import scheduler_bp
+from routes.factory import factory_bp
+from routes.assets import assets_bp
 
 
 def create_app():
@@ -30,10 +40,25 @@ def create_app():
         print(f" :: Warning: Could not initialize MediaInterpreter: {e}")
         app.config['MEDIA_INTERPRETER'] = None
 
+    try:
+        app.config['VISUAL_GENERATOR'] = VisualGenerator()
+        print(f" :: VisualGenerator initialized")
+    except Exception as e:
+        print(f" :: Warning: Could not initialize VisualGenerator: {e}")
+        app.config['VISUAL_GENERATOR'] = None
+
+    app.config['CONFIG_CATALOG'] = ConfigCatalog()
+
     app.register_blueprint(agent_bp)
     app.register_blueprint(blocks_bp)
     app.register_blueprint(media_bp)
     app.register_blueprint(config_files_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(traces_bp)
+    app.register_blueprint(health_bp)
+    app.register_blueprint(scheduler_bp)
+    app.register_blueprint(factory_bp)
+    app.register_blueprint(assets_bp)
 
     @app.route('/')
     def hello_world():
@@ -42,16 +67,19 @@ def create_app():
     return app
 
 
+# Built at import so gunicorn (preload_app) initializes the singletons once, before forking workers
 app = create_app()
 
 if __name__ == '__main__':
-    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    # Development server; production uses `gunicorn -c gunicorn.conf.py`
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' or not APP_DEBUG:
         agent = app.config.get('AGENT')
         if agent:
             info = agent.get_info()
             print(f" :: Agent ready - Provider: {info['provider']}, Model: {info['model']}")
         else:
             print(" :: Warning: Agent not initialized. Check your API keys.")
-        print(" :: Starting SmallGami server on http://0.0.0.0:8000")
+        print(f" :: Starting SmallGami server on http://0.0.0.0:{APP_PORT}")
+        asset_gc.start()
 
-    app.run(host='0.0.0.0', port=8000, debug=True)
+    app.run(host='0.0.0.0', port=APP_PORT, debug=APP_DEBUG)
@@ -0,0 +1,141 @@
+"""
+matting: Background removal backends for generated sprites.
+
+'local' keys out a plain background on the CPU: the background colour is the
+median of the image border, pixels within MATTING_TOLERANCE of it that are
+connected to the border become transparent (so white details inside the
+object stay), and a band around the object edge gets a soft alpha with the
+background colour unmixed from it. 'remote' is the rembg server. 'auto' runs
+the local matte and escalates to rembg when its quality score (how uniform the
+border is, and whether the object covers a plausible share of the image) is
+below MATTING_MIN_QUALITY.
+"""
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+from PIL import Image
+
+import metrics
+import tracing
+from image_handle import ImageHandle
+from config import MATTING_BACKEND, MATTING_TOLERANCE, MATTING_FEATHER, MATTING_MIN_QUALITY
+from logger import get_logger
+
+log = get_logger(__name__)
+
+MATTING_BACKENDS = ('local', 'remote', 'auto')
+
+# Share of the image the object may cover for the matte to be trusted
+MIN_COVERAGE = 0.01
+MAX_COVERAGE = 0.95
+
+
+@dataclass
+class Matte:
+    image: Optional[Image.Image]
+    quality: float
+    border_match: float
+    coverage: float
+
+
+def _border(pixels: np.ndarray) -> np.ndarray:
+    return np.concatenate([pixels[0], pixels[-1], pixels[1:-1, 0], pixels[1:-1, -1]])
+
+
+def _spread_along_rows(reached: np.ndarray, candidate: np.ndarray) -> np.ndarray:
+    """Extend reached to every horizontal run of candidate pixels it touches"""
+    height, width = candidate.shape
+    # A False column after each row keeps runs from wrapping into the next row
+    padded = np.zeros((height, width + 1), dtype=bool)
+    padded[:, :width] = candidate
+    flat = padded.ravel()
+    starts = flat & ~np.concatenate(([False], flat[:-1]))
+    run_id = (np.cumsum(starts) * flat).reshape(height, width + 1)[:, :width]
+    hit = np.zeros(int(starts.sum()) + 1, dtype=bool)
+    hit[run_id[reached]] = True
+    hit[0] = False
+    return hit[run_id]
+
+
+def _border_connected(candidate: np.ndarray) -> np.ndarray:
+    """Pixels of candidate 4-connected to the image border (row/column sweeps until nothing changes)"""
+    reached = np.zeros_like(candidate)
+    reached[[0, -1], :] = candidate[[0, -1], :]
+    reached[:, [0, -1]] = candidate[:, [0, -1]]
+    while True:
+        before = int(reached.sum())
+        reached = _spread_along_rows(reached, candidate)
+        reached = _spread_along_rows(reached.T, candidate.T).T
+        if int(reached.sum()) == before:
+            return reached
+
+
+def _dilate(mask: np.ndarray, radius: int) -> np.ndarray:
+    """Square dilation of a boolean mask by radius pixels (separable: rows, then columns)"""
+    height, width = mask.shape
+    padded = np.pad(mask, radius)
+    rows = np.zeros((height + 2 * radius, width), dtype=bool)
+    for dx in range(2 * radius + 1):
+        rows |= padded[:, dx:dx + width]
+    grown = np.zeros_like(mask)
+    for dy in range(2 * radius + 1):
+        grown |= rows[dy:dy + height]
+    return grown
+
+
+def local_matte(image: Image.Image, tolerance: float = MATTING_TOLERANCE, feather: int = MATTING_FEATHER,
+                min_border_match: float = 0.0) -> Matte:
+    """
+    Key out the border-connected background of image; see the module docstring.
+    Below min_border_match the background is not plain enough to bother: the
+    returned Matte has no image and only the border score.
+    """
+    rgb = np.asarray(image.convert("RGB"), dtype=np.float32)
+    background = np.median(_border(rgb), axis=0)
+    squared = ((rgb - background) ** 2).sum(axis=2)
+    candidate = squared <= tolerance ** 2
+    border_match = float(_border(candidate).mean())
+    if border_match < min_border_match:
+        return Matte(None, border_match, border_match, 0.0)
+
+    keyed = _border_connected(candidate)
+
+    # Soft alpha in a band around the keyed area, ramping from the tolerance to twice of it
+    alpha = np.where(keyed, 0.0, 1.0).astype(np.float32)
+    if feather > 0:
+        band = _dilate(keyed, feather) & ~keyed
+        alpha[band] = np.clip((np.sqrt(squared[band]) - tolerance) / max(tolerance, 1.0), 0.0, 1.0)
+        # Unmix the background from partially transparent edge pixels
+        soft = band & (alpha > 0) & (alpha < 1)
+        rgb = rgb.copy()
+        rgb[soft] = background + (rgb[soft] - background) / alpha[soft][:, None]
+
+    if image.mode in ("RGBA", "LA"):
+        alpha *= np.asarray(image.getchannel("A"), dtype=np.float32) / 255.0
+
+    coverage = float((alpha > 0.5).mean())
+    quality = border_match if MIN_COVERAGE <= coverage <= MAX_COVERAGE else 0.0
+    rgba = np.dstack([np.clip(rgb + 0.5, 0, 255), np.clip(alpha * 255 + 0.5, 0, 255)]).astype(np.uint8)
+    return Matte(Image.fromarray(rgba, "RGBA"), quality, border_match, coverage)
+
+
+def remove_background(image: ImageHandle, remote: Callable[[ImageHandle], Optional[ImageHandle]],
+                      backend: str = MATTING_BACKEND, min_quality: float = MATTING_MIN_QUALITY) -> Optional[ImageHandle]:
+    """PNG of image without its background, using backend ('local', 'remote' or 'auto')"""
+    if backend == 'remote':
+        metrics.MATTING_RESULTS.inc(backend="remote", result="used")
+        return remote(image)
+
+    with tracing.span("matting.local", backend=backend) as span:
+        matte = local_matte(image.open(), min_border_match=min_quality if backend == 'auto' else 0.0)
+        span.set_attributes(quality=round(matte.quality, 3), coverage=round(matte.coverage, 3))
+
+    if backend == 'local' or matte.quality >= min_quality:
+        metrics.MATTING_RESULTS.inc(backend="local", result="used")
+        return ImageHandle.from_image(matte.image)
+
+    metrics.MATTING_RESULTS.inc(backend="local", result="escalated")
+    log.info("Local matte below quality threshold, using rembg", quality=round(matte.quality, 3),
+             min_quality=min_quality, border_match=round(matte.border_match, 3), coverage=round(matte.coverage, 3))
+    return remote(image)
@@ -0,0 +1,364 @@
+"""
+metrics: In-process latency/token/payload metrics for outbound provider calls,
+rendered in the Prometheus text exposition format on /metrics
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+import tracing
+
+# Seconds; provider calls range from sub-second intent checks to minute-long image/audio jobs
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+# Bytes; from short prompts up to multi-MB base64 images
+PAYLOAD_BUCKETS = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return "\n".join(lines)
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_value(self, key, state):
+        lines = []
+        for bound, count in zip(self.buckets, state["counts"]):
+            le = 'le="%g"' % bound
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+        le = 'le="+Inf"'
+        lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {state['count']}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state['sum']}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+CALL_LABELS = ("service", "operation", "provider", "model", "route", "block_type", "status")
+TOKEN_LABELS = ("service", "operation", "provider", "model", "route", "block_type", "kind")
+
+CALL_DURATION = REGISTRY.register(Histogram(
+    "smallgami_provider_call_duration_seconds",
+    "Duration of outbound LLM, vision, image and audio provider calls",
+    CALL_LABELS,
+))
+CALLS = REGISTRY.register(Counter(
+    "smallgami_provider_calls_total",
+    "Outbound provider calls by status (ok/error)",
+    CALL_LABELS,
+))
+PAYLOAD_BYTES = REGISTRY.register(Histogram(
+    "smallgami_provider_payload_bytes",
+    "Request/response payload size of outbound provider calls",
+    ("service", "operation", "direction"),
+    buckets=PAYLOAD_BUCKETS,
+))
+TOKENS = REGISTRY.register(Counter(
+    "smallgami_provider_tokens_total",
+    "Tokens used by provider calls (kind: input, cached_input, cache_write, output)",
+    TOKEN_LABELS,
+))
+PROMPT_CACHE_HITS = REGISTRY.register(Counter(
+    "smallgami_provider_prompt_cache_hits_total",
+    "Provider calls that were served (partly) from the provider prompt cache",
+    ("service", "operation", "provider", "model"),
+))
+TEXTURE_LIBRARY_LOOKUPS = REGISTRY.register(Counter(
+    "smallgami_texture_library_lookups_total",
+    "Ground texture library lookups (result: hit, miss, refresh)",
+    ("result",),
+))
+MATTING_RESULTS = REGISTRY.register(Counter(
+    "smallgami_matting_results_total",
+    "Background removals by backend (result: used, escalated to rembg)",
+    ("backend", "result"),
+))
+SKYBOX_STAGES = REGISTRY.register(Counter(
+    "smallgami_skybox_stages_total",
+    "Skybox pipeline stages (stage: base, reference, outpaint, panorama; result: cached, generated, failed)",
+    ("stage", "result"),
+))
+ASSET_WRITES = REGISTRY.register(Counter(
+    "smallgami_asset_writes_total",
+    "Generated asset files by kind (result: stored, deduplicated)",
+    ("kind", "result"),
+))
+ASSET_POOL_LOOKUPS = REGISTRY.register(Counter(
+    "smallgami_asset_pool_lookups_total",
+    "Pre-generated asset pool lookups by kind (kind: asset, ambient; result: hit, miss)",
+    ("kind", "result"),
+))
+ASSET_GC_FILES = REGISTRY.register(Counter(
+    "smallgami_asset_gc_files_total",
+    "Files deleted by the asset garbage collector (reason: expired, orphaned, quota)",
+    ("reason",),
+))
+ASSET_GC_BYTES = REGISTRY.register(Counter(
+    "smallgami_asset_gc_bytes_total",
+    "Bytes freed by the asset garbage collector",
+    ("reason",),
+))
+CONFIG_LOADS = REGISTRY.register(Counter(
+    "smallgami_config_loads_total",
+    "Saved game config loads (result: cached, parsed, not_modified)",
+    ("result",),
+))
+ANALYSIS_INDEX_LOOKUPS = REGISTRY.register(Counter(
+    "smallgami_analysis_index_lookups_total",
+    "Image analysis index lookups (result: hit, miss)",
+    ("result",),
+))
+SCHEDULER_WAIT = REGISTRY.register(Histogram(
+    "smallgami_scheduler_wait_seconds",
+    "Time provider calls waited for a slot in their scheduler pool",
+    ("pool", "priority"),
+))
+SCHEDULER_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "smallgami_scheduler_queue_depth",
+    "Provider calls waiting for a slot, per pool and priority class",
+    ("pool", "priority"),
+))
+SCHEDULER_ACTIVE = REGISTRY.register(Gauge(
+    "smallgami_scheduler_active",
+    "Provider calls holding a slot, per pool",
+    ("pool",),
+))
+SCHEDULER_TIMEOUTS = REGISTRY.register(Counter(
+    "smallgami_scheduler_timeouts_total",
+    "Provider calls that gave up waiting for a scheduler slot",
+    ("pool", "priority"),
+))
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "smallgami_http_request_duration_seconds",
+    "Server-side duration of incoming HTTP requests",
+    ("route", "method", "block_type", "status"),
+))
+
+
+# ===== REQUEST LABELS =====
+
+# Route / block type of the request being served; read by track_call so provider
+# metrics can be broken down per route and block type
+_request_labels = contextvars.ContextVar("request_labels", default={})
+
+
+def reset_request_labels(**labels):
+    """Start a fresh label set for a new request (worker threads are reused across requests)"""
+    _request_labels.set(dict(labels))
+
+
+def set_request_labels(**labels):
+    """Set (merge) the route/block_type labels for the current request context"""
+    _request_labels.set({**_request_labels.get(), **labels})
+
+
+def request_labels() -> Dict[str, str]:
+    return _request_labels.get()
+
+
+# ===== CALL TRACKING =====
+
+def extract_usage(response) -> Dict[str, int]:
+    """
+    Read token counts from an OpenAI, Anthropic or Gemini response.
+
+    input_tokens is the full prompt size; cached_input_tokens is the part served
+    from the provider's prompt cache and cache_write_tokens the part written to it.
+    """
+    usage = {"input_tokens": 0, "output_tokens": 0, "cached_input_tokens": 0, "cache_write_tokens": 0}
+
+    raw = getattr(response, "usage", None)
+    if raw is not None and hasattr(raw, "prompt_tokens"):
+        # OpenAI: prompt_tokens includes cached tokens
+        details = getattr(raw, "prompt_tokens_details", None)
+        usage["input_tokens"] = raw.prompt_tokens or 0
+        usage["output_tokens"] = getattr(raw, "completion_tokens", 0) or 0
+        usage["cached_input_tokens"] = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+    elif raw is not None:
+        # Anthropic (and OpenAI images): input_tokens excludes cache reads and writes
+        cache_read = getattr(raw, "cache_read_input_tokens", 0) or 0
+        cache_write = getattr(raw, "cache_creation_input_tokens", 0) or 0
+        usage["input_tokens"] = (getattr(raw, "input_tokens", 0) or 0) + cache_read + cache_write
+        usage["output_tokens"] = getattr(raw, "output_tokens", 0) or 0
+        usage["cached_input_tokens"] = cache_read
+        usage["cache_write_tokens"] = cache_write
+
+    raw = getattr(response, "usage_metadata", None)
+    if raw is not None:
+        # Gemini: prompt_token_count includes implicitly cached content
+        usage["input_tokens"] = getattr(raw, "prompt_token_count", 0) or 0
+        usage["output_tokens"] = getattr(raw, "candidates_token_count", 0) or 0
+        usage["cached_input_tokens"] = getattr(raw, "cached_content_token_count", 0) or 0
+    return usage
+
+
+def payload_size(payload) -> int:
+    """Approximate request size by summing the lengths of all strings/bytes in a payload"""
+    if isinstance(payload, (str, bytes, bytearray, memoryview)):
+        return len(payload)
+    if isinstance(payload, dict):
+        return sum(payload_size(value) for value in payload.values())
+    if isinstance(payload, (list, tuple)):
+        return sum(payload_size(value) for value in payload)
+    return 0
+
+
+class CallRecord:
+    """Mutable result of a tracked call; filled in by the caller inside track_call"""
+
+    def __init__(self, request_bytes: int = 0):
+        self.request_bytes = request_bytes
+        self.response_bytes = 0
+        self.usage = {"input_tokens": 0, "output_tokens": 0, "cached_input_tokens": 0, "cache_write_tokens": 0}
+        self.status = "ok"
+        self.duration = 0.0
+
+    def set_usage(self, usage: Optional[Dict[str, int]]):
+        if usage:
+            self.usage.update(usage)
+
+    def fail(self):
+        """Mark a call as failed without raising (for calls that return None on error)"""
+        self.status = "error"
+
+
+@contextmanager
+def track_call(service: str, operation: str, provider: str = "", model: str = "", request_bytes: int = 0):
+    """
+    Time an outbound call and record duration, payload sizes, token usage and
+    errors, labelled with the current request's route and block type. The call
+    also gets its own tracing span under the current span.
+
+    The call first takes a slot in its scheduler pool (see scheduler.py); the
+    wait is recorded on the span as queue_wait and is not part of the duration.
+
+    Usage:
+        with track_call("llm", "intent", provider="openai", model=model) as call:
+            response = client.chat.completions.create(...)
+            call.set_usage(extract_usage(response))
+    """
+    import scheduler  # imported here: scheduler registers its metrics in this module
+    with scheduler.slot(scheduler.pool_for(service, provider)) as waited:
+        with _timed_call(service, operation, provider, model, request_bytes, waited) as call:
+            yield call
+
+
+@contextmanager
+def _timed_call(service: str, operation: str, provider: str, model: str, request_bytes: int, queue_wait: float):
+    call = CallRecord(request_bytes)
+    span, token = tracing.start_span(f"{service}.{operation}", provider=provider, model=model or "",
+                                     queue_wait=round(queue_wait, 3))
+    start = time.perf_counter()
+    try:
+        yield call
+    except BaseException as e:
+        call.status = "error"
+        span.record_error(e)
+        raise
+    finally:
+        call.duration = time.perf_counter() - start
+        if call.status == "error" and span.status == "ok":
+            span.record_error("call failed")
+        span.set_attributes(request_bytes=call.request_bytes, response_bytes=call.response_bytes, **call.usage)
+        tracing.end_span(span, token)
+        labels = request_labels()
+        common = {
+            "service": service,
+            "operation": operation,
+            "provider": provider,
+            "model": model or "",
+            "route": labels.get("route", ""),
+            "block_type": labels.get("block_type", ""),
+        }
+        CALL_DURATION.observe(call.duration, status=call.status, **common)
+        CALLS.inc(status=call.status, **common)
+        if call.request_bytes:
+            PAYLOAD_BYTES.observe(call.request_bytes, service=service, operation=operation, direction="request")
+        if call.response_bytes:
+            PAYLOAD_BYTES.observe(call.response_bytes, service=service, operation=operation, direction="response")
+        for kind in ("input", "cached_input", "cache_write", "output"):
+            count = call.usage.get(f"{kind}_tokens", 0)
+            if count:
+                TOKENS.inc(count, kind=kind, **common)
+        if call.usage.get("cached_input_tokens"):
+            PROMPT_CACHE_HITS.inc(service=service, operation=operation, provider=provider, model=model or "")
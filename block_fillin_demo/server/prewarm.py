@@ -0,0 +1,177 @@
+"""
+prewarm: Pre-generate assets for popular (mechanism, theme) seeds.
+
+For each seed the job asks the agent for a cohesive theme the way /cohesiveChat
+does, then generates what /blockGenerate would for the resulting blocks:
+
+    seed               block descriptions       -> asset pool (kind "theme")
+    player, objects    composite object assets  -> asset pool (kind "asset")
+    world              ground texture           -> texture library
+    world + player     ambient loop             -> asset pool (kind "ambient")
+
+/cohesiveChat answers a request for a seed's theme with the pooled block
+descriptions, so the /blockGenerate calls that follow ask for exactly these
+assets. A seed whose theme is pooled keeps it, and descriptions already in the
+pool are skipped, so the job can be re-run to top the pool up. Provider calls
+run at batch priority. /asset-pool reports the hit rate the server gets from
+the pool; benchmarks/bench_asset_pool.py measures it for a chat session.
+
+Usage:
+    python prewarm.py                       # seeds from PREWARM_SEEDS_FILE
+    python prewarm.py seeds.json --mechanism dodge_and_catch
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+from pathlib import Path
+
+import scheduler
+import tracing
+import asset_store
+from config import FRONTEND_ASSETS_DIR, PREWARM_SEEDS_FILE, TEXTURE_LIBRARY_MODE
+from gami_agent import GamiAgent
+from VisualGenerator import VisualGenerator
+from asset_pool import get_pool, theme_description
+from routes.blocks import (
+    object_asset_description, ambient_sound_prompt, generate_ambient_sound, theme_object_keys, theme_complete
+)
+from logger import get_logger
+
+log = get_logger(__name__)
+
+
+def load_seeds(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        seeds = json.load(f)
+    return [seed for seed in seeds if seed.get('mechanism') and seed.get('theme')]
+
+
+def suggest_theme(agent, seed, pool):
+    """Block descriptions for the seed's theme: the pooled ones, else the agent's (stored in the pool)"""
+    mechanism_config = seed.get('mechanismConfig')
+    description = theme_description(seed['mechanism'], seed['theme'])
+    entry = pool.find('theme', description)
+    blocks = entry.data if entry else None
+    if not theme_complete(blocks, mechanism_config):
+        # As /cohesiveChat from a blank game
+        current_state = "Current game narrative:\nPlayer: Not set\nWorld: Not set\n"
+        result = agent._suggest_block_changes(
+            changed_block_type='player',
+            old_content=current_state,
+            new_content=f"User request: {seed['theme']}",
+            mechanism=seed['mechanism'],
+            mechanism_config=mechanism_config,
+            temperature=0.8
+        )
+        blocks = result.model_dump()
+        pool.add('theme', description, seed=f"{seed['mechanism']}:{seed['theme']}", data=blocks)
+    object_keys = theme_object_keys(mechanism_config)
+    return blocks['player'], blocks['world'], {key: blocks[key] for key in object_keys if blocks.get(key)}
+
+
+class Prewarmer:
+    def __init__(self, agent, visual_gen, pool=None, output_dir=FRONTEND_ASSETS_DIR):
+        self.agent = agent
+        self.visual_gen = visual_gen
+        self.pool = pool or get_pool()
+        self.output_dir = Path(output_dir)
+
+    def _asset(self, description, prefix, seed_name):
+        if self.pool.has('asset', description):
+            return 'skipped'
+        asset = self.agent._generate_asset(description, [], temperature=0.7)
+        filename = asset_store.store_json(asset.model_dump(), prefix, kind='prewarm', output_dir=self.output_dir)
+        self.pool.add('asset', description, filename, seed=seed_name)
+        return 'generated'
+
+    def _ambient(self, world, player, seed_name):
+        sound_prompt = ambient_sound_prompt(world, player)
+        if self.pool.has('ambient', sound_prompt):
+            return 'skipped'
+        filename = generate_ambient_sound(sound_prompt, output_dir=self.output_dir)
+        self.pool.add('ambient', sound_prompt, filename, seed=seed_name)
+        return 'generated'
+
+    def _ground(self, world, player):
+        if self.visual_gen.texture_library.lookup(world)[0] is not None:
+            return 'skipped'
+        self.visual_gen.generate_and_save_ground_texture(output_dir=self.output_dir, world_description=world,
+                                                         player_description=player)
+        return 'generated'
+
+    def run_seed(self, seed):
+        """Pre-generate one seed's assets; returns {task: generated | skipped | failed: <error>}"""
+        seed_name = f"{seed['mechanism']}:{seed['theme']}"
+        with scheduler.priority("batch"):
+            player, world, objects = suggest_theme(self.agent, seed, self.pool)
+        print(f" :: {seed_name} -> player: {player} | world: {world} | {objects}")
+
+        tasks = {'player': (self._asset, player, 'player', seed_name)}
+        for key, description in objects.items():
+            prefix = ''.join(c for c in key if c.isalnum() or c in '_-') or 'object'
+            tasks[key] = (self._asset, object_asset_description(description, world), prefix, seed_name)
+        tasks['ambient'] = (self._ambient, world, player, seed_name)
+        if self.visual_gen and self.visual_gen.texture_library:
+            tasks['ground'] = (self._ground, world, player)
+
+        results = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            futures = {executor.submit(scheduler.prioritized("batch", tracing.traced(f"prewarm.{name}", fn)), *args): name
+                       for name, (fn, *args) in tasks.items()}
+            for future in concurrent.futures.as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    results[name] = f"failed: {e}"
+                    log.error("Prewarm task failed", seed=seed_name, task=name, error=str(e))
+        return results
+
+    def run(self, seeds):
+        report = {}
+        for seed in seeds:
+            seed_name = f"{seed['mechanism']}:{seed['theme']}"
+            try:
+                report[seed_name] = self.run_seed(seed)
+            except Exception as e:
+                report[seed_name] = {'theme': f"failed: {e}"}
+                log.error("Prewarm seed failed", seed=seed_name, error=str(e))
+        return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate assets for (mechanism, theme) seeds")
+    parser.add_argument('seeds', nargs='?', default=str(PREWARM_SEEDS_FILE), help="JSON list of seeds")
+    parser.add_argument('--mechanism', help="only seeds of this mechanism")
+    args = parser.parse_args(argv)
+
+    seeds = load_seeds(args.seeds)
+    if args.mechanism:
+        seeds = [seed for seed in seeds if seed['mechanism'] == args.mechanism]
+    if not seeds:
+        print(f" :: No seeds in {args.seeds}")
+        return 1
+
+    agent = GamiAgent(model=os.getenv('LLM_MODEL', 'gpt-4o'))
+    visual_gen = VisualGenerator()
+    if TEXTURE_LIBRARY_MODE == 'off':
+        print(" :: TEXTURE_LIBRARY_MODE=off: ground textures are not pre-generated")
+
+    report = Prewarmer(agent, visual_gen).run(seeds)
+
+    counts = {}
+    for seed_name, results in report.items():
+        print(f" :: {seed_name}")
+        for task, result in sorted(results.items()):
+            print(f"      {task}: {result}")
+            outcome = result.split(':')[0]
+            counts[outcome] = counts.get(outcome, 0) + 1
+    print(f" :: Prewarm done: {counts}")
+    print(f" :: Pool: {json.dumps(get_pool().report()['kinds'])}")
+    return 1 if counts.get('failed') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+providers: HTTP clients for outbound provider calls.
+
+In the default live mode these are the normal SDK/requests defaults. With
+PROVIDER_MODE=fake every client is wired to the offline fakes in
+fake_providers, so the whole server runs without network access or API keys.
+PROVIDER_MODE=record calls the real services and writes every exchange to a
+cassette; PROVIDER_MODE=replay serves that cassette back offline (see cassette).
+"""
+import httpx
+import requests
+import google.oauth2.credentials
+from google import genai
+from google.genai import types
+from config import PROVIDER_MODE
+
+FAKE = PROVIDER_MODE == "fake"
+RECORD = PROVIDER_MODE == "record"
+REPLAY = PROVIDER_MODE == "replay"
+# No real provider is contacted: keys and credentials are placeholders
+OFFLINE = FAKE or REPLAY
+
+_session = None
+
+
+def api_key(value):
+    """Pass API keys through; offline a missing key is replaced by a placeholder"""
+    return value or ("fake-key" if OFFLINE else value)
+
+
+def _transport(client_cls):
+    if FAKE:
+        import fake_providers
+        return fake_providers.fake_transport(client_cls)
+    import cassette
+    return cassette.record_transport(client_cls) if RECORD else cassette.replay_transport(client_cls)
+
+
+def http_client(client_cls=httpx.Client):
+    """
+    HTTP client for an SDK (None lets the SDK build its default). Pass the SDK's
+    DefaultHttpxClient when it bundles its own httpx build.
+    """
+    if PROVIDER_MODE == "live":
+        return None
+    return client_cls(transport=_transport(client_cls))
+
+
+def async_http_client(**kwargs) -> httpx.AsyncClient:
+    if PROVIDER_MODE != "live":
+        kwargs["transport"] = _transport(httpx.AsyncClient)
+    return httpx.AsyncClient(**kwargs)
+
+
+def _adapter():
+    if FAKE:
+        import fake_providers
+        return fake_providers.FakeAdapter()
+    import cassette
+    return cassette.RecordAdapter() if RECORD else cassette.replay_adapter()
+
+
+def session():
+    """
+    requests-compatible object for the plain HTTP services (askLLM, gpt_image_edit,
+    Stable Diffusion, rembg, Stable Audio): the requests module itself when live,
+    a Session routed to the fakes or the cassette otherwise.
+    """
+    global _session
+    if PROVIDER_MODE == "live":
+        return requests
+    if _session is None:
+        _session = requests.Session()
+        _session.mount("http://", _adapter())
+        _session.mount("https://", _adapter())
+    return _session
+
+
+def genai_client(**kwargs) -> genai.Client:
+    if OFFLINE:
+        # Vertex AI mode needs credentials to sign requests; a static token never triggers a refresh
+        kwargs["credentials"] = google.oauth2.credentials.Credentials(token="fake-token")
+    if PROVIDER_MODE != "live":
+        kwargs["http_options"] = types.HttpOptions(httpx_client=http_client())
+    return genai.Client(**kwargs)
@@ -81,3 +81,27 @@ def switch_agent_model():
             'success': False,
             'message': f'Error switching model: {str(e)}'
         }), 500
+
+
+@agent_bp.route('/agent/info', methods=['GET'])
+def get_agent_info():
+    """Return the agent's model, per-task tier routing and per-task latency/token stats"""
+    try:
+        agent = current_app.config.get('AGENT')
+        if not agent:
+            return jsonify({
+                'success': False,
+                'message': 'Agent not initialized'
+            }), 500
+
+        return jsonify({
+            'success': True,
+            'info': agent.get_info()
+        })
+
+    except Exception as e:
+        print(f" :: Error getting agent info: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'Error getting agent info: {str(e)}'
+        }), 500
@@ -0,0 +1,114 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from flask import Blueprint, jsonify, request, send_file
+from werkzeug.security import safe_join
+import asset_gc
+import asset_pool
+from config import FRONTEND_ASSETS_DIR, FRONTEND_CONFIG_DIR, ASSET_IMMUTABLE_MAX_AGE
+
+assets_bp = Blueprint('assets', __name__)
+
+# A hex content hash in the name (e.g. ground_3f2a9c0d1e4b5a69.png) means the bytes never change
+HASH_NAMED = re.compile(r'[._-][0-9a-f]{16,64}(?:[._-]|$)')
+
+# path -> (size, mtime_ns, sha256): files are hashed again only after they change
+_etags = OrderedDict()
+_etags_lock = threading.Lock()
+ETAG_CACHE_SIZE = 4096
+
+
+def content_etag(path: Path) -> str:
+    """Strong ETag of a file: its sha256 (cached per size and mtime)"""
+    stat = path.stat()
+    key = str(path)
+    with _etags_lock:
+        cached = _etags.get(key)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            _etags.move_to_end(key)
+            return cached[2]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    etag = digest.hexdigest()[:32]
+    with _etags_lock:
+        _etags[key] = (stat.st_size, stat.st_mtime_ns, etag)
+        while len(_etags) > ETAG_CACHE_SIZE:
+            _etags.popitem(last=False)
+    return etag
+
+
+def send_static(directory: Path, filename: str):
+    """Send a file with a content-hash ETag, conditional GET and Range support.
+
+    Hash-named files are cached as immutable; everything else must be revalidated
+    (If-None-Match answered with 304 while the content is unchanged).
+    """
+    path = safe_join(str(directory), filename)
+    if path is None or not Path(path).is_file():
+        return jsonify({
+            'success': False,
+            'message': f'File not found: {filename}'
+        }), 404
+
+    path = Path(path)
+    response = send_file(path, etag=content_etag(path), conditional=True, max_age=0)
+    if HASH_NAMED.search(path.name):
+        response.headers['Cache-Control'] = f'public, max-age={ASSET_IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@assets_bp.route('/assets/<path:filename>', methods=['GET'])
+def get_asset(filename):
+    """Generated assets (sprites, ground textures, audio, asset JSON) from the frontend assets folder"""
+    return send_static(FRONTEND_ASSETS_DIR, filename)
+
+
+@assets_bp.route('/config-files/<filename>', methods=['GET'])
+def get_config_file(filename):
+    """Raw saved game config from demo/src/config/"""
+    if not filename.endswith('.json'):
+        filename += '.json'
+    return send_static(FRONTEND_CONFIG_DIR, filename)
+
+
+@assets_bp.route('/asset-gc', methods=['GET'])
+def get_asset_gc():
+    """Result of this worker's last garbage collection pass over generated assets"""
+    report = asset_gc.get_collector().last_report
+    return jsonify({
+        'success': True,
+        'report': report.to_dict() if report else None,
+    })
+
+
+@assets_bp.route('/asset-gc', methods=['POST'])
+def run_asset_gc():
+    """Run a garbage collection pass now (?dry_run=1 lists what would be deleted)"""
+    collector = asset_gc.get_collector()
+    if request.args.get('dry_run') == '1':
+        collector = asset_gc.AssetGC(dry_run=True)
+    report = asset_gc.run_exclusive(collector)
+    if report is None:
+        return jsonify({
+            'success': False,
+            'message': 'A garbage collection pass is already running'
+        }), 409
+    return jsonify({
+        'success': True,
+        'report': report.to_dict(),
+    })
+
+
+@assets_bp.route('/asset-pool', methods=['GET'])
+def get_asset_pool():
+    """Pre-generated asset pool: entries, lookups and hit rate per kind (this worker)"""
+    return jsonify({
+        'success': True,
+        **asset_pool.get_pool().report(),
+    })
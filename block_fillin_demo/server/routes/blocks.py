@@ -1,12 +1,86 @@
 import os
-import json
 import time
 import concurrent.futures
 from pathlib import Path
 from flask import Blueprint, request, jsonify, current_app
 from config import FRONTEND_ASSETS_DIR
+import metrics
+import tracing
+import providers
+import asset_store
+import asset_pool
+from logger import get_logger
 
 blocks_bp = Blueprint('blocks', __name__)
+log = get_logger(__name__)
+
+# The agent's own fallback when a request carries no mechanism config
+DEFAULT_OBJECTS = {
+    'box1': 'a hazard that the player must avoid',
+    'box2': 'a collectible that the player will catch to get rewards.',
+}
+
+
+def theme_object_keys(mechanism_config):
+    """Object blocks a cohesive theme describes for this mechanism config"""
+    return list((mechanism_config or {}).get('objects') or DEFAULT_OBJECTS)
+
+
+def theme_complete(blocks, mechanism_config):
+    """blocks describe the player, the world, the narrative and every object of the mechanism"""
+    keys = ['player', 'world', 'narrative'] + theme_object_keys(mechanism_config)
+    return bool(blocks) and all(blocks.get(key) for key in keys)
+
+
+def pooled_theme(mechanism, message, mechanism_config):
+    """Block descriptions pre-generated for a (mechanism, theme) seed matching message, or None"""
+    entry = asset_pool.get_pool().lookup('theme', asset_pool.theme_description(mechanism, message))
+    if entry and theme_complete(entry.data, mechanism_config):
+        return entry.data
+    return None
+
+
+def object_asset_description(content, world_description=''):
+    """Description an object asset is generated from (and looked up in the asset pool by)"""
+    if world_description:
+        return f"{content} (in a {world_description} setting)"
+    return content
+
+
+def ambient_sound_prompt(world_description, player_description=None):
+    sound_prompt = f"Ambient background music for a game world: {world_description}"
+    if player_description:
+        sound_prompt += f". The player is: {player_description}"
+    return sound_prompt + ". Loop-friendly, atmospheric, no abrupt changes."
+
+
+def generate_ambient_sound(sound_prompt, output_dir=FRONTEND_ASSETS_DIR):
+    """Generate a 10 s ambient loop with Stable Audio and store it; returns the asset filename"""
+    with metrics.track_call("audio", "ambient", provider="stability", model="stable-audio-2.5",
+                            request_bytes=len(sound_prompt)) as call:
+        response = providers.session().post(
+            "https://api.stability.ai/v2beta/audio/stable-audio-2/text-to-audio",
+            headers={
+                "authorization": f"Bearer {os.getenv('STABILITY_API_KEY')}",
+                "accept": "audio/*"
+            },
+            files={"none": ""},
+            data={
+                "prompt": sound_prompt,
+                "output_format": "wav",
+                "duration": 10,
+                "model": "stable-audio-2.5",
+                "steps": 5,
+            },
+        )
+        call.response_bytes = len(response.content)
+        if response.status_code != 200:
+            call.fail()
+
+    if response.status_code != 200:
+        raise Exception(f"Audio generation failed: {response.json()}")
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    return asset_store.store(response.content, 'ambient', '.wav', output_dir=output_dir)
 
 
 @blocks_bp.route('/changePropagation', methods=['POST'])
@@ -27,19 +101,17 @@ def handle_change_propagation():
         mechanism = data.get('mechanism', '')
         mechanism_config = data.get('mechanismConfig', None)
 
+        metrics.set_request_labels(block_type=changed_block_type)
+
         if not all([changed_block_type, new_content, mechanism]):
             return jsonify({
                 'success': False,
                 'message': 'Missing required fields: changedBlockType, newContent, or mechanism'
             }), 400
 
-        print(f" :: Change Propagation Request:")
-        print(f"    - Changed Block: {changed_block_type}")
-        print(f"    - Old Content: {old_content}")
-        print(f"    - New Content: {new_content}")
-        print(f"    - Mechanism: {mechanism}")
-        if mechanism_config:
-            print(f"    - Mechanism Config: {mechanism_config.get('description', 'N/A')}")
+        log.info("Change propagation request", changed_block=changed_block_type, mechanism=mechanism)
+        log.debug("Change propagation content", old_content=old_content, new_content=new_content,
+                  mechanism_config=mechanism_config.get('description', 'N/A') if mechanism_config else None)
 
         result = agent._suggest_block_changes(
             changed_block_type=changed_block_type,
@@ -50,15 +122,9 @@ def handle_change_propagation():
             temperature=0.7
         )
 
-        print(f" :: Cohesive Theme Generated:")
-        print(f"    📖 {result.narrative}")
-        print(f"    👤 Player: {result.player}")
-        print(f"    🌍 World: {result.world}")
-
         result_dict = result.model_dump()
-        for key, value in result_dict.items():
-            if key not in ['player', 'world', 'narrative']:
-                print(f"    📦 {key}: {value}")
+        log.info("Cohesive theme generated", narrative=result.narrative)
+        log.debug("Cohesive theme blocks", **{key: value for key, value in result_dict.items() if key != 'narrative'})
 
         return jsonify({
             'success': True,
@@ -67,9 +133,7 @@ def handle_change_propagation():
         })
 
     except Exception as e:
-        print(f" :: Error handling change propagation: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error handling change propagation", error=str(e))
         return jsonify({
             'success': False,
             'message': f'Error processing change propagation: {str(e)}'
@@ -107,17 +171,15 @@ def handle_cohesive_chat():
                 'message': 'Either message or image must be provided'
             }), 400
 
-        print(f" :: Cohesive Chat Request:")
-        print(f"    - Message: {message if message else '(none - image only)'}")
-        print(f"    - Has Image: {image is not None}")
-        print(f"    - Current Narrative: {current_narrative}")
-        print(f"    - Mechanism: {mechanism}")
+        log.info("Cohesive chat request", message=message if message else '(none - image only)',
+                 has_image=image is not None, mechanism=mechanism)
+        log.debug("Cohesive chat narrative", current_narrative=current_narrative)
 
         interpreted_context = message
         if image:
-            print(f"    - Interpreting image...")
+            log.debug("Interpreting chat image")
             image_description = media_interpreter.interpret_image(image, "complete_game")
-            print(f"    - Image interpreted: {image_description}")
+            log.info("Chat image interpreted", description=image_description)
             if message:
                 interpreted_context = f"{message}\n\nImage description: {image_description}"
             else:
@@ -132,28 +194,25 @@ World: {current_narrative.get('world', 'Not set')}
                 if obj_key in current_narrative:
                     current_state += f"{obj_key}: {current_narrative.get(obj_key, 'Not set')}\n"
 
-        result = agent._suggest_block_changes(
-            changed_block_type='player',
-            old_content=current_state,
-            new_content=f"User request: {interpreted_context}",
-            mechanism=mechanism,
-            mechanism_config=mechanism_config,
-            temperature=0.8
-        )
-
-        print(f" :: Cohesive Theme Generated from Chat:")
-        print(f"    📖 {result.narrative}")
-        if result.transition:
-            print(f"    ✨ {result.transition}")
-        print(f"    👤 Player: {result.player}")
-        print(f"    🌍 World: {result.world}")
-
-        result_dict = result.model_dump()
-        for key, value in result_dict.items():
-            if key not in ['player', 'world', 'narrative', 'transition']:
-                print(f"    📦 {key}: {value}")
-
-        response_message = f"I've generated a cohesive theme based on your request: {result.narrative}"
+        # A pre-generated theme keeps the block descriptions its pooled assets were generated from
+        result_dict = pooled_theme(mechanism, message, mechanism_config) if not image else None
+        if result_dict:
+            log.info("Cohesive theme from pre-generation pool", narrative=result_dict['narrative'])
+        else:
+            result = agent._suggest_block_changes(
+                changed_block_type='player',
+                old_content=current_state,
+                new_content=f"User request: {interpreted_context}",
+                mechanism=mechanism,
+                mechanism_config=mechanism_config,
+                temperature=0.8
+            )
+            result_dict = result.model_dump()
+            log.info("Cohesive theme generated from chat", narrative=result.narrative, transition=result.transition)
+        log.debug("Cohesive theme blocks", **{key: value for key, value in result_dict.items()
+                                               if key not in ['narrative', 'transition']})
+
+        response_message = f"I've generated a cohesive theme based on your request: {result_dict['narrative']}"
 
         return jsonify({
             'success': True,
@@ -165,9 +224,7 @@ World: {current_narrative.get('world', 'Not set')}
         })
 
     except Exception as e:
-        print(f" :: Error handling cohesive chat: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error handling cohesive chat", error=str(e))
         return jsonify({
             'success': False,
             'message': f'Error processing cohesive chat: {str(e)}'
@@ -183,6 +240,7 @@ def handle_block_generate():
         block_type = data.get('blockType', '')
         action_type = data.get('actionType', '')
         content = data.get('content', '')
+        metrics.set_request_labels(block_type=block_type)
 
         if not all([block_type, action_type, content]):
             return jsonify({
@@ -190,10 +248,7 @@ def handle_block_generate():
                 'message': 'Missing required fields: blockType, actionType, or content'
             }), 400
 
-        print(f" :: Block Generate Request:")
-        print(f"    - Block Type: {block_type}")
-        print(f"    - Action Type: {action_type}")
-        print(f"    - Content: {content}")
+        log.info("Block generate request", block_type=block_type, action_type=action_type, content=content)
 
         if block_type == 'player' and action_type == 'generate':
             if not agent:
@@ -203,35 +258,44 @@ def handle_block_generate():
                 }), 500
 
             player_config = data.get('currentPlayerConfig', None)
+            pool = asset_pool.get_pool()
 
             asset_result = None
+            asset_filename = None
             config_result = None
             asset_error = None
             config_error = None
 
             def generate_asset():
-                nonlocal asset_result, asset_error
+                nonlocal asset_result, asset_filename, asset_error
                 try:
-                    print(f" :: Generating asset for: {content}")
+                    pooled = pool.lookup('asset', content)
+                    if pooled:
+                        asset_filename = pooled.file
+                        log.info("Player asset from pre-generation pool", filename=pooled.file)
+                        return
+                    log.debug("Generating player asset", content=content)
                     result = agent._generate_asset(content, [], temperature=0.7)
                     asset_result = result
                 except Exception as e:
                     asset_error = str(e)
-                    print(f" :: Error generating asset: {e}")
+                    tracing.record_error(e)
+                    log.error("Error generating asset", error=str(e))
 
             def modify_config():
                 nonlocal config_result, config_error
                 try:
-                    print(f" :: Modifying player config based on: {content}")
+                    log.debug("Modifying player config", content=content)
                     result = agent._change_player_config(content, player_config, temperature=0.7)
                     config_result = result
                 except Exception as e:
                     config_error = str(e)
-                    print(f" :: Error modifying config: {e}")
+                    tracing.record_error(e)
+                    log.error("Error modifying config", error=str(e))
 
             with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-                future_asset = executor.submit(generate_asset)
-                future_config = executor.submit(modify_config)
+                future_asset = executor.submit(tracing.traced("player.generate_asset", generate_asset))
+                future_config = executor.submit(tracing.traced("player.modify_config", modify_config))
                 concurrent.futures.wait([future_asset, future_config])
 
             if asset_error and config_error:
@@ -253,15 +317,11 @@ def handle_block_generate():
             frontend_assets_dir = FRONTEND_ASSETS_DIR
             frontend_assets_dir.mkdir(parents=True, exist_ok=True)
 
-            timestamp = int(time.time() * 1000)
-            asset_filename = f'player_{timestamp}.json'
+            if not asset_filename:
+                asset_filename = asset_store.store_json(asset_result.model_dump(), 'player',
+                                                        output_dir=frontend_assets_dir)
             asset_path = frontend_assets_dir / asset_filename
 
-            with open(asset_path, 'w') as f:
-                json.dump(asset_result.model_dump(), f, indent=2)
-                f.flush()
-                os.fsync(f.fileno())
-
             if not asset_path.exists():
                 return jsonify({
                     'success': False,
@@ -287,6 +347,9 @@ def handle_block_generate():
 
             world_config = data.get('currentWorldConfig', None)
             player_description = data.get('playerDescription', '')
+            # Fetched here: the worker threads below have no app context
+            visual_gen = current_app.config.get('VISUAL_GENERATOR')
+            pool = asset_pool.get_pool()
 
             config_result = None
             ground_texture_result = None
@@ -298,19 +361,20 @@ def handle_block_generate():
             def generate_world_config():
                 nonlocal config_result, config_error
                 try:
-                    print(f" :: Generating world config for: {content}")
+                    log.debug("Generating world config", content=content)
                     result = agent._change_world_config(content, world_config, temperature=0.7)
                     config_result = result
                 except Exception as e:
                     config_error = str(e)
-                    print(f" :: Error generating world config: {e}")
+                    tracing.record_error(e)
+                    log.error("Error generating world config", error=str(e))
 
             def generate_ground_texture():
                 nonlocal ground_texture_result, ground_error
                 try:
-                    print(f" :: Generating ground texture")
-                    from VisualGenerator import VisualGenerator
-                    visual_gen = VisualGenerator()
+                    log.debug("Generating ground texture")
+                    if not visual_gen:
+                        raise RuntimeError("Visual generator not initialized")
                     ground_texture_result = visual_gen.generate_and_save_ground_texture(
                         output_dir=FRONTEND_ASSETS_DIR,
                         world_description=content,
@@ -318,59 +382,34 @@ def handle_block_generate():
                         filename=None,
                         size="1024x1024"
                     )
-                    print(f" :: Ground texture saved as: {ground_texture_result}")
+                    log.info("Ground texture saved", filename=ground_texture_result['file'],
+                             levels=len(ground_texture_result['levels']))
                 except Exception as e:
                     ground_error = str(e)
-                    print(f" :: Error generating ground texture: {e}")
+                    tracing.record_error(e)
+                    log.error("Error generating ground texture", error=str(e))
 
             def generate_ambient_sound():
                 nonlocal ambient_sound_result, sound_error
                 try:
-                    print(f" :: Generating ambient sound")
-                    import requests as req
-                    sound_prompt = f"Ambient background music for a game world: {content}"
-                    if player_description:
-                        sound_prompt += f". The player is: {player_description}"
-                    sound_prompt += ". Loop-friendly, atmospheric, no abrupt changes."
-
-                    response = req.post(
-                        "https://api.stability.ai/v2beta/audio/stable-audio-2/text-to-audio",
-                        headers={
-                            "authorization": f"Bearer {os.getenv('STABILITY_API_KEY')}",
-                            "accept": "audio/*"
-                        },
-                        files={"none": ""},
-                        data={
-                            "prompt": sound_prompt,
-                            "output_format": "wav",
-                            "duration": 10,
-                            "model": "stable-audio-2.5",
-                            "steps": 5,
-                        },
-                    )
-
-                    if response.status_code == 200:
-                        frontend_assets_dir = FRONTEND_ASSETS_DIR
-                        frontend_assets_dir.mkdir(parents=True, exist_ok=True)
-                        timestamp = int(time.time() * 1000)
-                        audio_filename = f'ambient_{timestamp}.wav'
-                        audio_path = frontend_assets_dir / audio_filename
-                        with open(audio_path, 'wb') as f:
-                            f.write(response.content)
-                            f.flush()
-                            os.fsync(f.fileno())
-                        ambient_sound_result = audio_filename
-                        print(f" :: Ambient sound saved as: {audio_filename}")
-                    else:
-                        raise Exception(f"Audio generation failed: {response.json()}")
+                    sound_prompt = ambient_sound_prompt(content, player_description)
+                    pooled = pool.lookup('ambient', sound_prompt)
+                    if pooled:
+                        ambient_sound_result = pooled.file
+                        log.info("Ambient sound from pre-generation pool", filename=pooled.file)
+                        return
+                    log.debug("Generating ambient sound")
+                    ambient_sound_result = generate_ambient_sound(sound_prompt)
+                    log.info("Ambient sound saved", filename=ambient_sound_result)
                 except Exception as e:
                     sound_error = str(e)
-                    print(f" :: Error generating ambient sound: {e}")
+                    tracing.record_error(e)
+                    log.error("Error generating ambient sound", error=str(e))
 
             with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-                future_config = executor.submit(generate_world_config)
-                future_ground = executor.submit(generate_ground_texture)
-                future_sound = executor.submit(generate_ambient_sound)
+                future_config = executor.submit(tracing.traced("world.generate_world_config", generate_world_config))
+                future_ground = executor.submit(tracing.traced("world.generate_ground_texture", generate_ground_texture))
+                future_sound = executor.submit(tracing.traced("world.generate_ambient_sound", generate_ambient_sound))
                 concurrent.futures.wait([future_config, future_ground, future_sound])
 
             response_data = {}
@@ -383,7 +422,9 @@ def handle_block_generate():
                 warnings.append(f"Config: {config_error}")
 
             if ground_texture_result:
-                response_data['groundTexture'] = ground_texture_result
+                # Full-size texture for existing clients; levels let the client load a smaller mip
+                response_data['groundTexture'] = ground_texture_result['file']
+                response_data['groundTextureLevels'] = ground_texture_result['levels']
             else:
                 warnings.append(f"Ground: {ground_error}")
 
@@ -418,6 +459,7 @@ def handle_block_generate():
             world_description = data.get('worldDescription', '')
             mechanism = data.get('mechanism', '')
             mechanism_config = data.get('mechanismConfig', None)
+            pool = asset_pool.get_pool()
 
             if not object_config:
                 return jsonify({
@@ -426,6 +468,7 @@ def handle_block_generate():
                 }), 400
 
             asset_result = None
+            asset_filename = None
             config_result = None
             spawn_result = None
             asset_error = None
@@ -433,27 +476,32 @@ def handle_block_generate():
             spawn_error = None
 
             def generate_object_asset():
-                nonlocal asset_result, asset_error
+                nonlocal asset_result, asset_filename, asset_error
                 try:
-                    print(f" :: Generating asset for object: {content}")
-                    asset_description = f"{content}"
-                    if world_description:
-                        asset_description += f" (in a {world_description} setting)"
+                    asset_description = object_asset_description(content, world_description)
+                    pooled = pool.lookup('asset', asset_description)
+                    if pooled:
+                        asset_filename = pooled.file
+                        log.info("Object asset from pre-generation pool", filename=pooled.file)
+                        return
+                    log.debug("Generating object asset", content=content)
                     result = agent._generate_asset(asset_description, [], temperature=0.7)
                     asset_result = result
                 except Exception as e:
                     asset_error = str(e)
-                    print(f" :: Error generating object asset: {e}")
+                    tracing.record_error(e)
+                    log.error("Error generating object asset", error=str(e))
 
             def modify_object_config():
                 nonlocal config_result, config_error
                 try:
-                    print(f" :: Modifying object config for mechanism '{mechanism}' based on: {content}")
+                    log.debug("Modifying object config", mechanism=mechanism, content=content)
                     result = agent._change_object_config(content, object_config, world_description, mechanism, mechanism_config, temperature=0.7)
                     config_result = result
                 except Exception as e:
                     config_error = str(e)
-                    print(f" :: Error modifying object config: {e}")
+                    tracing.record_error(e)
+                    log.error("Error modifying object config", error=str(e))
 
             def modify_spawn_config():
                 nonlocal spawn_result, spawn_error
@@ -465,7 +513,7 @@ def handle_block_generate():
                         elapsed += 0.1
 
                     if config_result:
-                        print(f" :: Modifying spawn config based on object changes")
+                        log.debug("Modifying spawn config based on object changes")
                         result = agent._change_spawn_config(
                             modified_object=config_result.objectConfig.model_dump(),
                             object_change_summary=config_result.summary,
@@ -478,12 +526,13 @@ def handle_block_generate():
                         spawn_error = "Object config modification failed or timed out"
                 except Exception as e:
                     spawn_error = str(e)
-                    print(f" :: Error modifying spawn config: {e}")
+                    tracing.record_error(e)
+                    log.error("Error modifying spawn config", error=str(e))
 
             with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-                future_asset = executor.submit(generate_object_asset)
-                future_config = executor.submit(modify_object_config)
-                future_spawn = executor.submit(modify_spawn_config)
+                future_asset = executor.submit(tracing.traced("object.generate_object_asset", generate_object_asset))
+                future_config = executor.submit(tracing.traced("object.modify_object_config", modify_object_config))
+                future_spawn = executor.submit(tracing.traced("object.modify_spawn_config", modify_spawn_config))
                 concurrent.futures.wait([future_asset, future_config, future_spawn])
 
             if asset_error and config_error:
@@ -505,16 +554,13 @@ def handle_block_generate():
             frontend_assets_dir = FRONTEND_ASSETS_DIR
             frontend_assets_dir.mkdir(parents=True, exist_ok=True)
 
-            timestamp = int(time.time() * 1000)
             object_id = config_result.objectConfig.id
-            asset_filename = f'{object_id}_{timestamp}.json'
+            asset_prefix = ''.join(c for c in object_id if c.isalnum() or c in '_-') or 'object'
+            if not asset_filename:
+                asset_filename = asset_store.store_json(asset_result.model_dump(), asset_prefix, kind='object',
+                                                        output_dir=frontend_assets_dir)
             asset_path = frontend_assets_dir / asset_filename
 
-            with open(asset_path, 'w') as f:
-                json.dump(asset_result.model_dump(), f, indent=2)
-                f.flush()
-                os.fsync(f.fileno())
-
             if not asset_path.exists():
                 return jsonify({
                     'success': False,
@@ -531,9 +577,9 @@ def handle_block_generate():
             if spawn_result:
                 response_data['spawnConfigs'] = [sc.model_dump() for sc in spawn_result.spawnConfigs]
                 response_data['spawnSummary'] = spawn_result.summary
-                print(f" :: Spawn configs updated: {spawn_result.summary}")
+                log.info("Spawn configs updated", summary=spawn_result.summary)
             elif spawn_error:
-                print(f" :: Warning: Spawn config update failed: {spawn_error}")
+                log.warning("Spawn config update failed", error=spawn_error)
                 response_data['spawnWarning'] = f"Spawn config update failed: {spawn_error}"
 
             return jsonify({
@@ -553,7 +599,7 @@ def handle_block_generate():
         })
 
     except Exception as e:
-        print(f" :: Error handling block generate: {str(e)}")
+        log.exception("Error handling block generate", error=str(e))
         return jsonify({
             'success': False,
             'message': f'Error processing block generate: {str(e)}'
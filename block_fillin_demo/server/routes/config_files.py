@@ -1,8 +1,8 @@
-import json
-import time
 from pathlib import Path
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, make_response
 from config import FRONTEND_CONFIG_DIR
+import metrics
+import storage
 
 config_files_bp = Blueprint('config_files', __name__)
 
@@ -36,8 +36,8 @@ def save_game_config():
         filename = f"{safe_game_name}.json"
         file_path = config_dir / filename
 
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(game_config, f, indent=2, ensure_ascii=False)
+        storage.write_json(file_path, game_config)
+        current_app.config['CONFIG_CATALOG'].invalidate(filename)
 
         print(f" :: Game config saved: {file_path}")
 
@@ -57,38 +57,54 @@ def save_game_config():
         }), 500
 
 
+def _not_modified(etag):
+    """304 response when the client's If-None-Match already has etag"""
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
 @config_files_bp.route('/list-config-files', methods=['GET'])
 def list_config_files():
-    """List all JSON config files in demo/src/config/ folder"""
+    """List JSON config files in demo/src/config/ (newest first).
+
+    Optional query parameters: offset and limit (pagination), mechanism (exact match)
+    and q (substring of the filename or game name). Supports If-None-Match.
+    """
     try:
-        config_dir = FRONTEND_CONFIG_DIR
+        catalog = current_app.config['CONFIG_CATALOG']
 
-        if not config_dir.exists():
+        if not catalog.root.exists():
             return jsonify({
                 'success': True,
                 'files': [],
                 'message': 'Config directory does not exist'
             })
 
-        json_files = []
-        for file_path in config_dir.glob('*.json'):
-            if file_path.is_file():
-                stat = file_path.stat()
-                json_files.append({
-                    'filename': file_path.name,
-                    'size': stat.st_size,
-                    'modified': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stat.st_mtime))
-                })
+        offset = max(0, request.args.get('offset', 0, type=int))
+        limit = request.args.get('limit', None, type=int)
+        entries, total, etag = catalog.list(offset=offset, limit=limit,
+                                            mechanism=request.args.get('mechanism'),
+                                            query=request.args.get('q'))
 
-        json_files.sort(key=lambda x: x['modified'], reverse=True)
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
 
-        print(f" :: Found {len(json_files)} config files")
+        print(f" :: Found {total} config files")
 
-        return jsonify({
+        response = jsonify({
             'success': True,
-            'files': json_files,
-            'message': f'Found {len(json_files)} config files'
+            'files': [entry.to_dict() for entry in entries],
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'message': f'Found {total} config files'
         })
+        response.set_etag(etag)
+        return response
 
     except Exception as e:
         print(f" :: Error listing config files: {str(e)}")
@@ -102,31 +118,43 @@ def list_config_files():
 
 @config_files_bp.route('/load-config-file/<filename>', methods=['GET'])
 def load_config_file(filename):
-    """Load a specific config file from demo/src/config/ folder"""
+    """Load a specific config file from demo/src/config/ folder (supports If-None-Match)"""
     try:
         safe_filename = Path(filename).name
         if not safe_filename.endswith('.json'):
             safe_filename += '.json'
 
-        file_path = FRONTEND_CONFIG_DIR / safe_filename
+        catalog = current_app.config['CONFIG_CATALOG']
+        entry = catalog.stat(safe_filename)
 
-        if not file_path.exists():
+        if entry is None:
             return jsonify({
                 'success': False,
                 'message': f'Config file not found: {safe_filename}'
             }), 404
 
-        with open(file_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        not_modified = _not_modified(entry.etag)
+        if not_modified:
+            metrics.CONFIG_LOADS.inc(result="not_modified")
+            return not_modified
 
-        print(f" :: Config file loaded: {file_path}")
+        entry, config = catalog.load(safe_filename)
+        if entry is None:
+            return jsonify({
+                'success': False,
+                'message': f'Config file not found: {safe_filename}'
+            }), 404
 
-        return jsonify({
+        print(f" :: Config file loaded: {catalog.root / safe_filename}")
+
+        response = jsonify({
             'success': True,
             'config': config,
             'filename': safe_filename,
             'message': 'Config file loaded successfully'
         })
+        response.set_etag(entry.etag)
+        return response
 
     except Exception as e:
         print(f" :: Error loading config file: {str(e)}")
@@ -0,0 +1,87 @@
+import json
+from pathlib import Path
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+import storage
+from logger import get_logger
+
+factory_bp = Blueprint('factory', __name__)
+log = get_logger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / '_data'
+
+
+def _sse(event: str, data, event_id: str = None) -> str:
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{id_line}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@factory_bp.route('/factory-state/analyze', methods=['GET'])
+def analyze_factory_state_stream():
+    """Analyze a game's factory_state.json images, streaming each result as a server-sent event.
+
+    Events: 'image' per analyzed image (see Gami.analyze_factory_state_progressive),
+    then 'done' with the skipped / performed / failed report, or 'error'.
+    factory_state.json is checkpointed while streaming, so a client may start
+    game description generation before 'done'.
+
+    Clients should close() the EventSource on 'done'. 'done' carries the event id
+    'done', so a browser that reconnects anyway sends Last-Event-ID: done and gets
+    204 No Content, which stops it reconnecting instead of re-running the
+    analysis. One run per game at a time: another request gets 409 meanwhile.
+    """
+    if request.headers.get('Last-Event-ID') == 'done':
+        return Response(status=204)
+
+    game_id = request.args.get('game_id', '')
+    safe_game_id = ''.join(c for c in game_id if c.isalnum() or c in '_-')
+    if not safe_game_id or safe_game_id != game_id:
+        return jsonify({
+            'success': False,
+            'message': 'A valid game_id must be provided'
+        }), 400
+
+    factory_state_path = DATA_DIR / safe_game_id / 'factory_state.json'
+    if not factory_state_path.exists():
+        return jsonify({
+            'success': False,
+            'message': f'No factory state for game {safe_game_id}'
+        }), 404
+
+    # Concurrent runs would share the journal and overwrite each other's checkpoints
+    release = storage.try_run_lock(factory_state_path)
+    if release is None:
+        return jsonify({
+            'success': False,
+            'message': f'An analysis of game {safe_game_id} is already running'
+        }), 409
+
+    try:
+        # Imported here: the asset pipeline (Gami and its managers) is not loaded by the other routes
+        from Gami import Gami
+        gami = Gami(safe_game_id)
+    except Exception as e:
+        release()
+        log.exception("Error initializing Gami", game_id=safe_game_id, error=str(e))
+        return jsonify({
+            'success': False,
+            'message': f'Error initializing game pipeline: {str(e)}'
+        }), 500
+
+    def events():
+        try:
+            for event in gami.analyze_factory_state_progressive(str(factory_state_path)):
+                name = event.pop('event')
+                event_id = 'done' if name == 'done' else str(event.get('completed', ''))
+                yield _sse(name, event, event_id)
+        except Exception as e:
+            log.exception("Error streaming factory analysis", game_id=safe_game_id, error=str(e))
+            yield _sse('error', {'message': str(e)})
+        finally:
+            release()
+
+    log.info("Streaming factory analysis", game_id=safe_game_id)
+    response = Response(stream_with_context(events()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Also when the stream is closed before it started
+    response.call_on_close(release)
+    return response
@@ -0,0 +1,26 @@
+import os
+from flask import Blueprint, current_app, jsonify
+from config import FRONTEND_ASSETS_DIR
+
+health_bp = Blueprint('health', __name__)
+
+# Singletons the routes need; checked by presence only, providers are never called
+READY_COMPONENTS = ('AGENT', 'MEDIA_INTERPRETER', 'VISUAL_GENERATOR')
+
+
+@health_bp.route('/healthz', methods=['GET'])
+def liveness():
+    """Liveness probe: the worker is up and serving requests"""
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+
+@health_bp.route('/readyz', methods=['GET'])
+def readiness():
+    """Readiness probe: singletons are initialized and generated assets can be written"""
+    components = {name.lower(): current_app.config.get(name) is not None for name in READY_COMPONENTS}
+    components['assets_dir'] = FRONTEND_ASSETS_DIR.is_dir() and os.access(FRONTEND_ASSETS_DIR, os.W_OK)
+    ready = all(components.values())
+    return jsonify({
+        'status': 'ready' if ready else 'not ready',
+        'components': components,
+    }), 200 if ready else 503
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify, current_app
+from logger import get_logger, truncate
 
 media_bp = Blueprint('media', __name__)
+log = get_logger(__name__)
 
 
 @media_bp.route('/interpretMedia', methods=['POST'])
@@ -29,10 +31,8 @@ def handle_interpret_media():
 
         image_input = image_path if image_path else image_data
 
-        print(f" :: Media Interpretation Request:")
-        print(f"    - Block Type: {block_type}")
-        print(f"    - Type: {interpretation_type}")
-        print(f"    - Input: {'file path' if image_path else 'base64 data'}")
+        log.info("Media interpretation request", block_type=block_type, type=interpretation_type,
+                 input='file path' if image_path else 'base64 data')
 
         description = None
 
@@ -59,7 +59,7 @@ def handle_interpret_media():
                 'message': 'Invalid block type or interpretation type'
             }), 400
 
-        print(f" :: Interpretation completed: {description[:100] if len(description) > 100 else description}")
+        log.info("Interpretation completed", description=truncate(description, 100))
 
         return jsonify({
             'success': True,
@@ -69,9 +69,7 @@ def handle_interpret_media():
         })
 
     except Exception as e:
-        print(f" :: Error interpreting media: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error interpreting media", error=str(e))
         return jsonify({
             'success': False,
             'message': f'Error interpreting media: {str(e)}'
@@ -0,0 +1,34 @@
+import time
+from flask import Blueprint, Response, request, g
+import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.before_app_request
+def start_request_metrics():
+    """Label provider calls made while serving this request with its route"""
+    g.request_start = time.perf_counter()
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.reset_request_labels(route=route)
+
+
+@metrics_bp.after_app_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        labels = metrics.request_labels()
+        metrics.HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            route=labels.get('route', ''),
+            method=request.method,
+            block_type=labels.get('block_type', ''),
+            status=str(response.status_code),
+        )
+    return response
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose provider latency/token/payload metrics in Prometheus text format"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
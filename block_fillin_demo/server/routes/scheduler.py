@@ -0,0 +1,34 @@
+from flask import Blueprint, request, jsonify
+import scheduler
+from config import SCHEDULER_ROUTE_PRIORITIES
+
+scheduler_bp = Blueprint('scheduler', __name__)
+
+
+def _parse_priorities(spec: str):
+    priorities = {}
+    for item in spec.split(','):
+        if '=' in item:
+            route, priority = item.split('=', 1)
+            priorities[route.strip()] = priority.strip()
+    return priorities
+
+
+ROUTE_PRIORITIES = _parse_priorities(SCHEDULER_ROUTE_PRIORITIES)
+
+
+@scheduler_bp.before_app_request
+def set_request_priority():
+    """Provider calls made for this request queue with its route's priority class"""
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    scheduler.set_priority(ROUTE_PRIORITIES.get(route, scheduler.DEFAULT_PRIORITY))
+
+
+@scheduler_bp.route('/scheduler', methods=['GET'])
+def get_scheduler():
+    """Capacity, busy slots and queued calls per provider pool"""
+    return jsonify({
+        'success': True,
+        'pools': scheduler.snapshot(),
+        'route_priorities': ROUTE_PRIORITIES,
+    })
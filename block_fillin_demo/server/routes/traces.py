@@ -0,0 +1,74 @@
+import uuid
+from flask import Blueprint, request, jsonify, g
+import metrics
+import tracing
+
+traces_bp = Blueprint('traces', __name__)
+
+# Probe and scrape endpoints would flood the trace buffer
+UNTRACED_ROUTES = ('/healthz', '/readyz', '/metrics')
+
+
+@traces_bp.before_app_request
+def start_request_span():
+    """Open the root span for this request; the request id comes from X-Request-Id when given"""
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if route in UNTRACED_ROUTES:
+        return
+    request_id = request.headers.get('X-Request-Id') or uuid.uuid4().hex
+    g.request_span = tracing.start_span(f"{request.method} {route}", request_id=request_id, route=route)
+
+
+@traces_bp.after_app_request
+def add_request_id_header(response):
+    request_span = g.get('request_span')
+    if request_span:
+        span, _ = request_span
+        response.headers['X-Request-Id'] = span.trace.request_id
+        span.set_attributes(status_code=response.status_code)
+        if response.status_code >= 500:
+            span.record_error(f"HTTP {response.status_code}")
+    return response
+
+
+@traces_bp.teardown_app_request
+def end_request_span(error=None):
+    request_span = g.pop('request_span', None)
+    if request_span:
+        span, token = request_span
+        span.set_attributes(**metrics.request_labels())
+        if error is not None:
+            span.record_error(error)
+        tracing.end_span(span, token)
+
+
+@traces_bp.route('/traces', methods=['GET'])
+def list_traces():
+    """List recent request traces (newest first) with their critical path"""
+    try:
+        block_type = request.args.get('block_type')
+        limit = int(request.args.get('limit', 50))
+        return jsonify({
+            'success': True,
+            'traces': tracing.recent_traces(block_type=block_type, limit=limit)
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error listing traces: {str(e)}'
+        }), 500
+
+
+@traces_bp.route('/traces/<trace_id>', methods=['GET'])
+def get_trace(trace_id):
+    """Return all spans of a trace (by trace id or request id) for a waterfall view"""
+    trace = tracing.get_trace(trace_id)
+    if trace is None:
+        return jsonify({
+            'success': False,
+            'message': f'Trace not found: {trace_id}'
+        }), 404
+    return jsonify({
+        'success': True,
+        'trace': trace
+    })
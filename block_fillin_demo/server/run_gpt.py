@@ -4,6 +4,7 @@ from openai import AzureOpenAI, AsyncAzureOpenAI
 from flask import Flask, request, Response, jsonify
 from flask_cors import CORS, cross_origin
 from config import SERVER_HOST, SERVER_PORT
+from logger import get_logger
 from time import time
 from io import BytesIO
 import requests
@@ -13,6 +14,7 @@ from PIL import Image
 app = Flask(__name__)
 cors = CORS(app) # allow CORS for all domains on all routes.
 app.config['CORS_HEADERS'] = 'Content-Type'
+log = get_logger('run_gpt')
 
 token_provider = get_bearer_token_provider(
     DefaultAzureCredential(),
@@ -267,7 +269,7 @@ def interrogate_LLM(prompt, system_prompt, temperature, api_version, deployment_
     
     #Do a chat completion and capture the response
     response = client.chat.completions.create(**chat_params)
-    print(response.choices[0].message.content)
+    log.debug("LLM completion", deployment=deployment_name, completion=response.choices[0].message.content)
     return response.choices[0].message.content
 
 ## Parameters for this are
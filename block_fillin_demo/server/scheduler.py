@@ -0,0 +1,225 @@
+"""
+scheduler: Process-wide concurrency limits for outbound provider calls.
+
+Every provider call runs in a slot of a named pool (llm, vision, sd, rembg,
+audio, gpt-image; capacities from SCHEDULER_POOLS). metrics.track_call takes
+the slot, so call sites need no changes; pool_for() maps a call's service and
+provider to its pool. When a pool is full, waiters are served by priority
+class (interactive before normal before batch), FIFO within a class. A waiter
+moves up one class per SCHEDULER_AGING_SECONDS, so batch work still progresses
+under sustained interactive load.
+
+The priority is a context variable: routes set it per request (see
+routes/scheduler.py, SCHEDULER_ROUTE_PRIORITIES), tracing.traced carries it
+into executor threads, and batch work runs under priority("batch") or is
+submitted wrapped in prioritized("batch", fn).
+
+SCHEDULER_POOLS capacities are for the whole server. Each gunicorn worker
+enforces its own pools, so gunicorn.conf.py calls share_between(workers) in
+every worker: a worker gets capacity // workers slots (at least one, so a pool
+smaller than the worker count allows one call per worker). The dev server is
+a single process and keeps the full capacities.
+"""
+import asyncio
+import contextvars
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, FrozenSet, List, Optional
+
+import metrics
+from config import SCHEDULER_POOLS, SCHEDULER_AGING_SECONDS, SCHEDULER_QUEUE_TIMEOUT
+
+PRIORITIES = {"interactive": 0, "normal": 1, "batch": 2}
+DEFAULT_PRIORITY = "normal"
+
+_priority = contextvars.ContextVar("scheduler_priority", default=DEFAULT_PRIORITY)
+# Pools whose slot the current context holds; nested or pre-acquired calls don't queue again
+_held = contextvars.ContextVar("scheduler_held", default=frozenset())
+
+
+class SchedulerTimeout(RuntimeError):
+    pass
+
+
+def _parse_pools(spec: str) -> Dict[str, int]:
+    pools = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, capacity = item.split("=", 1)
+            pools[name.strip()] = max(1, int(capacity))
+    return pools
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "enqueued")
+
+    def __init__(self, priority: str, seq: int):
+        self.priority = priority
+        self.seq = seq
+        self.enqueued = time.monotonic()
+
+    def rank(self, now: float, aging: float):
+        waited_classes = (now - self.enqueued) / aging if aging > 0 else 0.0
+        return PRIORITIES.get(self.priority, PRIORITIES[DEFAULT_PRIORITY]) - waited_classes, self.seq
+
+
+class Pool:
+    def __init__(self, name: str, capacity: int, aging: float = SCHEDULER_AGING_SECONDS):
+        self.name = name
+        self.capacity = capacity
+        self.aging = aging
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+
+    def _next(self) -> Optional[_Waiter]:
+        now = time.monotonic()
+        return min(self._waiters, key=lambda waiter: waiter.rank(now, self.aging), default=None)
+
+    def _report(self):
+        metrics.SCHEDULER_ACTIVE.set(self._active, pool=self.name)
+        for name in PRIORITIES:
+            metrics.SCHEDULER_QUEUE_DEPTH.set(sum(1 for w in self._waiters if w.priority == name),
+                                              pool=self.name, priority=name)
+
+    def acquire(self, priority: str = DEFAULT_PRIORITY, timeout: float = SCHEDULER_QUEUE_TIMEOUT) -> float:
+        """Block until a slot is free and it is this caller's turn; returns the seconds waited"""
+        waiter = _Waiter(priority, next(self._seq))
+        deadline = waiter.enqueued + timeout if timeout and timeout > 0 else None
+        with self._cond:
+            self._waiters.append(waiter)
+            self._report()
+            try:
+                while self._active >= self.capacity or self._next() is not waiter:
+                    remaining = deadline - time.monotonic() if deadline else None
+                    if remaining is not None and remaining <= 0:
+                        metrics.SCHEDULER_TIMEOUTS.inc(pool=self.name, priority=priority)
+                        raise SchedulerTimeout(f"No {self.name} slot after {timeout:.0f}s "
+                                               f"({self._active}/{self.capacity} busy, {len(self._waiters)} waiting)")
+                    self._cond.wait(remaining)
+                self._active += 1
+            finally:
+                self._waiters.remove(waiter)
+                self._report()
+                # The next waiter may be eligible now (a slot is still free, or this one gave up)
+                self._cond.notify_all()
+        waited = time.monotonic() - waiter.enqueued
+        metrics.SCHEDULER_WAIT.observe(waited, pool=self.name, priority=priority)
+        return waited
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._report()
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "capacity": self.capacity,
+                "active": self._active,
+                "waiting": {name: sum(1 for w in self._waiters if w.priority == name) for name in PRIORITIES},
+                "oldest_wait_seconds": round(max((now - w.enqueued for w in self._waiters), default=0.0), 3),
+            }
+
+
+POOLS: Dict[str, Pool] = {name: Pool(name, capacity) for name, capacity in _parse_pools(SCHEDULER_POOLS).items()}
+
+
+def share_between(processes: int):
+    """Give this process its share of the SCHEDULER_POOLS capacities when that many processes serve requests"""
+    processes = max(1, processes)
+    for name, capacity in _parse_pools(SCHEDULER_POOLS).items():
+        pool = POOLS[name]
+        with pool._cond:
+            pool.capacity = max(1, capacity // processes)
+            pool._cond.notify_all()
+
+
+def pool_for(service: str, provider: str = "") -> Optional[str]:
+    """Pool of a provider call as labelled in metrics.track_call (None: unlimited)"""
+    if service == "image":
+        name = {"stable-diffusion": "sd", "rembg": "rembg"}.get(provider, "gpt-image")
+    else:
+        name = service
+    return name if name in POOLS else None
+
+
+# ===== PRIORITY =====
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def set_priority(name: str):
+    """Priority for the rest of the current context (e.g. a request)"""
+    _priority.set(name if name in PRIORITIES else DEFAULT_PRIORITY)
+
+
+@contextmanager
+def priority(name: str):
+    token = _priority.set(name if name in PRIORITIES else DEFAULT_PRIORITY)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def prioritized(name: str, fn):
+    """Wrap fn (e.g. for executor.submit) to run with priority class name"""
+    def run(*args, **kwargs):
+        with priority(name):
+            return fn(*args, **kwargs)
+    return run
+
+
+# ===== SLOTS =====
+
+def _holding(name: str) -> FrozenSet[str]:
+    return _held.get() | {name}
+
+
+@contextmanager
+def slot(name: Optional[str]):
+    """Hold a slot of pool `name` for the block; yields the seconds spent waiting"""
+    pool = POOLS.get(name) if name else None
+    if pool is None or name in _held.get():
+        yield 0.0
+        return
+    waited = pool.acquire(current_priority())
+    token = _held.set(_holding(name))
+    try:
+        yield waited
+    finally:
+        _held.reset(token)
+        pool.release()
+
+
+@asynccontextmanager
+async def slot_async(name: Optional[str]):
+    """slot() for coroutines: waits in a worker thread so the event loop keeps running"""
+    pool = POOLS.get(name) if name else None
+    if pool is None or name in _held.get():
+        yield 0.0
+        return
+    acquiring = asyncio.ensure_future(asyncio.to_thread(pool.acquire, current_priority()))
+    try:
+        waited = await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        # The thread may still get the slot; give it back when it does
+        acquiring.add_done_callback(lambda f: pool.release() if not f.cancelled() and f.exception() is None else None)
+        raise
+    token = _held.set(_holding(name))
+    try:
+        yield waited
+    finally:
+        _held.reset(token)
+        pool.release()
+
+
+def snapshot() -> Dict[str, dict]:
+    return {name: pool.snapshot() for name, pool in POOLS.items()}
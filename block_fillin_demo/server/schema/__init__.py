@@ -40,6 +40,9 @@ from .composite_object_config import (
     CylinderOptions,
     SphereOptions,
     BoxOptions,
+    PartPlan,
+    CompositePlan,
+    CompositeParts,
     GameObjectConfig,
     ObjectConfigChangeResponse,
     ObjectCollisionConfig,
@@ -93,4 +96,7 @@ __all__ = [
     'CylinderOptions',
     'SphereOptions',
     'BoxOptions',
+    'PartPlan',
+    'CompositePlan',
+    'CompositeParts',
 ]
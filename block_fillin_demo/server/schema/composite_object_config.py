@@ -149,6 +149,23 @@ class CompositeObject(StrictBase):
         None, description="Optional transform applied to the entire object"
     )
 
+# Two-phase generation (COMPOSITE_SPLIT): a short plan of the parts, then the parts in parallel batches
+class PartPlan(StrictBase):
+    name: str = Field(..., description="Unique name/identifier of the part")
+    type: Literal["softbox", "cylinder", "sphere", "box"]
+    role: str = Field(..., description="What the part depicts and what it attaches to (e.g. 'left eye, on the front of the head')")
+    center: Vec3 = Field(..., description="Approximate center [x, y, z] in the object's space", min_length=3, max_length=3)
+    size: Vec3 = Field(..., description="Approximate bounding box [width, height, depth]", min_length=3, max_length=3)
+    color: Vec3 = Field(..., description="Main RGB color values (0-1)", min_length=3, max_length=3)
+
+class CompositePlan(StrictBase):
+    name: str = Field(..., description="Name of the composite object")
+    description: Optional[str] = Field(None, description="Description of the object")
+    parts: List[PartPlan] = Field(..., description="Every part the object is made of")
+
+class CompositeParts(StrictBase):
+    parts: List[Part] = Field(..., description="The requested parts, in the requested order")
+
 class IntentClassification(StrictBase):
     intent: Literal["chat", "generate_asset", "change_configuration"] = Field(..., description="The classified intent")
 
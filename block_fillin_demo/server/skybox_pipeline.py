@@ -0,0 +1,174 @@
+"""
+skybox_pipeline: Staged skybox generation with cached intermediates.
+
+A skybox is built in stages, each one provider call:
+    text, SKYBOX_MODE=outpaint   base (txt2img 512x512) -> outpaint (img2img ControlNet)
+    text, SKYBOX_MODE=single     panorama (one txt2img at SKYBOX_PANORAMA_SIZE)
+    reference image              reference (GPT image edit) -> outpaint
+
+Every stage result is stored in SKYBOX_CACHE_DIR under a hash of the stage name,
+prompt, seed, parameters and the key of the stage it was built from. A failed
+run leaves its finished stages in the cache, so the next attempt (or the next
+request for the same world) resumes at the stage that failed. SD seeds are
+derived from the prompt instead of -1, which makes a cached stage equivalent to
+regenerating it.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+import metrics
+from image_handle import ImageHandle
+from config import (
+    SKYBOX_MODE, SKYBOX_PANORAMA_SIZE, SKYBOX_CACHE_DIR, SKYBOX_CACHE_MAX_MB,
+    SKYBOX_DETERMINISTIC_SEEDS, SKYBOX_STAGE_ATTEMPTS
+)
+from logger import get_logger
+
+log = get_logger(__name__)
+
+MAX_SEED = 2 ** 31 - 1
+
+
+def stage_key(stage: str, **params) -> str:
+    """Hash identifying a stage result: stage name plus every input that changes its output"""
+    blob = json.dumps({"stage": stage, **params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def derive_seed(prompt: str) -> int:
+    """Stable SD seed for a prompt"""
+    return int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:4], "big") & MAX_SEED
+
+
+def parse_size(size: str) -> Tuple[int, int]:
+    width, _, height = size.lower().partition("x")
+    return int(width), int(height or width)
+
+
+class StageCache:
+    """Stage images on disk as <key>.png; least recently used files go first beyond max_bytes"""
+
+    def __init__(self, root: Path = SKYBOX_CACHE_DIR, max_bytes: int = int(SKYBOX_CACHE_MAX_MB * 1024 * 1024)):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{key}.png"
+
+    def get(self, key: str) -> Optional[ImageHandle]:
+        path = self.path(key)
+        try:
+            image = ImageHandle.from_file(path)
+            os.utime(path)
+        except OSError:
+            return None
+        return image
+
+    def put(self, key: str, image: ImageHandle):
+        try:
+            image.save(self.path(key))
+        except ValueError as e:
+            log.warning("Not caching undecodable skybox stage", key=key[:12], error=str(e))
+            return
+        except OSError as e:
+            # The stage result is still good; only the next request misses the cache
+            log.warning("Could not cache skybox stage", key=key[:12], error=str(e))
+            return
+        self._prune()
+
+    def _prune(self):
+        with self._lock:
+            files = []
+            for path in self.root.glob("*.png"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+
+
+class SkyboxPipeline:
+    def __init__(self, visual_manager, cache: Optional[StageCache] = None, mode: str = SKYBOX_MODE,
+                 attempts: int = SKYBOX_STAGE_ATTEMPTS):
+        self.visual_manager = visual_manager
+        self.cache = cache or StageCache()
+        self.mode = mode
+        self.attempts = max(1, attempts)
+
+    def seed_for(self, prompt: str, seed: Optional[int] = None) -> int:
+        if seed is not None and seed >= 0:
+            return seed
+        return derive_seed(prompt) if SKYBOX_DETERMINISTIC_SEEDS else random.randint(0, MAX_SEED)
+
+    def _stage(self, name: str, key: str, run: Callable[[], Optional[ImageHandle]]) -> Optional[ImageHandle]:
+        """Cached result of a stage, else run it (up to self.attempts times) and cache the result"""
+        cached = self.cache.get(key)
+        if cached:
+            metrics.SKYBOX_STAGES.inc(stage=name, result="cached")
+            log.debug("Skybox stage from cache", stage=name, key=key[:12])
+            return cached
+
+        for attempt in range(1, self.attempts + 1):
+            start = time.perf_counter()
+            image = run()
+            if image:
+                self.cache.put(key, image)
+                metrics.SKYBOX_STAGES.inc(stage=name, result="generated")
+                log.info("Skybox stage generated", stage=name, key=key[:12], attempt=attempt,
+                         seconds=round(time.perf_counter() - start, 2))
+                return image
+            log.warning("Skybox stage failed", stage=name, key=key[:12], attempt=attempt, attempts=self.attempts)
+        metrics.SKYBOX_STAGES.inc(stage=name, result="failed")
+        return None
+
+    def _outpaint(self, prompt: str, source_key: str, source_image: ImageHandle, seed: int) -> Optional[ImageHandle]:
+        vm = self.visual_manager
+        key = stage_key("outpaint", prompt=prompt, seed=seed, source=source_key, checkpoint=vm.skybox_checkpoint)
+        return self._stage("outpaint", key, lambda: vm._outpaint_image(prompt, source_image, seed=seed))
+
+    def from_text(self, prompt: str, negative_prompt: str, seed: Optional[int] = None) -> Optional[ImageHandle]:
+        """Panoramic skybox for a text prompt"""
+        vm = self.visual_manager
+        prompt = f"panorama, {prompt}"
+        seed = self.seed_for(prompt, seed)
+
+        if self.mode == "single":
+            width, height = parse_size(SKYBOX_PANORAMA_SIZE)
+            key = stage_key("panorama", prompt=prompt, negative_prompt=negative_prompt, seed=seed,
+                            width=width, height=height, checkpoint=vm.skybox_checkpoint)
+            return self._stage("panorama", key, lambda: vm._generate_skybox_base(
+                prompt, negative_prompt, seed=seed, width=width, height=height, operation="skybox_panorama"))
+
+        key = stage_key("base", prompt=prompt, negative_prompt=negative_prompt, seed=seed,
+                        width=512, height=512, checkpoint=vm.skybox_checkpoint)
+        base_image = self._stage("base", key, lambda: vm._generate_skybox_base(prompt, negative_prompt, seed=seed))
+        if not base_image:
+            log.warning("Failed to generate base skybox image", key=key[:12])
+            return None
+        return self._outpaint(prompt, key, base_image, seed)
+
+    def from_reference(self, prompt: str, reference: ImageHandle, reference_path=None,
+                       seed: Optional[int] = None) -> Optional[ImageHandle]:
+        """Panoramic skybox edited from a reference image, then outpainted"""
+        vm = self.visual_manager
+        key = stage_key("reference", prompt=prompt, reference=reference.sha256())
+        edited = self._stage("reference", key,
+                             lambda: vm.generate_image_with_gpt_edit(prompt, reference, reference_path))
+        if not edited:
+            log.warning("Failed to edit reference image for skybox", key=key[:12])
+            return None
+        prompt = f"panorama, {prompt}"
+        return self._outpaint(prompt, key, edited, self.seed_for(prompt, seed))
@@ -0,0 +1,188 @@
+"""
+storage: Crash-safe JSON files for game data.
+
+write_json() writes to a temp file in the same directory, fsyncs it and
+renames it over the target, so readers see either the old or the new document,
+never a truncated one. Writers of the same file are serialized by a per-path
+lock: a threading lock within the process plus an flock on a sidecar
+.<name>.lock file across gunicorn workers (where fcntl is available).
+update_json() holds that lock for a whole read-modify-write. try_run_lock()
+claims a file for a long-running job (e.g. a streamed analysis) without
+blocking, so a second run can be refused instead of interleaving its writes.
+
+History-style data goes to JSON Lines files instead: append_jsonl() adds one
+record per line without rewriting what is already there, and read_jsonl()
+skips a line torn by a crash.
+
+Documents are indented unless STORAGE_COMPACT_JSON=1 (or compact=True).
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locks only
+    fcntl = None
+
+from config import STORAGE_COMPACT_JSON
+
+PathLike = Union[str, Path]
+_MISSING = object()
+
+_locks: Dict[str, threading.RLock] = {}
+_locks_guard = threading.Lock()
+# Paths whose file lock the current thread holds (flock is per open file, so it must not be taken twice)
+_held = threading.local()
+# Paths claimed by try_run_lock in this process
+_running: Set[str] = set()
+
+
+def _thread_lock(path: Path) -> threading.RLock:
+    with _locks_guard:
+        return _locks.setdefault(str(path), threading.RLock())
+
+
+@contextmanager
+def lock(path: PathLike) -> Iterator[None]:
+    """Exclusive lock for writing path (re-entrant within a thread)"""
+    path = Path(path).resolve()
+    held = _held.__dict__.setdefault("paths", set())
+    with _thread_lock(path):
+        if fcntl is None or str(path) in held:
+            yield
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path.with_name(f".{path.name}.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            held.add(str(path))
+            try:
+                yield
+            finally:
+                held.discard(str(path))
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def try_run_lock(path: PathLike) -> Optional[Callable[[], None]]:
+    """Claim path for one run across threads and workers: a release function, or None if a run holds it.
+
+    Separate from the writer lock (a .<name>.run.lock sidecar), so the run itself
+    can still write path with write_json(). release() may be called more than once.
+    """
+    path = Path(path).resolve()
+    key = str(path)
+    with _locks_guard:
+        if key in _running:
+            return None
+        _running.add(key)
+    lock_file = None
+    if fcntl is not None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(path.with_name(f".{path.name}.run.lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            with _locks_guard:
+                _running.discard(key)
+            return None
+    released = False
+
+    def release():
+        nonlocal released
+        with _locks_guard:
+            if released:
+                return
+            released = True
+            _running.discard(key)
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    return release
+
+
+def dumps(data: Any, compact: bool = STORAGE_COMPACT_JSON, indent: int = 2) -> str:
+    if compact:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(data, ensure_ascii=False, indent=indent)
+
+
+def read_json(path: PathLike, default: Any = _MISSING) -> Any:
+    """Parsed document at path; default (if given) when the file does not exist"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        if default is _MISSING:
+            raise
+        return default
+
+
+def write_json(path: PathLike, data: Any, compact: bool = STORAGE_COMPACT_JSON, indent: int = 2,
+               locked: bool = True):
+    """Replace the document at path atomically.
+
+    locked=False skips the writer lock (and its .lock file) for files whose content
+    is the same whoever writes it, e.g. entries keyed by a content hash.
+    """
+    path = Path(path)
+    text = dumps(data, compact, indent)
+    with lock(path) if locked else nullcontext():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+
+def update_json(path: PathLike, update: Callable[[Any], Any], default: Any = None,
+                compact: bool = STORAGE_COMPACT_JSON) -> Any:
+    """Read-modify-write under the file's lock; update(document) returns the new document"""
+    with lock(path):
+        data = update(read_json(path, default))
+        write_json(path, data, compact)
+        return data
+
+
+def append_jsonl(path: PathLike, record: Any, fsync: bool = True):
+    """Append one record as a JSON line"""
+    path = Path(path)
+    line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+    with lock(path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a+b") as f:
+            # A write torn by a crash leaves no newline; start on a fresh line
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = b"\n" + line
+            f.write(line)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+
+
+def read_jsonl(path: PathLike) -> List[Any]:
+    """Records of a JSON Lines file ([] when missing); torn or corrupt lines are skipped"""
+    records = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
@@ -0,0 +1,127 @@
+"""
+Tests for asset_gc: which generated files a pass deletes and which it keeps.
+
+Run with: python -m pytest test_asset_gc.py
+"""
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+import asset_store
+from asset_gc import AssetGC
+from texture_library import TextureLibrary
+
+HOUR = 3600
+HASH = "0123456789abcdef"
+
+
+def _file(path: Path, age_hours: float = 0, data: bytes = b"x") -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    mtime = time.time() - age_hours * HOUR
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _collector(tmp_path: Path, **kwargs) -> AssetGC:
+    dirs = {name: tmp_path / name for name in ("assets", "generated", "configs", "data")}
+    for directory in dirs.values():
+        directory.mkdir()
+    return AssetGC(assets_dir=dirs["assets"], generated_dir=dirs["generated"], config_dir=dirs["configs"],
+                   data_dir=dirs["data"], grace_seconds=24 * HOUR, **kwargs)
+
+
+def _config(gc: AssetGC, *names: str):
+    (gc.config_dir / "game.json").write_text(json.dumps({"assets": [f"/assets/{name}" for name in names]}))
+
+
+def test_grace_period(tmp_path):
+    gc = _collector(tmp_path)
+    old = _file(gc.assets_dir / f"object_{HASH}.json", age_hours=30)
+    recent = _file(gc.assets_dir / "object_fedcba9876543210.json", age_hours=1)
+
+    report = gc.run(pause=0)
+
+    assert not old.exists()
+    assert recent.exists()
+    assert report.deleted == {"expired": 1}
+
+
+def test_referenced_and_hand_made_files_are_kept(tmp_path):
+    gc = _collector(tmp_path)
+    referenced = _file(gc.assets_dir / f"player_{HASH}.json", age_hours=30)
+    legacy = _file(gc.assets_dir / "ambient_1700000000000.wav", age_hours=30)
+    hand_made = _file(gc.assets_dir / "tree.png", age_hours=30)
+    _config(gc, referenced.name)
+
+    gc.run(pause=0)
+
+    assert referenced.exists()
+    assert hand_made.exists()
+    assert not legacy.exists()
+
+
+def test_mip_levels_follow_their_base(tmp_path):
+    gc = _collector(tmp_path)
+    kept = [_file(gc.assets_dir / name, age_hours=30)
+            for name in (f"ground_{HASH}.png", f"ground_{HASH}_512.png", f"ground_{HASH}_128.png")]
+    dropped = _file(gc.assets_dir / "ground_fedcba9876543210_512.png", age_hours=30)
+    _config(gc, kept[0].name)
+
+    gc.run(pause=0)
+
+    assert all(path.exists() for path in kept)
+    assert not dropped.exists()
+
+
+def test_dry_run_deletes_nothing(tmp_path):
+    gc = _collector(tmp_path, dry_run=True)
+    old = _file(gc.assets_dir / f"object_{HASH}.json", age_hours=30, data=b"12345")
+
+    report = gc.run(pause=0)
+
+    assert old.exists()
+    assert report.dry_run
+    assert report.deleted == {"expired": 1}
+    assert report.freed_bytes == 5
+
+
+def test_orphaned_game_folder(tmp_path):
+    gc = _collector(tmp_path)
+    (gc.data_dir / "live_game").mkdir()
+    live = _file(asset_store.game_dir("live_game", gc.generated_dir) / "sprite.png", age_hours=30)
+    orphan = _file(asset_store.game_dir("deleted_game", gc.generated_dir) / "sprite.png", age_hours=30)
+
+    gc.run(pause=0)
+
+    assert live.exists()
+    assert not orphan.exists()
+    assert not orphan.parent.exists()
+
+
+def test_game_folder_not_created_by_the_server_is_kept(tmp_path):
+    gc = _collector(tmp_path)
+    shipped = _file(gc.generated_dir / "test_pipeline" / "sprite.png", age_hours=30)
+    asset_store.game_dir("test_pipeline", gc.generated_dir)  # an existing folder is not marked
+
+    report = gc.run(pause=0)
+
+    assert shipped.exists()
+    assert not report.deleted
+
+
+def test_library_texture_gets_a_fresh_grace_period(tmp_path):
+    gc = _collector(tmp_path)
+    library = TextureLibrary(root=tmp_path / "library")
+    entry = library.add("mossy forest floor", [(64, b"full"), (32, b"half")])
+    for name in os.listdir(library.root):
+        _file(library.root / name, age_hours=30, data=(library.root / name).read_bytes())
+
+    manifest = library.materialize(entry, gc.assets_dir)
+    gc.run(pause=0)
+
+    assert all((gc.assets_dir / level["file"]).exists() for level in manifest["levels"])
@@ -9,6 +9,7 @@ from Gami import Gami
 from pydantic import BaseModel
 from datetime import datetime
 from VisualManager import VisualManager
+from image_handle import ImageHandle
 import requests
 from dotenv import load_dotenv
 from google import genai
@@ -81,21 +82,9 @@ def test_askllm(prompt, system_prompt, schema=None):
     return result
 
 def save_base64_image(base64_data, output_path):
-    """Save base64 encoded image to file."""
+    """Save an ImageHandle or base64 encoded image to file."""
     try:
-        # Remove data URL prefix if present
-        if ',' in base64_data:
-            base64_data = base64_data.split(',')[1]
-        
-        # Decode base64 data
-        image_data = base64.b64decode(base64_data)
-        
-        # Ensure output directory exists
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Write to file
-        with open(output_path, 'wb') as f:
-            f.write(image_data)
+        ImageHandle.coerce(base64_data).save(output_path)
         
         print(f"✅ Image saved to: {output_path}")
         return True
@@ -306,13 +295,7 @@ def test_gpt_image_gen_endpoint(prompt, reference_filename, save_path):
     output_dir.mkdir(parents=True, exist_ok=True)
     output_path = output_dir / save_path
 
-    if ',' in gpt_edited_image:
-        gpt_edited_image = gpt_edited_image.split(',')[1]
-
-    gpt_edited_image = base64.b64decode(gpt_edited_image)
-
-    with open(output_path, 'wb') as f:
-        f.write(gpt_edited_image)
+    gpt_edited_image.save(output_path)
             
     print(f"✅ Saved {save_path} to: {output_path}")
     return str(output_path)
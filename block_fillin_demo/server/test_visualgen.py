@@ -113,7 +113,7 @@ def test_save_texture():
             texture_bytes=texture_bytes,
             output_dir=output_dir,
             filename="test_beach_texture.png"
-        )
+        )['file']
         
         saved_path = output_dir / filename
         if saved_path.exists():
@@ -151,7 +151,7 @@ def test_generate_and_save():
             world_description="a chinese restaurant",
             size="1024x1024",
             model="gpt-image-1-mini"
-        )
+        )['file']
         
         saved_path = output_dir / filename
         if saved_path.exists():
@@ -192,7 +192,7 @@ def test_multiple_textures():
                 world_description=world,
                 size="1024x1024",
                 model="gpt-image-1-mini"
-            )
+            )['file']
             print(f"  ✅ Saved as: {filename}")
             results.append(filename)
         except Exception as e:
@@ -309,7 +309,7 @@ def test_specific_scenario(prompt, world_desc=None, player_desc=None):
             world_description=world_desc,
             player_description=player_desc,
             size="1024x1024"  # Full size for custom tests
-        )
+        )['file']
         
         saved_path = output_dir / filename
         print(f"✅ Generated: {saved_path}")
@@ -0,0 +1,268 @@
+"""
+texture_library: Reuse generated ground textures across similar world descriptions.
+
+Each entry holds the normalized description key (see _utils.normalize_description)
+and a pool of texture variants on disk. A lookup returns the entry whose key has
+the highest token Jaccard similarity, if it reaches TEXTURE_MATCH_THRESHOLD.
+Entries are evicted least-recently-used first once the library holds more than
+TEXTURE_LIBRARY_MAX_ENTRIES entries or TEXTURE_LIBRARY_MAX_MB on disk.
+
+The index is shared by the gunicorn workers. Every change (a new texture or
+variant, eviction, usage) re-reads it under its storage lock first, so no
+worker writes back a stale view, and lookups re-read it when its mtime changes.
+Hits and last use are counted in memory and written at most every
+USAGE_FLUSH_SECONDS, with the next change or by flush().
+
+Layout of TEXTURE_LIBRARY_DIR:
+    index.json                 entries with key, prompt, variants, hits and last use
+    <entry>_<n>.png            texture variants (seamless, full size)
+    <entry>_<n>_<size>.png     their mip levels
+"""
+import os
+import random
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import storage
+from asset_store import content_filename
+from _utils import normalize_description, token_similarity
+from texture_processing import level_filename, levels_manifest
+from config import (
+    TEXTURE_LIBRARY_DIR, TEXTURE_MATCH_THRESHOLD, TEXTURE_VARIANTS,
+    TEXTURE_LIBRARY_MAX_ENTRIES, TEXTURE_LIBRARY_MAX_MB
+)
+from logger import get_logger
+
+log = get_logger(__name__)
+
+INDEX_FILE = "index.json"
+USAGE_FLUSH_SECONDS = 60
+
+
+@dataclass
+class TextureEntry:
+    id: str
+    key: Tuple[str, ...]
+    prompt: str
+    variants: List[str] = field(default_factory=list)
+    levels: List[int] = field(default_factory=list)
+    bytes: int = 0
+    hits: int = 0
+    created: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+
+    def to_dict(self):
+        data = asdict(self)
+        data["key"] = list(self.key)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{**data, "key": tuple(data["key"])})
+
+    def files(self, variant: str) -> List[str]:
+        return [level_filename(variant, i, size) for i, size in enumerate(self.levels)]
+
+
+class TextureLibrary:
+    def __init__(self, root: Path = TEXTURE_LIBRARY_DIR, max_entries: int = TEXTURE_LIBRARY_MAX_ENTRIES,
+                 max_bytes: int = int(TEXTURE_LIBRARY_MAX_MB * 1024 * 1024),
+                 threshold: float = TEXTURE_MATCH_THRESHOLD, variants: int = TEXTURE_VARIANTS):
+        self.root = Path(root)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.threshold = threshold
+        self.variants = variants
+        self.index_path = self.root / INDEX_FILE
+        self._lock = threading.Lock()
+        self._entries: Dict[str, TextureEntry] = {}
+        self._index_mtime_ns = None
+        # Usage not yet in the index: entry id -> (hits, last used)
+        self._usage: Dict[str, Tuple[int, float]] = {}
+        self._usage_flushed = time.monotonic()
+        with self._lock:
+            self._reload()
+
+    # ===== INDEX =====
+
+    def _reload(self, force: bool = False):
+        """Re-read the index if another worker changed it (caller holds the lock)"""
+        try:
+            mtime_ns = self.index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._entries, self._index_mtime_ns = {}, None
+            return
+        if mtime_ns == self._index_mtime_ns and not force:
+            return
+        try:
+            entries = [TextureEntry.from_dict(item) for item in storage.read_json(self.index_path, [])]
+        except (ValueError, TypeError, KeyError) as e:
+            log.warning("Ignoring unreadable texture library index", path=str(self.index_path), error=str(e))
+            entries = []
+        self._entries = {}
+        for entry in entries:
+            entry.variants = [v for v in entry.variants if all((self.root / n).exists() for n in entry.files(v))]
+            if entry.variants and entry.levels:
+                self._entries[entry.id] = entry
+        self._index_mtime_ns = mtime_ns
+
+    def _save(self):
+        """Write the index atomically (caller holds the lock and the index's storage lock)"""
+        storage.write_json(self.index_path, [entry.to_dict() for entry in self._entries.values()], indent=1)
+        self._index_mtime_ns = self.index_path.stat().st_mtime_ns
+
+    def _apply_usage(self):
+        """Fold the usage counted since the last write into the entries (caller holds the lock)"""
+        for entry_id, (hits, last_used) in self._usage.items():
+            entry = self._entries.get(entry_id)
+            if entry:
+                entry.hits += hits
+                entry.last_used = max(entry.last_used, last_used)
+        self._usage = {}
+        self._usage_flushed = time.monotonic()
+
+    @contextmanager
+    def _change(self):
+        """Read-modify-write of the index: yields with the current entries, then evicts and saves"""
+        with storage.lock(self.index_path), self._lock:
+            self._reload(force=True)
+            self._apply_usage()
+            yield
+            evicted = self._evict()
+            self._save()
+            # Files go only after the index no longer points at them
+            for name in evicted + self._orphans():
+                (self.root / name).unlink(missing_ok=True)
+
+    def _evict(self) -> List[str]:
+        """Drop least recently used entries until within quota; returns their files (caller holds the lock)"""
+        total = sum(entry.bytes for entry in self._entries.values())
+        by_age = sorted(self._entries.values(), key=lambda entry: entry.last_used)
+        files = []
+        while by_age and (len(self._entries) > self.max_entries or total > self.max_bytes):
+            entry = by_age.pop(0)
+            del self._entries[entry.id]
+            total -= entry.bytes
+            files.extend(name for variant in entry.variants for name in entry.files(variant))
+            log.debug("Evicted texture", prompt=entry.prompt, variants=len(entry.variants))
+        return files
+
+    def _orphans(self) -> List[str]:
+        """Texture files no entry points at, e.g. left by a worker that died mid-write (caller holds the locks)"""
+        live = {name for entry in self._entries.values() for v in entry.variants for name in entry.files(v)}
+        try:
+            return [p.name for p in self.root.glob("*.png") if p.name not in live]
+        except OSError:
+            return []
+
+    def flush(self):
+        """Write the usage counted in this process to the index"""
+        with self._lock:
+            if not self._usage:
+                return
+        with self._change():
+            pass
+
+    # ===== LOOKUP / STORE =====
+
+    def lookup(self, description: str) -> Tuple[Optional[TextureEntry], float]:
+        """Best matching entry for description and its similarity (None below the threshold)"""
+        key = normalize_description(description)
+        with self._lock:
+            self._reload()
+            best, best_score = None, 0.0
+            for entry in self._entries.values():
+                score = 1.0 if entry.key == key else token_similarity(key, entry.key)
+                if score > best_score:
+                    best, best_score = entry, score
+            if best is None or best_score < self.threshold:
+                return None, best_score
+            hits, _ = self._usage.get(best.id, (0, 0.0))
+            self._usage[best.id] = (hits + 1, time.time())
+            due = time.monotonic() - self._usage_flushed >= USAGE_FLUSH_SECONDS
+        if due:
+            self.flush()
+        return best, best_score
+
+    def needs_variants(self, entry: TextureEntry) -> bool:
+        return len(entry.variants) < self.variants
+
+    def _add_variant(self, entry: TextureEntry, levels: List[Tuple[int, bytes]]):
+        """Write levels as a new variant of entry, dropping its oldest beyond the pool size (inside _change)"""
+        variant = f"{entry.id}_{uuid.uuid4().hex[:6]}.png"
+        self.root.mkdir(parents=True, exist_ok=True)
+        for name, (_, data) in zip(entry.files(variant), levels):
+            (self.root / name).write_bytes(data)
+        entry.variants.append(variant)
+        if len(entry.variants) > self.variants:
+            entry.variants.pop(0)  # its files are removed as orphans once the index is saved
+        entry.bytes = sum((self.root / name).stat().st_size for v in entry.variants for name in entry.files(v))
+        entry.last_used = time.time()
+
+    def add(self, description: str, levels: List[Tuple[int, bytes]]) -> TextureEntry:
+        """Store a texture's mip chain [(size, png bytes), ...]; an entry with the same key gets it as another variant"""
+        key = normalize_description(description)
+        sizes = [size for size, _ in levels]
+        with self._change():
+            entry = next((e for e in self._entries.values() if e.key == key and e.levels == sizes), None)
+            if entry is None:
+                entry = TextureEntry(id=uuid.uuid4().hex[:12], key=key, prompt=description, levels=sizes)
+                self._entries[entry.id] = entry
+            self._add_variant(entry, levels)
+        return entry
+
+    def add_variant(self, entry_id: str, levels: List[Tuple[int, bytes]]) -> Optional[TextureEntry]:
+        """Add a variant to the entry entry_id (None when it was evicted meanwhile or has other mip sizes)"""
+        with self._change():
+            entry = self._entries.get(entry_id)
+            if entry is None or entry.levels != [size for size, _ in levels]:
+                return None
+            self._add_variant(entry, levels)
+        return entry
+
+    def pick(self, entry: TextureEntry) -> str:
+        """A random variant of entry"""
+        with self._lock:
+            return random.choice(entry.variants)
+
+    def materialize(self, entry: TextureEntry, output_dir, filename: Optional[str] = None) -> dict:
+        """
+        Place a variant's levels in output_dir as filename (+ _<size> per level) and
+        return their manifest. Without a filename the variant is named by its content
+        hash, so serving the same variant again reuses the files already there. A hard
+        link costs no copy and keeps the asset valid after the entry is evicted; copy
+        when linking fails.
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        sources = entry.files(self.pick(entry))
+        if not filename:
+            filename = content_filename("ground", (self.root / sources[0]).read_bytes(), ".png")
+        manifest = levels_manifest(filename, entry.levels)
+        for source, level in zip(sources, manifest["levels"]):
+            target = output_dir / level["file"]
+            if not target.exists():
+                try:
+                    os.link(self.root / source, target)
+                except FileExistsError:
+                    pass
+                except OSError:
+                    shutil.copyfile(self.root / source, target)
+            # A link carries the library file's (old) mtime; restart asset_gc's grace period
+            os.utime(target)
+        return manifest
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._reload()
+            return {
+                "entries": len(self._entries),
+                "variants": sum(len(entry.variants) for entry in self._entries.values()),
+                "bytes": sum(entry.bytes for entry in self._entries.values()),
+            }
@@ -0,0 +1,113 @@
+"""
+texture_processing: Post-processing for generated ground textures.
+
+make_seamless() makes an image tile by offset-and-blend: each axis is blended
+with a copy of itself shifted by half a period, weighted so the borders come
+from the shifted copy (whose edges wrap continuously) and the centre from the
+original (which hides the copy's seam). mip_levels() then encodes the result
+as a chain of progressively halved PNGs.
+
+PNG optimization (optimize=True) takes 2-4x as long as a fast zlib level for a
+~10% smaller file, so the full-size level is always encoded fast, and a request
+passes optimize=False to encode the smaller levels fast as well: every level
+then exists when the manifest is returned, at a fraction of the provider call.
+"""
+import io
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from config import TEXTURE_SEAMLESS_BLEND, TEXTURE_MIN_LEVEL
+
+# zlib level of fast-encoded PNGs (the full-size level, and every level with optimize=False)
+FAST_COMPRESS_LEVEL = 1
+
+
+def _edge_weights(length: int, blend: float) -> np.ndarray:
+    """1 in the interior, easing to 0 over the outer blend fraction of each side"""
+    distance = np.minimum(np.arange(length), np.arange(length)[::-1]) + 0.5
+    t = np.clip(distance / max(blend * length, 1.0), 0.0, 1.0)
+    return t * t * (3 - 2 * t)
+
+
+def make_seamless(image: Image.Image, blend: float = TEXTURE_SEAMLESS_BLEND) -> Image.Image:
+    """Blend the borders so the image wraps without visible seams (blend: fraction of each axis, < 0.5)"""
+    if blend <= 0:
+        return image
+    blend = min(blend, 0.45)
+    mode = "RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB"
+    pixels = np.array(image.convert(mode), dtype=np.float32)
+    height, width = pixels.shape[:2]
+
+    # Horizontal pass, then vertical; shifting rows keeps the horizontal wrap intact
+    _blend_axis(pixels, _edge_weights(width, blend), axis=1)
+    _blend_axis(pixels, _edge_weights(height, blend), axis=0)
+
+    return Image.fromarray(np.clip(pixels + 0.5, 0, 255).astype(np.uint8), mode)
+
+
+def _blend_axis(pixels: np.ndarray, weights: np.ndarray, axis: int):
+    """In place: pixels * weights + (pixels rolled by half along axis) * (1 - weights), only where weights < 1"""
+    length = pixels.shape[axis]
+    band = np.nonzero(weights < 1)[0]
+    shape = [1, 1, 1]
+    shape[axis] = len(band)
+    current = np.take(pixels, band, axis=axis)
+    shifted = np.take(pixels, (band - length // 2) % length, axis=axis)
+    index = [slice(None)] * 3
+    index[axis] = band
+    pixels[tuple(index)] = current + (1 - weights[band]).reshape(shape) * (shifted - current)
+
+
+def _encode_png(image: Image.Image, fast: bool = False) -> bytes:
+    buffer = io.BytesIO()
+    if fast:
+        image.save(buffer, format="PNG", compress_level=FAST_COMPRESS_LEVEL)
+    else:
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def mip_levels(image: Image.Image, min_size: int = TEXTURE_MIN_LEVEL, full_size: Optional[bytes] = None,
+               optimize: bool = True) -> List[Tuple[int, bytes]]:
+    """[(size, png bytes), ...] from full resolution down to min_size, halving each step.
+
+    full_size: the image's full-size PNG when already encoded (prepare_ground_texture).
+    optimize=False encodes the smaller levels fast too.
+    """
+    levels = [(max(image.size), full_size or _encode_png(image, fast=True))]
+    while min(image.size) // 2 >= min_size:
+        image = image.reduce(2)
+        levels.append((max(image.size), _encode_png(image, fast=not optimize)))
+    return levels
+
+
+def prepare_ground_texture(texture_bytes: bytes) -> Tuple[Image.Image, bytes]:
+    """Generated texture -> (seamless image, its full-size PNG)"""
+    image = Image.open(io.BytesIO(texture_bytes))
+    image.load()
+    image = make_seamless(image)
+    return image, _encode_png(image, fast=True)
+
+
+def process_ground_texture(texture_bytes: bytes, optimize: bool = True) -> List[Tuple[int, bytes]]:
+    """Generated texture -> seamless mip chain as [(size, png bytes), ...], largest first"""
+    image, full_size = prepare_ground_texture(texture_bytes)
+    return mip_levels(image, full_size=full_size, optimize=optimize)
+
+
+def level_filename(filename: str, index: int, size: int) -> str:
+    """ground_1.png -> ground_1.png (full size), ground_1_512.png, ground_1_256.png, ..."""
+    if index == 0:
+        return filename
+    stem, _, suffix = filename.rpartition(".")
+    return f"{stem}_{size}.{suffix}"
+
+
+def levels_manifest(filename: str, sizes: List[int]) -> dict:
+    """What the frontend gets: the full-size file plus every level, largest first"""
+    return {
+        "file": filename,
+        "levels": [{"size": size, "file": level_filename(filename, i, size)} for i, size in enumerate(sizes)],
+    }
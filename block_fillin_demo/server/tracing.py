@@ -0,0 +1,218 @@
+"""
+tracing: Lightweight span tracing for requests that fan out to worker threads.
+
+Spans are kept in a contextvar so provider calls made from a route (or from a
+worker submitted with traced()) nest under the request's root span. Finished
+traces are kept in a ring buffer for /traces and, if TRACE_LOG_FILE is set,
+appended to a JSON-lines log with one OTLP-style span record per line.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+from config import TRACE_LOG_FILE, TRACE_BUFFER_SIZE
+
+
+class Span:
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str] = None, attributes: Dict[str, Any] = None):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.thread = threading.current_thread().name
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = "ok"
+        self.error = None
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record_error(self, error):
+        self.status = "error"
+        self.error = str(error)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        """OTLP-style span record (ids as hex, times as unix nanoseconds)"""
+        record = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(self.duration_ms, 3),
+            "thread": self.thread,
+            "attributes": self.attributes,
+            "status": {"code": self.status},
+        }
+        if self.error:
+            record["status"]["message"] = self.error
+        return record
+
+
+class Trace:
+    def __init__(self, request_id: str):
+        self.trace_id = os.urandom(16).hex()
+        self.request_id = request_id
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def root(self) -> Optional[Span]:
+        return next((span for span in self.spans if span.parent_id is None), None)
+
+    def critical_path(self) -> List[str]:
+        """
+        Follow, from the root, the child that finished last at each level: the
+        branch that determined the request's end-to-end latency.
+        """
+        children = {}
+        for span in self.spans:
+            children.setdefault(span.parent_id, []).append(span)
+        path = []
+        current = self.root()
+        while current is not None:
+            path.append(current.name)
+            kids = children.get(current.span_id)
+            current = max(kids, key=lambda span: span.end_ns or 0) if kids else None
+        return path
+
+    def summary(self) -> Dict[str, Any]:
+        root = self.root()
+        return {
+            "trace_id": self.trace_id,
+            "request_id": self.request_id,
+            "name": root.name if root else "",
+            "block_type": root.attributes.get("block_type", "") if root else "",
+            "duration_ms": round(root.duration_ms, 3) if root else 0.0,
+            "status": root.status if root else "",
+            "span_count": len(self.spans),
+            "critical_path": self.critical_path(),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start_ns)
+        return {**self.summary(), "spans": [span.to_dict() for span in spans]}
+
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+_recent_traces = deque(maxlen=TRACE_BUFFER_SIZE)
+_export_lock = threading.Lock()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_request_id() -> str:
+    span = _current_span.get()
+    return span.trace.request_id if span else ""
+
+
+def _export(trace: Trace):
+    _recent_traces.append(trace)
+    if not TRACE_LOG_FILE:
+        return
+    lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in trace.spans)
+    try:
+        with _export_lock:
+            with open(TRACE_LOG_FILE, "a", encoding="utf-8") as f:
+                f.write(lines)
+    except OSError as e:
+        print(f" :: Warning: Could not write trace log {TRACE_LOG_FILE}: {e}")
+
+
+def start_span(name: str, request_id: str = "", **attributes):
+    """
+    Open a span as a child of the current span (or as the root of a new trace)
+    and make it current. Returns (span, token); pass both to end_span.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        trace = Trace(request_id or os.urandom(8).hex())
+        span = Span(trace, name, None, attributes)
+    else:
+        span = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(span)
+    return span, token
+
+
+def end_span(span: Span, token):
+    span.end_ns = time.time_ns()
+    span.trace.add(span)
+    _current_span.reset(token)
+    if span.parent_id is None:
+        _export(span.trace)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Usage:
+        with tracing.span("world.ground_texture", model=model) as s:
+            ...
+    """
+    current, token = start_span(name, **attributes)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        end_span(current, token)
+
+
+def traced(name: str, fn, **attributes):
+    """
+    Wrap fn for executor.submit: it runs in a copy of the submitting thread's
+    context (so request labels and the current span carry over) inside a child
+    span named `name`.
+    """
+    ctx = contextvars.copy_context()
+
+    def run_in_span(*args, **kwargs):
+        with span(name, **attributes):
+            return fn(*args, **kwargs)
+
+    def run(*args, **kwargs):
+        return ctx.run(run_in_span, *args, **kwargs)
+
+    return run
+
+
+def record_error(error):
+    """Mark the current span as failed for errors that are caught and not re-raised"""
+    current = _current_span.get()
+    if current is not None:
+        current.record_error(error)
+
+
+def recent_traces(block_type: str = None, limit: int = 50) -> List[Dict[str, Any]]:
+    traces = list(_recent_traces)[::-1]
+    summaries = [trace.summary() for trace in traces]
+    if block_type:
+        summaries = [summary for summary in summaries if summary["block_type"] == block_type]
+    return summaries[:limit]
+
+
+def get_trace(trace_id: str) -> Optional[Dict[str, Any]]:
+    for trace in list(_recent_traces):
+        if trace.trace_id == trace_id or trace.request_id == trace_id:
+            return trace.to_dict()
+    return None